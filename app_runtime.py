@@ -0,0 +1,120 @@
+"""
+Shared runtime of the Flask entry points
+final_flask_with_rls.py and final_flask_without_rls.py serve the same
+sailing datasets, response cache, segment data, login store and metrics;
+they are set up once here and both apps import the same objects:
+- DATASETS: loaded lazily or on a warm-up thread (preloaded and frozen in
+  the gunicorn master with CRUISE_PREFORK=1), plus the sailing-folder
+  watcher; current_dataset() pins one generation per request
+- RESPONSE_CACHE, SEGMENT_CSV and AUTH_USERS
+- the scrape-time REGISTRY collectors and require_internal_access() for
+  the /sailing/internal endpoints
+
+Usage:
+    from app_runtime import DATASETS, RESPONSE_CACHE, current_dataset, require_internal_access
+    PASSWORDS = PasswordVerifier(verify_credential)
+    register_password_metrics(PASSWORDS)
+"""
+
+import hmac
+import os
+from pathlib import Path
+
+from flask import abort, current_app, g, has_request_context, request
+
+import sql_ops as COMMENTS_DB  # comments/issues store with the FTS5 index
+from auth_store import AuthUsers, PasswordVerifier
+from metrics import REGISTRY, lru_stats, pool_samples, register_cache
+from navigate_search import get_collection
+from query_log import QUERY_LOG
+from response_cache import ResponseCache
+from sailing_codes import parse_sailing_code
+from sailing_datasets import DatasetStore, recycle_workers
+from segment_cube import cube_cache_stats
+
+# Sailing datasets load lazily on first use, or on the warm-up thread below,
+# so importing the app (worker boot/restart) does not wait for them.
+# CRUISE_PREFORK=1 (see gunicorn.conf.py) loads and freezes them in the master
+# instead, so forked workers share one copy.
+DATASETS = DatasetStore()
+if os.environ.get("CRUISE_PREFORK") == "1":
+    DATASETS.preload()
+elif os.environ.get("CRUISE_WARMUP", "1") != "0":
+    DATASETS.start_warmup([get_collection])
+# New survey exports are picked up by polling the sailing folders
+# (CRUISE_RELOAD_INTERVAL seconds, 0 disables). Under CRUISE_PREFORK=1 only
+# the master polls and reloads, then has gunicorn fork fresh workers from it.
+if float(os.environ.get("CRUISE_RELOAD_INTERVAL", "60")) > 0:
+    DATASETS.start_watcher(float(os.environ.get("CRUISE_RELOAD_INTERVAL", "60")),
+                           on_reload=recycle_workers if os.environ.get("CRUISE_PREFORK") == "1" else None)
+
+# Read-mostly endpoints are served from a response cache with ETags
+# (CRUISE_RESPONSE_CACHE_MB, 0 disables)
+RESPONSE_CACHE = ResponseCache(int(float(os.environ.get("CRUISE_RESPONSE_CACHE_MB", "32")) * 1024 * 1024))
+
+# Per-guest ratings with segment attributes (Guest Type, Cabin Category, ...)
+# for /sailing/segmentMetrics; built into an in-memory cube on first use
+SEGMENT_CSV = os.environ.get("CRUISE_SEGMENT_CSV", "./test_data/comprehensive_cruise_ratings.csv")
+
+AUTH_FILE = Path("sailing_auth.yaml")
+# Parsed once and re-read only when the file changes
+AUTH_USERS = AuthUsers(AUTH_FILE)
+
+# Prometheus metrics at /sailing/internal/metrics: request and span metrics
+# come from instrumentation.py, the rest is read at scrape time. Scrapes need
+# "Authorization: Bearer $CRUISE_METRICS_TOKEN"; without a token they are only
+# served to loopback callers when the app runs in debug mode.
+METRICS_TOKEN = os.environ.get("CRUISE_METRICS_TOKEN", "")
+
+
+def current_dataset():
+    """Dataset generation pinned for the current request, so a reload mid-request is not seen"""
+    if not has_request_context():
+        return DATASETS.get()
+    if "dataset" not in g:
+        g.dataset = DATASETS.get()
+    return g.dataset
+
+
+def require_internal_access():
+    """Internal endpoints: bearer METRICS_TOKEN, or loopback callers in debug mode when unset; 404 otherwise"""
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            abort(404)
+    # Behind a local reverse proxy every caller is loopback, so that alone is not enough
+    elif not current_app.debug or request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(404)
+
+
+# ==============================================
+# METRICS
+# ==============================================
+
+def dataset_memory_samples():
+    if not DATASETS.is_ready():
+        return []
+    return [({"part": part}, size) for part, size in DATASETS.get().memory_breakdown().items()]
+
+
+register_cache("response", RESPONSE_CACHE.snapshot)
+register_cache("segment_cube", cube_cache_stats)
+register_cache("sailing_codes", lru_stats(parse_sailing_code))
+REGISTRY.collector("cruise_dataset_bytes", "gauge", "Approximate memory of the live sailing dataset",
+                   dataset_memory_samples)
+REGISTRY.collector("cruise_dataset_version", "gauge", "Generation of the live sailing dataset",
+                   lambda: [({}, DATASETS.version)])
+REGISTRY.collector("cruise_sql_slow_statements_total", "counter",
+                   "Statements slower than CRUISE_SLOW_QUERY_MS", lambda: [({}, QUERY_LOG.slow_count())])
+REGISTRY.collector("cruise_sql_table_scan_shapes", "gauge", "Statement shapes whose plan scans a whole table",
+                   lambda: [({}, len(QUERY_LOG.snapshot(scans_only=True)))])
+REGISTRY.collector("cruise_db_pool_connections", "gauge", "SQLAlchemy pool connections by state",
+                   lambda: pool_samples({"comments": COMMENTS_DB.engine}))
+
+
+def register_password_metrics(passwords: PasswordVerifier):
+    """Verified-login cache stats plus the hashing queue of an app's PasswordVerifier"""
+    register_cache("auth_verified", passwords.snapshot)
+    REGISTRY.collector("cruise_auth_hash_pending", "gauge", "Logins waiting for or running a password hash",
+                       lambda: [({}, passwords.snapshot()["pending"])])
+    REGISTRY.collector("cruise_auth_busy_total", "counter", "Logins refused because the hashing queue was full",
+                       lambda: [({}, passwords.snapshot()["busy"])])
@@ -0,0 +1,137 @@
+"""
+Login support for /sailing/auth
+- AuthUsers: sailing_auth.yaml parsed once and re-read only when the file
+  changes, instead of on every login
+- PasswordVerifier: runs the PBKDF2 checks (~100k+ iterations each) on a
+  small bounded worker pool so a burst of logins cannot take every CPU from
+  data requests; logins beyond the queue limit (half the request threads
+  by default) are refused with HashingBusy. Successful verifications are remembered for a short TTL
+  (keyed by an HMAC of user, stored hash and password under a per-process
+  key), so repeated logins with the same credentials skip the hash.
+
+Usage:
+    AUTH_USERS = AuthUsers("sailing_auth.yaml")
+    PASSWORDS = PasswordVerifier(check_password_hash)
+    if PASSWORDS.verify(username, AUTH_USERS.get(username)["password"], password): ...
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import yaml
+
+from response_cache import file_signature
+
+AUTH_WORKERS = int(os.environ.get("CRUISE_AUTH_WORKERS", "2"))
+# A waiting login holds its request thread, so at most half of the worker's
+# request threads (CRUISE_THREADS, see gunicorn.conf.py) may wait for a hash;
+# the rest keep serving data requests while a login burst is refused
+REQUEST_THREADS = int(os.environ.get("CRUISE_THREADS", "4"))
+AUTH_MAX_PENDING = int(os.environ.get("CRUISE_AUTH_MAX_PENDING", max(1, REQUEST_THREADS // 2)))
+AUTH_CACHE_TTL = float(os.environ.get("CRUISE_AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = 1024
+
+
+class HashingBusy(RuntimeError):
+    """More logins are waiting for the hashing pool than AUTH_MAX_PENDING"""
+
+
+class AuthUsers:
+    """The YAML user store, cached until the file's mtime/size changes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._signature = None
+        self._users: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def users(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Auth file not found at {self.path}")
+        signature = file_signature(str(self.path))
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    with open(self.path, 'r') as f:
+                        self._users = (yaml.safe_load(f) or {}).get('users') or {}
+                    self._signature = signature
+        return self._users
+
+    def get(self, username: str) -> Optional[Dict]:
+        return self.users().get(username)
+
+
+class PasswordVerifier:
+    """Bounded hashing pool plus a TTL cache of verified credentials"""
+
+    def __init__(self, verify: Callable[[str, str], bool], workers: int = AUTH_WORKERS,
+                 max_pending: int = AUTH_MAX_PENDING, cache_ttl: float = AUTH_CACHE_TTL,
+                 cache_size: int = AUTH_CACHE_SIZE):
+        self._verify = verify
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._key = secrets.token_bytes(32)
+        self._verified: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "busy": 0, "pending": 0}
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Run a hashing-heavy call on the pool and wait for it (HashingBusy when the queue is full)"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["busy"] += 1
+            raise HashingBusy("Too many logins in progress, retry shortly")
+        with self._lock:
+            self.stats["pending"] += 1
+        try:
+            return self._pool.submit(func, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self.stats["pending"] -= 1
+            self._slots.release()
+
+    def _cache_key(self, username: str, stored_hash: str, password: str) -> bytes:
+        message = "\0".join((username, stored_hash, password)).encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def verify(self, username: str, stored_hash: Optional[str], password: str) -> bool:
+        if not stored_hash or not password:
+            return False
+        key = self._cache_key(username, stored_hash, password)
+        now = time.monotonic()
+        with self._lock:
+            expires = self._verified.get(key)
+            if expires is not None and expires > now:
+                self._verified.move_to_end(key)
+                self.stats["hits"] += 1
+                return True
+            self.stats["misses"] += 1
+
+        if not self.run(self._verify, stored_hash, password):
+            return False
+        if self.cache_ttl > 0:
+            with self._lock:
+                self._verified[key] = now + self.cache_ttl
+                self._verified.move_to_end(key)
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        return True
+
+    def forget(self):
+        """Drop every remembered verification (e.g. after a password change)"""
+        with self._lock:
+            self._verified.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._verified)}
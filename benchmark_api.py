@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP benchmark for the /sailing API
+Boots final_flask_with_rls.py against a generated workspace, points the
+search path at ollama_stub_server.py and drives realistic payload mixes
+at several concurrency levels.
+
+Reports p50/p95/p99 latency and throughput per endpoint and writes a JSON
+result file that can be diffed between commits:
+
+    python benchmark_api.py --label before --output bench_results/before.json
+    python benchmark_api.py --label after --output bench_results/after.json
+    python benchmark_api.py --compare bench_results/before.json bench_results/after.json
+
+--payload-mb N also times serialization + compression of an N MB
+getMetricRating-style response in-process (stdlib jsonify vs the fast
+provider with gzip/brotli); --payload-only skips the HTTP load levels.
+
+--login-burst N fires N logins (wrong passwords, so each pays the full
+password hash like a first login) while the data mix runs, and reports the
+data latency next to a quiet run. Compare the bounded hashing pool against
+an effectively unbounded one:
+
+    python benchmark_api.py --login-burst 200 --auth-workers 2
+    python benchmark_api.py --login-burst 200 --auth-workers 64
+
+--gunicorn serves the app with gunicorn.conf.py instead of the threaded dev
+server (--workers/--threads set CRUISE_WORKERS/CRUISE_THREADS), which is
+where the request-thread budget of a login burst matters:
+
+    python benchmark_api.py --gunicorn --workers 2 --threads 4 --login-burst 200
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+METRICS = ['Overall Holiday', 'Prior Customer Service', 'Flight', 'Embarkation/Disembarkation',
+           'Value for Money', 'App Booking', 'Pre-Cruise Hotel Accomodation', 'Cabins',
+           'Cabin Cleanliness', 'F&B Quality', 'F&B Service', 'Bar Service',
+           'Drinks Offerings and Menu', 'Entertainment', 'Excursions', 'Crew Friendliness',
+           'Ship Condition/Cleanliness (Public Areas)', 'Sentiment Score']
+
+SHEETS = ["Ports and Excursions", "Other Feedback", "Entertainment", "Bars", "Dining",
+          "What went well", "What else"]
+
+SEARCH_QUERIES = ["bad beef based dishes", "great entertainment shows", "issues with port excursions",
+                  "slow bar service", "dirty cabin", "friendly crew", "long queues at embarkation"]
+
+# Data directories read by test_data.load_sailing_data_rate_reason (index 0 and 1)
+SAILING_DIRS = ["test_data2/DISCOVERY 2 - 2025", "test_data2/DISCOVERY 2025"]
+
+APP_BOOT_SNIPPET = (
+    "import sys, final_flask_with_rls as m; "
+    "m.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True, debug=False, use_reloader=False)"
+)
+
+# ==============================================
+# WORKSPACE PREPARATION
+# ==============================================
+
+def sailing_catalogue() -> List[Dict]:
+    """Sailing codes known to test_data, with ship and the data dir index they load from"""
+    import test_data as TD
+
+    catalogue = []
+    for index, (records, ship) in enumerate([(TD.summary_discovery2, "Discovery 2"),
+                                             (TD.summary_discovery + TD.summary_others, None)]):
+        for record in records:
+            code = record["Ship Name"]
+            start, end = TD.filename_date(code, 2 if index == 0 else 1)
+            catalogue.append({
+                "code": code,
+                "ship": ship or record.get("Ship") or "Discovery",
+                "dir_index": index,
+                "start": start or "2025-01-01",
+                "end": end or "2025-01-07",
+            })
+    return catalogue
+
+
+def write_sailing_csvs(workdir: Path, catalogue: List[Dict], guests_per_sailing: int, seed: int):
+    """Write per-sailing rating and reason CSVs in the layout load_sailing_data_rate_reason expects"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    weights = np.array([1, 1, 2, 3, 5, 8, 15, 20, 25, 20], dtype=float)
+    weights /= weights.sum()
+    reasons = np.array(["Food was cold", "Great staff", "Queues were too long", "Cabin was noisy",
+                        "Excellent value", "Shows were repetitive", "", "Would sail again"])
+
+    for sailing in catalogue:
+        folder = workdir / SAILING_DIRS[sailing["dir_index"]] / sailing["code"]
+        folder.mkdir(parents=True, exist_ok=True)
+        ratings = rng.choice(np.arange(1, 11), size=(guests_per_sailing, len(METRICS)), p=weights).astype(float)
+        ratings[rng.random(ratings.shape) < 0.3] = np.nan
+        pd.DataFrame(ratings, columns=METRICS).to_csv(folder / f"{sailing['code']}.csv", index=False)
+        reason = reasons[rng.integers(0, len(reasons), size=ratings.shape)]
+        pd.DataFrame(reason, columns=METRICS).to_csv(folder / f"{sailing['code']}_reason.csv", index=False)
+
+
+def prepare_workspace(workdir: Path, guests_per_sailing: int, seed: int) -> List[Dict]:
+    """Create a self-contained working directory the app can be booted from"""
+    workdir.mkdir(parents=True, exist_ok=True)
+    shutil.copy(REPO_ROOT / "sailing_auth.yaml", workdir / "sailing_auth.yaml")
+    catalogue = sailing_catalogue()
+    write_sailing_csvs(workdir, catalogue, guests_per_sailing, seed)
+    return catalogue
+
+
+def seed_sailings(db_path: Path, catalogue: List[Dict]):
+    """Insert the catalogue into the RLS database created by sql_ops_rls on app boot"""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        ship_ids = {name.lower(): ship_id for ship_id, name in cursor.execute("SELECT id, name FROM Ships")}
+        rows = [(ship_ids[s["ship"].lower()], s["code"], s["start"], s["end"])
+                for s in catalogue if s["ship"].lower() in ship_ids]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO Sailings (ship_id, sailing_number, start_date, end_date)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+# ==============================================
+# APP LIFECYCLE
+# ==============================================
+
+def boot_app(workdir: Path, port: int, env: Dict[str, str], timeout: float = 120.0,
+             gunicorn: bool = False) -> Tuple[subprocess.Popen, float]:
+    """
+    Start the app in a subprocess and wait for /sailing/check; returns
+    (process, boot_seconds). gunicorn=True runs it with gunicorn.conf.py
+    (CRUISE_WORKERS / CRUISE_THREADS) instead of the threaded dev server.
+    """
+    proc_env = dict(os.environ)
+    proc_env.update(env)
+    proc_env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), proc_env.get("PYTHONPATH")]))
+    if gunicorn:
+        command = [sys.executable, "-m", "gunicorn", "-c", str(REPO_ROOT / "gunicorn.conf.py"),
+                   "--bind", f"127.0.0.1:{port}", "final_flask_with_rls:app"]
+    else:
+        command = [sys.executable, "-c", APP_BOOT_SNIPPET, str(port)]
+    log = open(workdir / "app.log", "w")
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=workdir, env=proc_env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}/sailing/check"
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"App exited during boot, see {workdir / 'app.log'}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return proc, time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise TimeoutError(f"App did not answer {url} within {timeout}s")
+
+
+def login(base_url: str, username: str, password: str) -> requests.Session:
+    session = requests.Session()
+    try:
+        res = session.post(f"{base_url}/sailing/auth", json={"username": username, "password": password}, timeout=30)
+        if res.status_code != 200 or not res.json().get("authenticated"):
+            print(f"⚠️  Login as {username} failed ({res.status_code}); RLS endpoints will return empty data")
+    except requests.RequestException as e:
+        print(f"⚠️  Login request failed: {e}")
+    return session
+
+# ==============================================
+# PAYLOAD MIXES
+# ==============================================
+
+def build_scenarios(catalogue: List[Dict]) -> Dict[str, Dict]:
+    """Endpoint scenarios: weight in the mixed run and a payload factory taking an RNG"""
+    codes = [s["code"] for s in catalogue]
+    ships = sorted({s["ship"] for s in catalogue})
+
+    def pick_sailings(rng: random.Random) -> List[Dict]:
+        chosen = rng.sample(catalogue, rng.randint(1, min(8, len(catalogue))))
+        return [{"shipName": s["code"], "sailingNumber": "1"} for s in chosen]
+
+    def metric_rating(rng: random.Random) -> Dict:
+        payload = {"metric": rng.choice(METRICS), "compareToAverage": rng.random() < 0.5}
+        if rng.random() < 0.7:
+            payload.update({"filter_by": "sailing", "sailings": pick_sailings(rng)})
+        else:
+            payload.update({"filter_by": "date", "filters": {"fromDate": "2025-01-01", "toDate": "2025-06-30"}})
+        if rng.random() < 0.5:
+            payload["filterBelow"] = rng.choice([3, 4, 5, 6])
+        return payload
+
+    def rating_summary(rng: random.Random) -> Dict:
+        return {"fleets": ["marella"], "ships": rng.sample(ships, rng.randint(1, len(ships))),
+                "start_date": "-1", "end_date": "-1",
+                "sailing_numbers": rng.sample(codes, rng.randint(0, min(5, len(codes))))}
+
+    def sailing_filter(rng: random.Random) -> Dict:
+        return {"ships": rng.sample(ships, rng.randint(1, len(ships))),
+                "start_date": rng.choice(["-1", "2025-01-01", "2025-03-01"]), "end_date": "-1"}
+
+    def semantic(rng: random.Random) -> Dict:
+        return {"query": rng.choice(SEARCH_QUERIES), "fleets": ["marella"],
+                "ships": [s.lower() for s in rng.sample(ships, rng.randint(1, len(ships)))],
+                "sheet_names": rng.sample(SHEETS, rng.randint(0, 2)), "start_date": "-1", "end_date": "-1",
+                "sailing_numbers": [], "semanticSearch": rng.random() < 0.8,
+                "similarity_score_range": [0.2, 1], "num_results": rng.choice([10, 25, 50])}
+
+    def issues(rng: random.Random) -> Dict:
+        return {"sailing_numbers": rng.sample(codes, rng.randint(1, min(5, len(codes)))),
+                "sheets": rng.sample(SHEETS, rng.randint(1, 3))}
+
+    return {
+        "getMetricRating": {"path": "/sailing/getMetricRating", "weight": 40, "payload": metric_rating},
+        "getRatingSmry": {"path": "/sailing/getRatingSmry", "weight": 20, "payload": rating_summary},
+        "sailing_numbers_filter": {"path": "/sailing/sailing_numbers_filter", "weight": 20, "payload": sailing_filter},
+        "semanticSearch": {"path": "/sailing/semanticSearch", "weight": 10, "payload": semantic},
+        "getIssuesList": {"path": "/sailing/getIssuesList", "weight": 10, "payload": issues},
+    }
+
+# ==============================================
+# LOAD GENERATION AND STATISTICS
+# ==============================================
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarise(latencies: List[float], statuses: List[int], elapsed: float, response_bytes: int) -> Dict:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": sum(1 for s in statuses if s >= 400 or s == 0),
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else None,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3) if count else None,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3) if count else None,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3) if count else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if count else None,
+        "avg_response_bytes": int(response_bytes / count) if count else 0,
+    }
+
+
+def run_load(base_url: str, cookies, scenarios: Dict[str, Dict], concurrency: int,
+             total_requests: int, seed: int, timeout: float = 120.0) -> Dict:
+    """Issue total_requests weighted across scenarios from `concurrency` worker threads"""
+    names = list(scenarios)
+    weights = [scenarios[n]["weight"] for n in names]
+    plan_rng = random.Random(seed)
+    plan = [(n, scenarios[n]["payload"](plan_rng)) for n in plan_rng.choices(names, weights=weights, k=total_requests)]
+
+    lock = threading.Lock()
+    samples: Dict[str, Dict[str, list]] = {n: {"lat": [], "status": [], "bytes": [0]} for n in names}
+    local = threading.local()
+
+    def worker(item):
+        name, payload = item
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.cookies.update(cookies)
+        started = time.perf_counter()
+        try:
+            res = local.session.post(base_url + scenarios[name]["path"], json=payload, timeout=timeout)
+            status, size = res.status_code, len(res.content)
+        except requests.RequestException:
+            status, size = 0, 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            samples[name]["lat"].append(elapsed)
+            samples[name]["status"].append(status)
+            samples[name]["bytes"][0] += size
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, plan))
+    wall = time.perf_counter() - started
+
+    all_lat = [l for s in samples.values() for l in s["lat"]]
+    all_status = [c for s in samples.values() for c in s["status"]]
+    all_bytes = sum(s["bytes"][0] for s in samples.values())
+    return {
+        "overall": summarise(all_lat, all_status, wall, all_bytes),
+        "endpoints": {n: summarise(s["lat"], s["status"], wall, s["bytes"][0])
+                      for n, s in samples.items() if s["lat"]},
+    }
+
+def run_login_burst(base_url: str, cookies, scenarios: Dict[str, Dict], concurrency: int,
+                    total_requests: int, logins: int, login_concurrency: int, username: str,
+                    password: str, seed: int) -> Dict:
+    """Data mix alone, then the same mix while `logins` failing logins run from login_concurrency threads"""
+    quiet = run_load(base_url, cookies, scenarios, concurrency, total_requests, seed)
+
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def attempt(i):
+        started = time.perf_counter()
+        try:
+            status = requests.post(f"{base_url}/sailing/auth", timeout=120,
+                                   json={"username": username, "password": f"{password}-burst-{i}"}).status_code
+        except requests.RequestException:
+            status = 0
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    def burst():
+        with ThreadPoolExecutor(max_workers=login_concurrency) as pool:
+            list(pool.map(attempt, range(logins)))
+
+    burst_thread = threading.Thread(target=burst, daemon=True)
+    started = time.perf_counter()
+    burst_thread.start()
+    loaded = run_load(base_url, cookies, scenarios, concurrency, total_requests, seed)
+    burst_thread.join()
+    wall = time.perf_counter() - started
+
+    login_summary = summarise(latencies, statuses, wall, 0)
+    # 401 is the expected answer; only 503 (hashing queue full) and transport errors count
+    login_summary["errors"] = sum(1 for s in statuses if s not in (401,))
+    login_summary["rejected_busy"] = statuses.count(503)
+    return {"concurrency": concurrency, "logins": logins, "login_concurrency": login_concurrency,
+            "quiet": quiet["overall"], "during_burst": loaded["overall"], "login": login_summary}
+
+# ==============================================
+# REPORTING
+# ==============================================
+
+# ==============================================
+# PAYLOAD ENCODING
+# ==============================================
+
+def build_large_payload(target_mb: float, seed: int) -> Dict:
+    """getMetricRating-shaped response with filteredReviews, grown to roughly target_mb of JSON"""
+    rng = random.Random(seed)
+    words = " ".join(SEARCH_QUERIES + SHEETS).lower().split()
+    results, size, i = [], 0, 0
+    while size < target_mb * 1e6:
+        reviews = [" ".join(rng.choices(words, k=rng.randint(8, 40))) for _ in range(50)]
+        results.append({"sailingNumber": f"SAIL-{i}", "metric": METRICS[i % len(METRICS)],
+                        "rating": round(rng.uniform(5, 10), 2), "filteredReviews": reviews,
+                        "ratings": [rng.randint(1, 10) for _ in range(50)]})
+        size += sum(len(r) + 3 for r in reviews) + 250
+        i += 1
+    return {"status": "success", "results": results, "filterBelow": 6, "comparedToAverage": True}
+
+
+def payload_benchmark(target_mb: float, repeats: int, seed: int, link_mbps: float = 100.0) -> Dict:
+    """
+    Time jsonify + transfer encoding through the Flask test client for both
+    stacks; total_ms adds the time to send the body over a link_mbps link.
+    """
+    from flask import Flask, jsonify
+    from http_encoding import install_http_encoding
+
+    payload = build_large_payload(target_mb, seed)
+    variants = {"stdlib": ({}, None), "fast": ({}, 1024)}
+    variants["fast+gzip"] = ({"Accept-Encoding": "gzip"}, 1024)
+    try:
+        import brotli  # noqa: F401
+        variants["fast+br"] = ({"Accept-Encoding": "br"}, 1024)
+    except ImportError:
+        pass
+
+    result = {}
+    for name, (headers, min_size) in variants.items():
+        app = Flask(f"payload-{name}")
+        if min_size is not None:
+            install_http_encoding(app, min_size)
+        app.add_url_rule("/payload", "payload", lambda: jsonify(payload))
+        client = app.test_client()
+        timings, body_bytes = [], 0
+        for _ in range(repeats):
+            started = time.perf_counter()
+            response = client.get("/payload", headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            body_bytes = len(response.data)
+        timings.sort()
+        p50 = percentile(timings, 50)
+        result[name] = {"p50_ms": round(p50, 2), "bytes": body_bytes,
+                        "total_ms": round(p50 + body_bytes * 8 / (link_mbps * 1e3), 2)}
+    return result
+
+
+def print_payload_report(payload: Dict):
+    print(f"\n📦 {'encoder':<12} {'p50 ms':>10} {'bytes':>12} {'+link ms':>10}")
+    for name, s in payload.items():
+        print(f"   {name:<12} {s['p50_ms']:>10.2f} {s['bytes']:>12,} {s['total_ms']:>10.2f}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_login_burst_report(burst: Dict):
+    print(f"\n🔐 {burst['logins']} logins from {burst['login_concurrency']} threads "
+          f"against the data mix at concurrency {burst['concurrency']}")
+    header = f"{'':<14} {'req':>6} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for name in ("quiet", "during_burst", "login"):
+        s = burst[name]
+        print(f"{name:<14} {s['requests']:>6} {s['errors']:>5} {s['throughput_rps'] or 0:>9.1f} "
+              f"{s['p50_ms'] or 0:>9.2f} {s['p95_ms'] or 0:>9.2f} {s['p99_ms'] or 0:>9.2f}")
+    if burst["login"].get("rejected_busy"):
+        print(f"   {burst['login']['rejected_busy']} logins refused with 503 (hashing queue full)")
+
+
+def print_report(result: Dict):
+    if result.get("payload"):
+        print_payload_report(result["payload"])
+    if result.get("login_burst"):
+        print_login_burst_report(result["login_burst"])
+    if not result["levels"]:
+        return
+    print(f"\n📊 {result['label']} @ {result.get('git_revision')}  (boot {result['boot_seconds']:.2f}s)")
+    header = f"{'conc':>5} {'endpoint':<24} {'req':>6} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for level in result["levels"]:
+        rows = [("ALL", level["overall"])] + sorted(level["endpoints"].items())
+        for name, s in rows:
+            print(f"{level['concurrency']:>5} {name:<24} {s['requests']:>6} {s['errors']:>5} "
+                  f"{s['throughput_rps'] or 0:>9.1f} {s['p50_ms'] or 0:>9.2f} {s['p95_ms'] or 0:>9.2f} {s['p99_ms'] or 0:>9.2f}")
+
+
+def compare_results(old_path: str, new_path: str):
+    """Print the relative change of p50/p95/p99 and throughput between two result files"""
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    old_levels = {l["concurrency"]: l for l in old["levels"]}
+
+    def delta(a, b):
+        if a in (None, 0) or b is None:
+            return "   n/a"
+        return f"{(b - a) / a * 100:+6.1f}%"
+
+    print(f"Comparing {old['label']} ({old.get('git_revision')}) -> {new['label']} ({new.get('git_revision')})")
+    print(f"{'conc':>5} {'endpoint':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}")
+    for level in new["levels"]:
+        base = old_levels.get(level["concurrency"])
+        if not base:
+            continue
+        rows = [("ALL", level["overall"], base["overall"])]
+        rows += [(n, s, base["endpoints"].get(n, {})) for n, s in sorted(level["endpoints"].items())]
+        for name, s, b in rows:
+            print(f"{level['concurrency']:>5} {name:<24} {delta(b.get('p50_ms'), s['p50_ms']):>8} "
+                  f"{delta(b.get('p95_ms'), s['p95_ms']):>8} {delta(b.get('p99_ms'), s['p99_ms']):>8} "
+                  f"{delta(b.get('throughput_rps'), s['throughput_rps']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end HTTP benchmark for the /sailing API")
+    parser.add_argument("--label", default=datetime.now().strftime("run-%Y%m%d-%H%M%S"))
+    parser.add_argument("--output", default=None, help="Result JSON path (default bench_results/<label>.json)")
+    parser.add_argument("--workdir", default=None, help="Workspace to boot the app from (default: temp dir)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--ollama-latency-ms", type=float, default=0.0)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument("--guests-per-sailing", type=int, default=150)
+    parser.add_argument("--endpoints", default=None, help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--username", default="superadmin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    parser.add_argument("--payload-mb", type=float, default=0, help="Also time encoding of an N MB response")
+    parser.add_argument("--payload-repeats", type=int, default=5)
+    parser.add_argument("--payload-link-mbps", type=float, default=100.0, help="Link speed for the +link column")
+    parser.add_argument("--payload-only", action="store_true", help="Skip the HTTP load levels")
+    parser.add_argument("--login-burst", type=int, default=0, help="Also run N logins during the data mix")
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--auth-workers", type=int, default=None, help="CRUISE_AUTH_WORKERS for the app")
+    parser.add_argument("--auth-max-pending", type=int, default=None, help="CRUISE_AUTH_MAX_PENDING for the app")
+    parser.add_argument("--gunicorn", action="store_true", help="Serve the app with gunicorn.conf.py")
+    parser.add_argument("--workers", type=int, default=None, help="CRUISE_WORKERS for --gunicorn")
+    parser.add_argument("--threads", type=int, default=None, help="CRUISE_THREADS for --gunicorn")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    payload = None
+    if args.payload_mb > 0:
+        print(f"📦 Encoding a {args.payload_mb} MB payload x{args.payload_repeats}")
+        payload = payload_benchmark(args.payload_mb, args.payload_repeats, args.seed, args.payload_link_mbps)
+    if args.payload_only:
+        result = {"label": args.label, "git_revision": git_revision(), "timestamp": datetime.now().isoformat(),
+                  "params": {k: v for k, v in vars(args).items() if k not in ("compare", "password")},
+                  "boot_seconds": 0.0, "payload": payload, "levels": []}
+        output = Path(args.output or f"bench_results/{args.label}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2))
+        print_report(result)
+        print(f"\n✅ Results written to {output}")
+        return
+
+    from ollama_stub_server import StubConfig, start_stub_server
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="cruise-bench-"))
+    print(f"🚢 Preparing workspace in {workdir}")
+    catalogue = prepare_workspace(workdir, args.guests_per_sailing, args.seed)
+
+    stub, _ = start_stub_server(port=args.ollama_port, config=StubConfig(latency_ms=args.ollama_latency_ms))
+    ollama_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    app_env = {"OLLAMA_URL": ollama_url}
+    if args.auth_workers is not None:
+        app_env["CRUISE_AUTH_WORKERS"] = str(args.auth_workers)
+    if args.auth_max_pending is not None:
+        app_env["CRUISE_AUTH_MAX_PENDING"] = str(args.auth_max_pending)
+    if args.workers is not None:
+        app_env["CRUISE_WORKERS"] = str(args.workers)
+    if args.threads is not None:
+        app_env["CRUISE_THREADS"] = str(args.threads)
+    proc, boot_seconds = boot_app(workdir, args.port, app_env, gunicorn=args.gunicorn)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        seed_sailings(workdir / "cruise_analytics.db", catalogue)
+        session = login(base_url, args.username, args.password)
+
+        scenarios = build_scenarios(catalogue)
+        if args.endpoints:
+            scenarios = {n: scenarios[n] for n in args.endpoints.split(",")}
+
+        levels = []
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            print(f"▶️  concurrency={concurrency} requests={args.requests}")
+            run_load(base_url, session.cookies, scenarios, concurrency, min(args.requests, 20), args.seed)  # warm-up
+            level = run_load(base_url, session.cookies, scenarios, concurrency, args.requests, args.seed)
+            level["concurrency"] = concurrency
+            levels.append(level)
+
+        login_burst = None
+        if args.login_burst > 0:
+            concurrency = max(int(c) for c in args.concurrency.split(","))
+            print(f"🔐 login burst: {args.login_burst} logins during the mix at concurrency={concurrency}")
+            login_burst = run_login_burst(base_url, session.cookies, scenarios, concurrency, args.requests,
+                                          args.login_burst, args.login_concurrency, args.username,
+                                          args.password, args.seed)
+            login_burst["auth_workers"] = args.auth_workers
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        stub.shutdown()
+
+    result = {
+        "label": args.label,
+        "git_revision": git_revision(),
+        "timestamp": datetime.now().isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("compare", "password")},
+        "boot_seconds": boot_seconds,
+        "ollama_stub": stub.stub_config.snapshot(),
+        "payload": payload,
+        "levels": levels,
+        "login_burst": login_burst,
+    }
+    output = Path(args.output or f"bench_results/{args.label}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print_report(result)
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,111 @@ Loads the rating summary data that matches your test_data.py structure
 """
 
 import pandas as pd
+import argparse
+import gzip
 import json
 from datetime import datetime
 import os
+import threading
+
+# Source column -> output key for each loader. Order defines the record layout.
+RATING_SUMMARY_COLUMNS = {c: c for c in [
+    'Sailing Number', 'Ship Name', 'Fleet', 'Start', 'End', 'Overall Holiday',
+    'Prior Customer Service', 'Flight', 'Embarkation/Disembarkation', 'Value for Money',
+    'App Booking', 'Pre-Cruise Hotel Accommodation', 'Cabins', 'Cabin Cleanliness',
+    'F&B Quality', 'F&B Service', 'Bar Service', 'Drinks Offerings and Menu',
+    'Entertainment', 'Excursions', 'Crew Friendliness',
+    'Ship Condition/Cleanliness (Public Areas)', 'Sentiment Score',
+]}
+
+SAILING_SUMMARY_COLUMNS = {
+    'Sailing_Number': 'Sailing Number',
+    'Fleet': 'Fleet',
+    'Ship': 'Ship',
+    'Itinerary': 'Itinerary',
+    'Start_Date': 'Start Date',
+    'End_Date': 'End Date',
+    'Duration_Days': 'Duration Days',
+    'Destination': 'Destination',
+    'Ports_Visited': 'Ports Visited',
+    'Total_Guests': 'Total Guests',
+    'Occupancy_Rate': 'Occupancy Rate',
+    'Weather_Conditions': 'Weather Conditions',
+    'Sea_Conditions': 'Sea Conditions',
+    'Guest_Satisfaction_Avg': 'Guest Satisfaction Avg',
+}
+
+METRICS_DEFINITION_COLUMNS = {
+    'Metric_Name': 'Metric Name',
+    'Category': 'Category',
+    'Description': 'Description',
+    'Calculation_Method': 'Calculation Method',
+    'Target_Value': 'Target Value',
+    'Current_Value': 'Current Value',
+    'Trend': 'Trend',
+    'Last_Updated': 'Last Updated',
+}
+
+FLEET_SHIP_COLUMNS = {'Fleet': 'Fleet', 'Ship': 'Ship'}
+
+# Loaded datasets keyed by (absolute path, column map); entries are
+# invalidated when the file's mtime or size changes. Misses are filled under
+# _CACHE_LOCK so concurrent callers read each file version only once.
+_DATASET_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def clear_dataset_cache():
+    """Drop all cached frames and records"""
+    with _CACHE_LOCK:
+        _DATASET_CACHE.clear()
+
+
+def _cache_entry(csv_path, column_map, string_columns=()):
+    """
+    Read csv_path once per file version, keeping only the mapped columns
+    (renamed to their output keys). Returns the shared cache entry; its
+    frame and records must not be modified.
+    """
+    key = (os.path.abspath(csv_path), tuple(column_map.items()))
+    stat = os.stat(csv_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _DATASET_CACHE.get(key)
+    if entry is not None and entry['signature'] == signature:
+        return entry
+    with _CACHE_LOCK:
+        entry = _DATASET_CACHE.get(key)
+        if entry is None or entry['signature'] != signature:
+            df = pd.read_csv(csv_path, usecols=list(column_map),
+                             dtype={c: str for c in string_columns})
+            df = df[list(column_map)].rename(columns=column_map)
+            entry = {'signature': signature, 'frame': df, 'records': None}
+            _DATASET_CACHE[key] = entry
+    return entry
+
+
+def load_csv_frame(csv_path, column_map, string_columns=()):
+    """Cached, column-mapped DataFrame for csv_path (treat as read-only)"""
+    return _cache_entry(csv_path, column_map, string_columns)['frame']
+
+
+def frame_to_records(df):
+    """Vectorized DataFrame -> list of dicts with NaN mapped to None"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _load_records(csv_path, column_map, string_columns=()):
+    """Fresh list of record dicts; the cached converted records stay frozen in a tuple"""
+    entry = _cache_entry(csv_path, column_map, string_columns)
+    records = entry['records']
+    if records is None:
+        with _CACHE_LOCK:
+            if entry['records'] is None:
+                entry['records'] = tuple(frame_to_records(entry['frame']))
+            records = entry['records']
+    return [dict(record) for record in records]
+
 
 def load_rating_summary_csv(csv_path="./test_data/cruise_ratings_summary.csv"):
     """
@@ -15,38 +117,7 @@ def load_rating_summary_csv(csv_path="./test_data/cruise_ratings_summary.csv"):
     Returns data in the same format as your test_data.py
     """
     try:
-        df = pd.read_csv(csv_path)
-        
-        # Convert DataFrame to list of dictionaries (same as your test_data.py format)
-        rating_data = []
-        for _, row in df.iterrows():
-            record = {
-                'Sailing Number': str(row['Sailing Number']),
-                'Ship Name': row['Ship Name'],
-                'Fleet': row['Fleet'],
-                'Start': row['Start'],
-                'End': row['End'],
-                'Overall Holiday': row['Overall Holiday'],
-                'Prior Customer Service': row['Prior Customer Service'] if pd.notna(row['Prior Customer Service']) else None,
-                'Flight': row['Flight'],
-                'Embarkation/Disembarkation': row['Embarkation/Disembarkation'],
-                'Value for Money': row['Value for Money'],
-                'App Booking': row['App Booking'],
-                'Pre-Cruise Hotel Accommodation': row['Pre-Cruise Hotel Accommodation'] if pd.notna(row['Pre-Cruise Hotel Accommodation']) else None,
-                'Cabins': row['Cabins'],
-                'Cabin Cleanliness': row['Cabin Cleanliness'],
-                'F&B Quality': row['F&B Quality'],
-                'F&B Service': row['F&B Service'],
-                'Bar Service': row['Bar Service'],
-                'Drinks Offerings and Menu': row['Drinks Offerings and Menu'],
-                'Entertainment': row['Entertainment'],
-                'Excursions': row['Excursions'],
-                'Crew Friendliness': row['Crew Friendliness'],
-                'Ship Condition/Cleanliness (Public Areas)': row['Ship Condition/Cleanliness (Public Areas)'],
-                'Sentiment Score': row['Sentiment Score']
-            }
-            rating_data.append(record)
-        
+        rating_data = _load_records(csv_path, RATING_SUMMARY_COLUMNS, string_columns=['Sailing Number'])
         print(f"Loaded {len(rating_data)} rating records from CSV")
         return rating_data
         
@@ -59,18 +130,13 @@ def load_fleet_ship_csv(csv_path="./test_data/fleet_ship_data.csv"):
     Load fleet and ship data from CSV file
     """
     try:
-        df = pd.read_csv(csv_path)
+        df = load_csv_frame(csv_path, FLEET_SHIP_COLUMNS)
         
         # Group ships by fleet
-        fleet_data = []
-        fleets = df.groupby('Fleet')
-        
-        for fleet_name, ships_df in fleets:
-            ships = ships_df['Ship'].tolist()
-            fleet_data.append({
-                'fleet': fleet_name.lower(),
-                'ships': ships
-            })
+        fleet_data = [
+            {'fleet': fleet_name.lower(), 'ships': ships}
+            for fleet_name, ships in df.groupby('Fleet')['Ship'].agg(list).items()
+        ]
         
         print(f"Loaded {len(fleet_data)} fleets with ships")
         return fleet_data
@@ -84,28 +150,7 @@ def load_sailing_summary_csv(csv_path="./test_data/sailing_summary.csv"):
     Load sailing summary data from CSV file
     """
     try:
-        df = pd.read_csv(csv_path)
-        
-        sailing_data = []
-        for _, row in df.iterrows():
-            record = {
-                'Sailing Number': str(row['Sailing_Number']),
-                'Fleet': row['Fleet'],
-                'Ship': row['Ship'],
-                'Itinerary': row['Itinerary'],
-                'Start Date': row['Start_Date'],
-                'End Date': row['End_Date'],
-                'Duration Days': row['Duration_Days'],
-                'Destination': row['Destination'],
-                'Ports Visited': row['Ports_Visited'],
-                'Total Guests': row['Total_Guests'],
-                'Occupancy Rate': row['Occupancy_Rate'],
-                'Weather Conditions': row['Weather_Conditions'],
-                'Sea Conditions': row['Sea_Conditions'],
-                'Guest Satisfaction Avg': row['Guest_Satisfaction_Avg']
-            }
-            sailing_data.append(record)
-        
+        sailing_data = _load_records(csv_path, SAILING_SUMMARY_COLUMNS, string_columns=['Sailing_Number'])
         print(f"Loaded {len(sailing_data)} sailing records")
         return sailing_data
         
@@ -118,22 +163,7 @@ def load_metrics_definitions_csv(csv_path="./test_data/metrics_definitions.csv")
     Load metrics definitions from CSV file
     """
     try:
-        df = pd.read_csv(csv_path)
-        
-        metrics_data = []
-        for _, row in df.iterrows():
-            record = {
-                'Metric Name': row['Metric_Name'],
-                'Category': row['Category'],
-                'Description': row['Description'],
-                'Calculation Method': row['Calculation_Method'],
-                'Target Value': row['Target_Value'],
-                'Current Value': row['Current_Value'],
-                'Trend': row['Trend'],
-                'Last Updated': row['Last_Updated']
-            }
-            metrics_data.append(record)
-        
+        metrics_data = _load_records(csv_path, METRICS_DEFINITION_COLUMNS)
         print(f"Loaded {len(metrics_data)} metric definitions")
         return metrics_data
         
@@ -141,82 +171,136 @@ def load_metrics_definitions_csv(csv_path="./test_data/metrics_definitions.csv")
         print(f"Error loading metrics definitions CSV: {e}")
         return []
 
-def export_to_json():
+def iter_csv_records(csv_path, column_map, string_columns=(), chunksize=50000):
+    """
+    Stream column-mapped records from csv_path, chunksize rows at a time,
+    without loading (or caching) the whole file
+    """
+    for chunk in pd.read_csv(csv_path, usecols=list(column_map), chunksize=chunksize,
+                             dtype={c: str for c in string_columns}):
+        yield from frame_to_records(chunk[list(column_map)].rename(columns=column_map))
+
+
+def iter_fleet_records(csv_path="./test_data/fleet_ship_data.csv", chunksize=50000):
+    """
+    Stream fleet/ship grouping; only the distinct ships of each fleet are
+    kept, so memory grows with ship count, not row count (a ship repeated
+    on several rows is listed once, in first-seen order)
+    """
+    fleets = {}
+    for chunk in pd.read_csv(csv_path, usecols=list(FLEET_SHIP_COLUMNS), chunksize=chunksize):
+        for fleet_name, ship in chunk[['Fleet', 'Ship']].drop_duplicates().itertuples(index=False):
+            fleets.setdefault(fleet_name, {})[ship] = None
+    for fleet_name in sorted(fleets):
+        yield {'fleet': fleet_name.lower(), 'ships': list(fleets[fleet_name])}
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', encoding='utf-8')
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(',', ':'), default=str)
+
+
+def export_to_json(output_dir='./test_data', compress=False, chunksize=50000):
     """
     Export all CSV data to JSON files for easy backend integration
+
+    Records are streamed chunk by chunk, so memory stays constant regardless
+    of row count. Writes one JSON Lines file per dataset plus a compact
+    combined file (apollo_data_combined.json) in the same pass, so each CSV
+    is read and each record encoded once; compress=True gzips all of them.
+    Each file is written to <path>.tmp and renamed into place only once every
+    file is complete, so a failed export leaves the previous files intact.
     """
+    datasets = [
+        ('rating_summary', lambda: iter_csv_records('./test_data/cruise_ratings_summary.csv', RATING_SUMMARY_COLUMNS,
+                                                    ['Sailing Number'], chunksize)),
+        ('fleet_ships', lambda: iter_fleet_records('./test_data/fleet_ship_data.csv', chunksize)),
+        ('sailing_summary', lambda: iter_csv_records('./test_data/sailing_summary.csv', SAILING_SUMMARY_COLUMNS,
+                                                     ['Sailing_Number'], chunksize)),
+        ('metrics_definitions', lambda: iter_csv_records('./test_data/metrics_definitions.csv',
+                                                         METRICS_DEFINITION_COLUMNS, (), chunksize)),
+    ]
+    suffix = '.gz' if compress else ''
+    outputs = [os.path.join(output_dir, f'{name}.jsonl{suffix}') for name, _ in datasets]
+    outputs.append(os.path.join(output_dir, f'apollo_data_combined.json{suffix}'))
     try:
-        # Load all data
-        rating_data = load_rating_summary_csv()
-        fleet_data = load_fleet_ship_csv()
-        sailing_data = load_sailing_summary_csv()
-        metrics_data = load_metrics_definitions_csv()
-        
-        # Export to JSON files
-        with open('./test_data/rating_summary.json', 'w') as f:
-            json.dump(rating_data, f, indent=2)
-        
-        with open('./test_data/fleet_ships.json', 'w') as f:
-            json.dump(fleet_data, f, indent=2)
-        
-        with open('./test_data/sailing_summary.json', 'w') as f:
-            json.dump(sailing_data, f, indent=2)
-        
-        with open('./test_data/metrics_definitions.json', 'w') as f:
-            json.dump(metrics_data, f, indent=2)
-        
-        print("Successfully exported all data to JSON files")
-        
-        # Also create a combined data file for the backend
-        combined_data = {
-            'rating_summary': rating_data,
-            'fleet_ships': fleet_data,
-            'sailing_summary': sailing_data,
-            'metrics_definitions': metrics_data,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('./test_data/apollo_data_combined.json', 'w') as f:
-            json.dump(combined_data, f, indent=2)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # JSON Lines files (one record per line) and the compact combined data
+        # file for the backend, both written incrementally
+        counts = {}
+        with _open_output(f"{outputs[-1]}.tmp", compress) as combined:
+            combined.write('{')
+            for (name, records), path in zip(datasets, outputs):
+                combined.write(f'"{name}":[')
+                with _open_output(f"{path}.tmp", compress) as f:
+                    count = 0
+                    for record in records():
+                        line = _dumps(record)
+                        f.write(line)
+                        f.write('\n')
+                        if count:
+                            combined.write(',')
+                        combined.write(line)
+                        count += 1
+                combined.write('],')
+                counts[name] = count
+                print(f"Exported {count} {name} records")
+            combined.write(f'"last_updated":{_dumps(datetime.now().isoformat())}}}')
+        for path in outputs:
+            os.replace(f"{path}.tmp", path)
         
+        print("Successfully exported all data to JSON Lines files")
         print("Created combined Apollo data file: apollo_data_combined.json")
+        return counts
         
     except Exception as e:
+        for path in outputs:
+            try:
+                os.remove(f"{path}.tmp")
+            except OSError:
+                pass
         print(f"Error exporting to JSON: {e}")
 
-def get_sailing_numbers():
+def get_sailing_numbers(csv_path="./test_data/cruise_ratings_summary.csv"):
     """
     Get all unique sailing numbers from the data
     """
-    rating_data = load_rating_summary_csv()
-    sailing_numbers = list(set([r['Sailing Number'] for r in rating_data]))
+    df = load_csv_frame(csv_path, RATING_SUMMARY_COLUMNS, string_columns=['Sailing Number'])
+    sailing_numbers = df['Sailing Number'].dropna().unique().tolist()
     print(f"Available sailing numbers: {sailing_numbers}")
     return sailing_numbers
 
-def get_ships_for_sailing(sailing_number="1"):
+def get_ships_for_sailing(sailing_number="1", csv_path="./test_data/cruise_ratings_summary.csv"):
     """
     Get all ships for a specific sailing number
     """
-    rating_data = load_rating_summary_csv()
-    ships = [r['Ship Name'] for r in rating_data if r['Sailing Number'] == sailing_number]
+    df = load_csv_frame(csv_path, RATING_SUMMARY_COLUMNS, string_columns=['Sailing Number'])
+    ships = df.loc[df['Sailing Number'] == str(sailing_number), 'Ship Name'].tolist()
     print(f"Ships for sailing {sailing_number}: {len(ships)} ships")
     return ships
 
-def validate_data_consistency():
+def validate_data_consistency(rating_csv="./test_data/cruise_ratings_summary.csv",
+                              fleet_csv="./test_data/fleet_ship_data.csv",
+                              sailing_csv="./test_data/sailing_summary.csv"):
     """
     Validate that the CSV data is consistent with your test_data.py structure
     """
     print("Validating Apollo data consistency...")
     
-    rating_data = load_rating_summary_csv()
-    fleet_data = load_fleet_ship_csv()
-    sailing_data = load_sailing_summary_csv()
+    # Each file is read once per version and cached (load_csv_frame)
+    rating_df = load_csv_frame(rating_csv, RATING_SUMMARY_COLUMNS, string_columns=['Sailing Number'])
+    fleet_df = load_csv_frame(fleet_csv, FLEET_SHIP_COLUMNS)
+    sailing_df = load_csv_frame(sailing_csv, SAILING_SUMMARY_COLUMNS, string_columns=['Sailing_Number'])
     
     # Check if all ships in rating data exist in fleet data
-    rating_ships = set([r['Ship Name'] for r in rating_data])
-    fleet_ships = set()
-    for fleet in fleet_data:
-        fleet_ships.update(fleet['ships'])
+    rating_ships = set(rating_df['Ship Name'].dropna().unique())
+    fleet_ships = set(fleet_df['Ship'].dropna().unique())
     
     missing_ships = rating_ships - fleet_ships
     if missing_ships:
@@ -225,8 +309,8 @@ def validate_data_consistency():
         print("✅ All ships in rating data exist in fleet data")
     
     # Check sailing numbers consistency
-    rating_sailings = set([r['Sailing Number'] for r in rating_data])
-    sailing_sailings = set([str(s['Sailing Number']) for s in sailing_data])
+    rating_sailings = set(rating_df['Sailing Number'].dropna().unique())
+    sailing_sailings = set(sailing_df['Sailing Number'].dropna().unique())
     
     if rating_sailings == sailing_sailings:
         print("✅ Sailing numbers are consistent across datasets")
@@ -234,13 +318,19 @@ def validate_data_consistency():
         print(f"⚠️  Sailing number mismatch: Rating={rating_sailings}, Sailing={sailing_sailings}")
     
     print(f"📊 Data Summary:")
-    print(f"   - Rating records: {len(rating_data)}")
-    print(f"   - Fleet groups: {len(fleet_data)}")
-    print(f"   - Sailing records: {len(sailing_data)}")
+    print(f"   - Rating records: {len(rating_df)}")
+    print(f"   - Fleet groups: {fleet_df['Fleet'].nunique()}")
+    print(f"   - Sailing records: {len(sailing_df)}")
     print(f"   - Ships total: {len(fleet_ships)}")
     print(f"   - Sailing numbers: {len(rating_sailings)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate and export Apollo CSV data")
+    parser.add_argument("--output-dir", default="./test_data")
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the exported files")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    args = parser.parse_args()
+
     print("🚢 Apollo Cruise Analytics - CSV Data Loader")
     print("=" * 50)
     
@@ -250,11 +340,11 @@ if __name__ == "__main__":
     print("\n" + "=" * 50)
     
     # Export to JSON for backend integration
-    export_to_json()
+    export_to_json(args.output_dir, compress=args.gzip, chunksize=args.chunksize)
     
     print("\n" + "=" * 50)
     print("✅ Data loading complete!")
     print("\nTo use this data in your backend:")
-    print("1. Use the generated JSON files in ./test_data/")
+    print(f"1. Use the generated JSON Lines files in {args.output_dir}/")
     print("2. Update your flask backend to load from these files")
     print("3. The data structure matches your existing test_data.py format")
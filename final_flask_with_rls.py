@@ -1,14 +1,26 @@
-from flask import Flask, request, jsonify, abort, session
+from flask import Flask, Response, request, jsonify, abort, session
 from flask_cors import CORS
 from typing import Dict, List
 from test_data import *
 from navigate_search import *
-import util as UT
+from rating_rollups import TREND_INTERVALS
+from rating_metrics import DISTRIBUTION_GROUPS, TREND_GROUPS, filtered_metric_trend, iter_metric_results, metric_distribution
+from response_cache import file_signature
+from instrumentation import install_instrumentation, span, timed
+from http_encoding import install_http_encoding, ndjson_response, wants_ndjson
+from pagination import InvalidCursor, clamp_limit, page_request
+from segment_cube import SEGMENT_DIMENSIONS, load_segment_cube
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from query_log import QUERY_LOG
+from auth_store import HashingBusy, PasswordVerifier
+from app_runtime import (AUTH_USERS, DATASETS, RESPONSE_CACHE, SEGMENT_CSV, current_dataset, register_password_metrics,
+                         require_internal_access)
+import os
 import pandas as pd
 import yaml
 from werkzeug.security import check_password_hash, generate_password_hash
-from pathlib import Path
 import sql_ops_rls as SQLOP
+import sql_ops as COMMENTS_DB  # comments/issues store with the FTS5 index
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'
@@ -28,6 +40,15 @@ CORS(app, resources={
     }
 })
 
+# Per-request spans -> Server-Timing header and "cruise.timing" log lines;
+# CRUISE_PROFILING=1 enables the X-Profile sampling profiler.
+# Installed first so its after_request hook also times compression.
+install_instrumentation(app, modules={"sql": SQLOP, "comments_db": COMMENTS_DB})
+
+# Fast JSON for jsonify() and gzip/brotli for bodies of at least
+# CRUISE_COMPRESS_MIN_BYTES (0 disables compression)
+install_http_encoding(app, int(os.environ.get("CRUISE_COMPRESS_MIN_BYTES", "1024")))
+
 METRIC_ATTRIBUTES_OLD = ['Ship overall', 'Ship rooms', 'F&B quality overall',
        'F&B service overall', 'F&B quality main dining', 'Entertainment',
        'Excursions', 'drinks offerings', 'bar service', 'cabin cleanliness',
@@ -46,31 +67,45 @@ SHEET_LIST = ["Ports and Excursions", "Other Feedback", "Entertainment",
                "Bars", "Dining", "What went well", "What else"
               ]
 
-# Sample data matching your structure
-SAMPLE_DATA = get_summary_data()
-
-AUTH_FILE = Path("sailing_auth.yaml")
-def load_auth_data():
-    """Load authentication data from YAML file"""
-    if not AUTH_FILE.exists():
-        raise FileNotFoundError(f"Auth file not found at {AUTH_FILE}")
-    
-    with open(AUTH_FILE, 'r') as f:
-        return yaml.safe_load(f)
-
-SAILING_DATA, SAILING_REASON = load_sailing_data_rate_reason()
-
-def get_sailing_df(ship: str, sailing_number: str):
-    """Helper to get DataFrame for specific sailing"""
-    key = f"{ship}_{sailing_number}"
-    key = key.lower()
-    return SAILING_DATA.get(key)
+# Sailing datasets, response cache, segment data, login store and the
+# scrape-time metrics are shared with final_flask_without_rls.py (app_runtime)
 
-def get_sailing_df_reason(ship: str, sailing_number: str):
-    """Helper to get DataFrame for specific sailing"""
-    key = f"{ship}_{sailing_number}"
-    key = key.lower()
-    return SAILING_REASON.get(key)
+def cache_access_key():
+    """Effective access set for cache keys: superadmins all see everything, other users are keyed individually"""
+    role = session.get('role')
+    if role == 'superadmin':
+        return (role,)
+    return (session.get('user_id'), role)
+
+def cache_data_version():
+    """Dataset generation plus the RLS database file state (grants and ingests change it)"""
+    return (DATASETS.version, file_signature(SQLOP.db_manager.db_path))
+
+def verify_credential(password_hash, password):
+    """Werkzeug-format hashes (YAML users) or the DatabaseManager salt:hex format"""
+    if "$" not in password_hash:
+        return SQLOP.db_manager.verify_password(password, password_hash)
+    try:
+        return check_password_hash(password_hash, password)
+    except ValueError:
+        # Hash methods werkzeug cannot check (e.g. bcrypt) never match
+        return False
+
+# PBKDF2 checks run on a bounded pool with a short-lived cache of verified logins
+# (CRUISE_AUTH_WORKERS, CRUISE_AUTH_MAX_PENDING, CRUISE_AUTH_CACHE_TTL)
+PASSWORDS = PasswordVerifier(verify_credential)
+register_password_metrics(PASSWORDS)
+
+def visible_ships(requested=None) -> List[str]:
+    """
+    Ships of the request the current session may see (case-insensitive),
+    or every accessible ship when none are requested (RLS via fetch_ships)
+    """
+    accessible = [ship for fleet in SQLOP.fetch_ships() for ship in fleet["ships"]]
+    if not requested:
+        return accessible
+    allowed = {ship.lower() for ship in accessible}
+    return [ship for ship in requested if ship.lower() in allowed]
 
 def generate_rating_text(score: float, attribute: str) -> str:
     """Generate realistic rating text based on score"""
@@ -85,19 +120,11 @@ def generate_rating_text(score: float, attribute: str) -> str:
 
 def find_sailings(sailings: List[Dict]) -> List[Dict]:
     """Filter sample data based on requested sailings"""
-    results = []
-    for sailing in sailings:
-        ship = sailing.get("shipName")
-        number = sailing.get("sailingNumber")
-        found = next(
-            (item for item in SAMPLE_DATA 
-             if item["Ship Name"].lower() == ship.lower() and item["Sailing Number"].lower() == number.lower()),
-            None
-        )
-        if found:
-            results.append(found)
-    return results
+    summary = current_dataset().summary
+    rows = (summary.find(sailing.get("shipName"), sailing.get("sailingNumber")) for sailing in sailings)
+    return summary.records(row for row in rows if row is not None)
 
+@timed("filter_sailings")
 def filter_sailings(data):
     filter_by = data.get("filter_by", "sailing")
     print("in filter_sailings")
@@ -119,30 +146,16 @@ def filter_sailings(data):
             if not from_date or not to_date:
                 return -2
 
-            results = [
-                item for item in SAMPLE_DATA
-                if pd.to_datetime(item["Start"]) >= from_date and pd.to_datetime(item["End"]) <= to_date
-            ]
+            # Vectorized date filter over the summary columns
+            results = current_dataset().summary.between(from_date, to_date)
         else:
             return -3
     else:
         return -4
 
-    results = {frozenset(item.items()): item for item in results}.values()
+    results = list({item.row: item for item in results}.values())
     return results
 
-import math
-
-def is_empty_or_nan(value):
-    """Check if a value is None, NaN, or empty"""
-    if value is None:
-        return True
-    if isinstance(value, float) and math.isnan(value):
-        return True
-    if isinstance(value, (list, tuple, str, dict)):
-        return len(value) < 1
-    return False
-
 def require_role(allowed_roles):
     """Decorator to require specific roles"""
     def decorator(f):
@@ -166,24 +179,47 @@ def require_role(allowed_roles):
 def set_rls_context():
     """Set RLS context for each request"""
     # Skip for auth endpoint and static files
-    if request.endpoint in ['authenticate', 'handle_options'] or not request.path.startswith('/sailing'):
+    if request.endpoint in ['authenticate', 'handle_options', 'get_check', 'get_ready', 'get_internal_metrics', 'get_internal_queries'] or not request.path.startswith('/sailing'):
         return
     
     user_id = session.get('user_id')
     username = session.get('username')
     role = session.get('role')
     
-    if user_id and username and role:
-        SQLOP.db_manager.set_user_session(user_id, username, role)
-    else:
-        # Clear session if no valid user
-        SQLOP.db_manager.clear_user_session()
+    with span("rls.context"):
+        if user_id and username and role:
+            SQLOP.db_manager.set_user_session(user_id, username, role)
+        else:
+            # Clear session if no valid user
+            SQLOP.db_manager.clear_user_session()
 
 # API Endpoints
 @app.route('/sailing/check', methods=['GET'])
 def get_check():
     return ("hi how are you")
 
+@app.route('/sailing/ready', methods=['GET'])
+def get_ready():
+    """Readiness probe: 200 once the sailing datasets are loaded, 503 while warming up"""
+    status = DATASETS.status()
+    status["search"] = "ready" if search_client_ready() else "pending"
+    return jsonify(status), (200 if DATASETS.is_ready() else 503)
+
+@app.route('/sailing/internal/metrics', methods=['GET'])
+def get_internal_metrics():
+    """Prometheus text-format metrics"""
+    require_internal_access()
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/sailing/internal/queries', methods=['GET'])
+def get_internal_queries():
+    """SQL statement shapes by total time (?scans=1: only shapes whose plan scans a table)"""
+    require_internal_access()
+    limit = request.args.get("limit", default=50, type=int)
+    scans_only = request.args.get("scans") == "1"
+    return jsonify({"slow_query_ms": QUERY_LOG.slow_ms,
+                    "shapes": QUERY_LOG.snapshot(limit, scans_only=scans_only)})
+
 @app.errorhandler(404)
 def not_found(e):
     return {"error": "Not Found"}, 404
@@ -235,67 +271,65 @@ def authenticate():
                 "error": "Username and password required"
             }), 400
         
-        # Try database first, then fallback to YAML
+        # One credential per login, so one hash: the database row, or the YAML
+        # entry for users not provisioned yet (or provisioned from an older YAML hash)
         db_user = SQLOP.get_user_by_username(username)
+        yaml_user = AUTH_USERS.get(username)
+        if yaml_user and (not db_user or "$" in db_user['password_hash']):
+            password_hash = yaml_user['password']
+        else:
+            yaml_user = None
+            password_hash = db_user['password_hash'] if db_user else None
         
-        if db_user and check_password_hash(db_user['password_hash'] if 'password_hash' in db_user else '', password):
-            # Database user
-            user_id = db_user['id']
-            role = db_user['role']
-            
-            # Set Flask session
-            session['user_id'] = user_id
-            session['username'] = username
-            session['role'] = role
-            
-            # Set RLS session context
-            SQLOP.db_manager.set_user_session(user_id, username, role)
-            
+        if not PASSWORDS.verify(username, password_hash, password):
             return jsonify({
-                "authenticated": True,
-                "user": username,
-                "role": role
-            })
-        else:
-            # Fallback to YAML auth
-            auth_data = load_auth_data()
-            user_data = auth_data['users'].get(username)
-            
-            if user_data and check_password_hash(user_data['password'], password):
-                # For YAML users, create or get from database
+                "authenticated": False,
+                "error": "Invalid credentials"
+            }), 401
+        
+        if yaml_user:
+            if not db_user or db_user['password_hash'] != password_hash or db_user['role'] != yaml_user['role']:
                 try:
-                    db_user = SQLOP.get_user_by_username(username)
-                    if not db_user:
-                        # Create user in database
-                        db_user = SQLOP.create_user(username, user_data['password'], user_data['role'])
-                        SQLOP.grant_default_access(db_user['id'], user_data['role'])
-                    
-                    user_id = db_user['id']
-                    role = user_data.get('role')
-                    
-                    session['user_id'] = user_id
-                    session['username'] = username
-                    session['role'] = role
-                    
-                    SQLOP.db_manager.set_user_session(user_id, username, role)
-                    
-                    return jsonify({
-                        "authenticated": True,
-                        "user": username,
-                        "role": role
-                    })
+                    db_user = SQLOP.provision_user(username, password_hash, yaml_user['role'])
+                    if db_user and db_user['created']:
+                        SQLOP.grant_default_access(db_user['id'], yaml_user['role'])
                 except Exception as e:
                     print(f"Error creating user: {e}")
                     return jsonify({
                         "authenticated": False,
                         "error": "Authentication system error"
                     }), 500
+                if db_user is None:
+                    # A deactivated account stays locked out even with a valid YAML entry
+                    return jsonify({
+                        "authenticated": False,
+                        "error": "Account is deactivated"
+                    }), 403
+            role = yaml_user['role']
+        else:
+            role = db_user['role']
+        
+        user_id = db_user['id']
+        
+        # Set Flask session
+        session['user_id'] = user_id
+        session['username'] = username
+        session['role'] = role
+        
+        # Set RLS session context
+        SQLOP.db_manager.set_user_session(user_id, username, role)
         
         return jsonify({
-            "authenticated": False,
-            "error": "Invalid credentials"
-        }), 401
+            "authenticated": True,
+            "user": username,
+            "role": role
+        })
         
+    except HashingBusy as e:
+        return jsonify({
+            "authenticated": False,
+            "error": str(e)
+        }), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({
             "authenticated": False,
@@ -346,8 +380,8 @@ def create_user():
         if session['role'] == 'admin' and role in ['superadmin', 'admin']:
             return jsonify({"error": "Admins can only create normal users"}), 403
         
-        # Create user (sql_ops_rls.py handles password hashing internally)
-        new_user = SQLOP.create_user(username, password, role)
+        # Create user (sql_ops_rls.py hashes the password; run on the hashing pool)
+        new_user = PASSWORDS.run(SQLOP.create_user, username, password, role)
         
         # Grant default access
         SQLOP.grant_default_access(new_user['id'], role)
@@ -360,6 +394,8 @@ def create_user():
                 "role": role
             }
         })
+    except HashingBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -472,6 +508,7 @@ def get_all_ships():
 # ==============================================
 
 @app.route('/sailing/fleets', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_fleets():
     """Endpoint to retrieve fleet names and the ships under each fleet"""
     return jsonify({
@@ -480,6 +517,7 @@ def get_fleets():
     })
 
 @app.route('/sailing/sheets', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_sheets():
     """Endpoint to retrieve sheet names"""
     return jsonify({
@@ -488,6 +526,7 @@ def get_sheets():
     })
 
 @app.route('/sailing/metrics', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_metrics():
     """Endpoint to retrieve various metrics related to sailing"""
     return jsonify({
@@ -496,8 +535,15 @@ def get_metrics():
     })
 
 @app.route('/sailing/sailing_numbers', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_sailing_numbers():
-    """Endpoint to retrieve sailing numbers with RLS filtering"""
+    """Endpoint to retrieve sailing numbers with RLS filtering (?limit=&cursor= for keyset pages)"""
+    page = page_request(request.args)
+    if page:
+        try:
+            return jsonify({"status": "success", **SQLOP.fetch_sailings_page(None, None, None, *page)})
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
     sailing_list = SQLOP.fetch_sailings(None, None, None)
     return jsonify({
         "status": "success",
@@ -517,6 +563,12 @@ def get_sailing_numbers_filter():
         end_date = None
     
     # RLS automatically filters accessible sailings
+    page = page_request(data)
+    if page:
+        try:
+            return jsonify({"status": "success", **SQLOP.fetch_sailings_page(ships_list, start_date, end_date, *page)})
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
     res = SQLOP.fetch_sailings(ships_list, start_date, end_date)
     
     return jsonify({
@@ -525,6 +577,7 @@ def get_sailing_numbers_filter():
     })
 
 @app.route('/sailing/getRatingSmry', methods=['POST'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_rating_summary():
     data = request.get_json()
     fleets = data.get("fleets")
@@ -579,52 +632,11 @@ def get_metric_comparison():
     if working_data == -4:
         return jsonify({"error": "Invalid filterBy value. Must be 'sailing' or 'date'"}), 400
 
-    results = []
-    all_metric_values = []
+    if wants_ndjson():
+        # Streaming mode: one record per sailing, constant memory per request
+        return ndjson_response(iter_metric_results(current_dataset(), working_data, metric, filter_below, compare_avg))
 
-    for sailing in working_data:
-        ship = sailing["Ship Name"]
-        number = sailing["Sailing Number"]
-        df = get_sailing_df(ship, number)
-        df_reason = get_sailing_df_reason(ship, number)
-        
-        if df is None or metric not in df.columns:
-            results.append({
-                "ship": ship,
-                "sailingNumber": number,
-                "error": "Data not found" if df is None else "Invalid metric"
-            })
-            continue
-        
-        metric_values = pd.to_numeric(df[metric], errors='coerce').dropna()
-        avg_rating = metric_values.mean()
-        all_metric_values.extend(metric_values.tolist())
-        
-        filtered_reviews = []
-        if filter_below is not None:
-            mask = df[metric].astype(float) <= filter_below
-            filtered_reviews = df_reason.loc[mask, metric].tolist()
-            for i, rev in enumerate(filtered_reviews):
-                if is_empty_or_nan(rev):
-                    filtered_reviews[i] = "Please refer to the comment"
-            filtered_metric = df.loc[mask, metric].tolist()
-        
-        results.append({
-            "ship": ship,
-            "sailingNumber": number,
-            "metric": metric,
-            "averageRating": round(avg_rating, 2),
-            "ratingCount": len(metric_values),
-            "filteredReviews": filtered_reviews,
-            "filteredMetric": filtered_metric,
-            "filteredCount": len(filtered_reviews)
-        })
-    
-    if compare_avg and all_metric_values:
-        overall_avg = sum(all_metric_values) / len(all_metric_values)
-        for result in results:
-            if "averageRating" in result:
-                result["comparisonToOverall"] = round(result["averageRating"] - overall_avg, 2)
+    results = list(iter_metric_results(current_dataset(), working_data, metric, filter_below, compare_avg))
     
     return jsonify({
         "status": "success",
@@ -634,7 +646,81 @@ def get_metric_comparison():
         "comparedToAverage": compare_avg
     })
 
+@app.route('/sailing/getMetricDistribution', methods=['POST'])
+def get_metric_distribution():
+    """Median, p10/p90 and 1-10 score histogram of a metric per ship, sailing, fleet or overall"""
+    data = request.get_json()
+
+    if not data or "filter_by" not in data or "metric" not in data:
+        return jsonify({"error": "Missing required parameters"}), 400
+
+    metric = data["metric"]
+    group_by = data.get("groupBy", "ship")
+    if metric not in METRIC_ATTRIBUTES:
+        return jsonify({
+            "error": "Metric must be a numeric field (not 'Review')",
+            "valid_metrics": METRIC_ATTRIBUTES
+        }), 400
+    if group_by not in DISTRIBUTION_GROUPS:
+        return jsonify({"error": f"groupBy must be one of {list(DISTRIBUTION_GROUPS)}"}), 400
+
+    working_data = filter_sailings(data)
+    if working_data == -1:
+        return jsonify({"error": "Sailings must be provided when filtering by sailing"}), 400
+    if working_data == -2:
+        return jsonify({"error": "Both fromDate and toDate must be provided when filtering by date"}), 400
+    if working_data == -3:
+        return jsonify({"error": "Filters must be provided when filtering by date"}), 400
+    if working_data == -4:
+        return jsonify({"error": "Invalid filterBy value. Must be 'sailing' or 'date'"}), 400
+
+    results = metric_distribution(current_dataset(), working_data, metric, group_by)
+
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "groupBy": group_by,
+        "results": results
+    })
+
+@app.route('/sailing/getMetricTrend', methods=['POST'])
+def get_metric_trend():
+    """Weekly/monthly/quarterly average and count of a metric per ship or fleet, optionally as a rolling window"""
+    data = request.get_json() or {}
+    metric = data.get("metric")
+    interval = data.get("interval", "month")
+    group_by = data.get("groupBy", "ship")
+    window = data.get("window")
+
+    if metric not in METRIC_ATTRIBUTES:
+        return jsonify({
+            "error": "Metric must be a numeric field (not 'Review')",
+            "valid_metrics": METRIC_ATTRIBUTES
+        }), 400
+    if interval not in TREND_INTERVALS:
+        return jsonify({"error": f"interval must be one of {list(TREND_INTERVALS)}"}), 400
+    if group_by not in TREND_GROUPS:
+        return jsonify({"error": "groupBy must be 'ship', 'fleet' or 'all'"}), 400
+    if window is not None and (not isinstance(window, int) or isinstance(window, bool) or window < 1):
+        return jsonify({"error": "window must be a positive number of periods"}), 400
+
+    # RLS: restrict to the ships this session may see
+    ships = visible_ships(data.get("ships"))
+
+    trend = filtered_metric_trend(current_dataset(), metric, interval, group_by, window,
+                                  ships, data.get("fleet"), data.get("filters"))
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "interval": interval,
+        "groupBy": group_by,
+        "window": window,
+        "periods": trend["periods"],
+        "series": trend["series"]
+    })
+
 @app.route('/sailing/ships', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_ships():
     """Get ships with RLS filtering"""
     try:
@@ -652,7 +738,7 @@ def get_ships():
     except Exception as e:
         # Fallback to sample data if database not available
         SHIPS = []
-        for ent in SAMPLE_DATA:
+        for ent in current_dataset().summary:
             SHIPS.append(ent["Ship Name"])
         return jsonify({
             "status": "success",
@@ -708,6 +794,75 @@ def get_semantic_search():
         "results": data
     })
 
+@app.route('/sailing/textSearch', methods=['POST'])
+def get_text_search():
+    """Ranked keyword search over guest comments or issue summaries (SQLite FTS5)"""
+    data = request.get_json() or {}
+    query = data.get("query")
+    source = data.get("source", "comments")
+    if not query:
+        return jsonify({"error": "query is required"}), 400
+    if source not in COMMENTS_DB.TEXT_SEARCH_SOURCES:
+        return jsonify({"error": "source must be 'comments' or 'issues'"}), 400
+
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    if start_date == "-1":
+        start_date = None
+    if end_date == "-1":
+        end_date = None
+
+    # RLS: restrict to the ships this session may see
+    ships = visible_ships(data.get("ships"))
+
+    try:
+        results = COMMENTS_DB.search_text(query, source, data.get("fleet"), ships, data.get("sailing_numbers"),
+                                   start_date, end_date, data.get("sheets"),
+                                   match_all=data.get("match", "all") != "any",
+                                   limit=clamp_limit(data.get("limit"), default=50))
+    except COMMENTS_DB.TextIndexMissing as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "status": "success",
+        "data": results
+    })
+
+@app.route('/sailing/segmentMetrics', methods=['POST'])
+def get_segment_metrics():
+    """Metric count/mean/std/min/max per guest segment (e.g. Cabin Category) across the selected sailings"""
+    data = request.get_json() or {}
+    metric = data.get("metric")
+    segment = data.get("segment", "Cabin Category")
+    if segment not in SEGMENT_DIMENSIONS:
+        return jsonify({"error": f"segment must be one of {SEGMENT_DIMENSIONS}"}), 400
+
+    try:
+        cube = load_segment_cube(SEGMENT_CSV)
+    except FileNotFoundError:
+        return jsonify({"error": "Segment data is not available"}), 503
+    if metric not in cube.metrics:
+        return jsonify({"error": f"Unknown metric: {metric}"}), 400
+
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    if start_date == "-1":
+        start_date = None
+    if end_date == "-1":
+        end_date = None
+
+    # RLS: restrict to the ships this session may see
+    ships = visible_ships(data.get("ships"))
+
+    results = cube.segment(metric, segment, sailing_numbers=data.get("sailing_numbers") or None,
+                           ships=ships, fleet=data.get("fleet"), start_date=start_date, end_date=end_date)
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "segment": segment,
+        "data": results
+    })
+
 @app.route('/sailing/getIssuesList', methods=['POST'])
 def get_issues_list():
     """Endpoint to retrieve a summary of issues based on user input with RLS filtering"""
@@ -715,6 +870,14 @@ def get_issues_list():
     sailing_numbers = data.get("sailing_numbers", None)
     sheets = data.get("sheets", None)
     ships = None    # RLS automatically filters accessible issues
+    if wants_ndjson():
+        return ndjson_response(SQLOP.iter_issues(ships, sailing_numbers, sheets))
+    page = page_request(data)
+    if page:
+        try:
+            return jsonify({"status": "success", **SQLOP.fetch_issues_page(ships, sailing_numbers, sheets, *page)})
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
     issues_list = SQLOP.fetch_issues(ships, sailing_numbers, sheets)
     # Note: add_sailing_summaries function would be implemented here
     final_list = issues_list  # Placeholder until function is implemented
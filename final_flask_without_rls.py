@@ -1,14 +1,25 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from flask_cors import CORS
 from typing import Dict, List
 from test_data import *
 from navigate_search import *
-import util as UT
+from rating_rollups import TREND_INTERVALS
+from rating_metrics import DISTRIBUTION_GROUPS, TREND_GROUPS, filtered_metric_trend, iter_metric_results, metric_distribution
+from response_cache import file_signature
+from instrumentation import install_instrumentation, timed
+from http_encoding import install_http_encoding, ndjson_response, wants_ndjson
+from pagination import InvalidCursor, clamp_limit, page_request
+from segment_cube import SEGMENT_DIMENSIONS, load_segment_cube
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from query_log import QUERY_LOG
+from auth_store import HashingBusy, PasswordVerifier
+from app_runtime import (AUTH_USERS, DATASETS, RESPONSE_CACHE, SEGMENT_CSV, current_dataset, register_password_metrics,
+                         require_internal_access)
+import os
 # from util import get_sailing_mapping, filter_sailings
 import pandas as pd
 import yaml
 from werkzeug.security import check_password_hash
-from pathlib import Path
 import sql_ops as SQLOP
 
 app = Flask(__name__)
@@ -27,6 +38,15 @@ CORS(app, resources={
     }
 })
 
+# Per-request spans -> Server-Timing header and "cruise.timing" log lines;
+# CRUISE_PROFILING=1 enables the X-Profile sampling profiler.
+# Installed first so its after_request hook also times compression.
+install_instrumentation(app, modules={"sql": SQLOP})
+
+# Fast JSON for jsonify() and gzip/brotli for bodies of at least
+# CRUISE_COMPRESS_MIN_BYTES (0 disables compression)
+install_http_encoding(app, int(os.environ.get("CRUISE_COMPRESS_MIN_BYTES", "1024")))
+
 # CORS(app, resources={
 #     r"/sailing/*": {
 #         "origins": ["http://localhost:8081", "http://localhost:8082", "http://localhost:3000", "http://127.0.0.1:8081"],
@@ -64,33 +84,28 @@ SHEET_LIST = ["Ports and Excursions", "Other Feedback", "Entertainment",
               ]
 
 # SAILING_LIST_MAPPING, SAILING_NUMBER_LIST = UT.get_sailing_mapping(FLEET_DATA)
-# Sample data matching your structure
-SAMPLE_DATA = get_summary_data()
-# print(SAMPLE_DATA)
-AUTH_FILE = Path("sailing_auth.yaml")
-def load_auth_data():
-    """Load authentication data from YAML file"""
-    if not AUTH_FILE.exists():
-        raise FileNotFoundError(f"Auth file not found at {AUTH_FILE}")
-    
-    with open(AUTH_FILE, 'r') as f:
-        return yaml.safe_load(f)
+# Sailing datasets, response cache, segment data, login store and the
+# scrape-time metrics are shared with final_flask_with_rls.py (app_runtime)
 
+def cache_access_key():
+    """No per-user data without RLS, so every caller shares one access set"""
+    return None
 
-SAILING_DATA, SAILING_REASON = load_sailing_data_rate_reason()
-# print(SAILING_DATA)
-# print(SAILING_REASON)
-def get_sailing_df(ship: str, sailing_number: str):
-    """Helper to get DataFrame for specific sailing"""
-    key = f"{ship}_{sailing_number}"
-    key = key.lower()
-    return SAILING_DATA.get(key)
+def cache_data_version():
+    """Dataset generation plus the comments database file state"""
+    return (DATASETS.version, file_signature(SQLOP.db_path))
 
-def get_sailing_df_reason(ship: str, sailing_number: str):
-    """Helper to get DataFrame for specific sailing"""
-    key = f"{ship}_{sailing_number}"
-    key = key.lower()
-    return SAILING_REASON.get(key)
+def verify_credential(password_hash, password):
+    try:
+        return check_password_hash(password_hash, password)
+    except ValueError:
+        # Hash methods werkzeug cannot check (e.g. bcrypt) never match
+        return False
+
+# PBKDF2 checks run on a bounded pool with a short-lived cache of verified logins
+# (CRUISE_AUTH_WORKERS, CRUISE_AUTH_MAX_PENDING, CRUISE_AUTH_CACHE_TTL)
+PASSWORDS = PasswordVerifier(verify_credential)
+register_password_metrics(PASSWORDS)
 
 # Helper functions
 def generate_rating_text(score: float, attribute: str) -> str:
@@ -106,19 +121,11 @@ def generate_rating_text(score: float, attribute: str) -> str:
 
 def find_sailings(sailings: List[Dict]) -> List[Dict]:
     """Filter sample data based on requested sailings"""
-    results = []
-    for sailing in sailings:
-        ship = sailing.get("shipName")
-        number = sailing.get("sailingNumber")
-        found = next(
-            (item for item in SAMPLE_DATA 
-             if item["Ship Name"].lower() == ship.lower() and item["Sailing Number"].lower() == number.lower()),
-            None
-        )
-        if found:
-            results.append(found)
-    return results
+    summary = current_dataset().summary
+    rows = (summary.find(sailing.get("shipName"), sailing.get("sailingNumber")) for sailing in sailings)
+    return summary.records(row for row in rows if row is not None)
 
+@timed("filter_sailings")
 def filter_sailings(data):
     filter_by = data.get("filter_by", "sailing")
     print("in filter_sailings")
@@ -142,11 +149,8 @@ def filter_sailings(data):
             if not from_date or not to_date:
                 return -2
 
-            # Filter SAMPLE_DATA by date range
-            results = [
-                item for item in SAMPLE_DATA
-                if pd.to_datetime(item["Start"]) >= from_date and pd.to_datetime(item["End"]) <= to_date
-            ]
+            # Vectorized date filter over the summary columns
+            results = current_dataset().summary.between(from_date, to_date)
         else:
             return -3
 
@@ -154,7 +158,7 @@ def filter_sailings(data):
         return -4
 
     # Remove duplicates if both sailings and date filters are applied
-    results = {frozenset(item.items()): item for item in results}.values()
+    results = list({item.row: item for item in results}.values())
     return results
 
 
@@ -164,6 +168,28 @@ def filter_sailings(data):
 def get_check():
     return ("hi how are you")
 
+@app.route('/sailing/ready', methods=['GET'])
+def get_ready():
+    """Readiness probe: 200 once the sailing datasets are loaded, 503 while warming up"""
+    status = DATASETS.status()
+    status["search"] = "ready" if search_client_ready() else "pending"
+    return jsonify(status), (200 if DATASETS.is_ready() else 503)
+
+@app.route('/sailing/internal/metrics', methods=['GET'])
+def get_internal_metrics():
+    """Prometheus text-format metrics"""
+    require_internal_access()
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/sailing/internal/queries', methods=['GET'])
+def get_internal_queries():
+    """SQL statement shapes by total time (?scans=1: only shapes whose plan scans a table)"""
+    require_internal_access()
+    limit = request.args.get("limit", default=50, type=int)
+    scans_only = request.args.get("scans") == "1"
+    return jsonify({"slow_query_ms": QUERY_LOG.slow_ms,
+                    "shapes": QUERY_LOG.snapshot(limit, scans_only=scans_only)})
+
 @app.errorhandler(404)
 def not_found(e):
     return {"error": "Not Found"}, 404
@@ -207,6 +233,7 @@ def handle_options(path):
 
 
 @app.route('/sailing/fleets', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_fleets():
     """Endpoint to retrieve fleet names and the ships under each fleet"""
 
@@ -216,6 +243,7 @@ def get_fleets():
     })
 
 @app.route('/sailing/sheets', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_sheets():
     """Endpoint to retrieve fleet names and the ships under each fleet"""
 
@@ -225,6 +253,7 @@ def get_sheets():
     })
 
 @app.route('/sailing/metrics', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_metrics():
     """Endpoint to retrieve various metrics related to sailing"""
 
@@ -234,6 +263,7 @@ def get_metrics():
     })
 
 @app.route('/sailing/sailing_numbers', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_sailing_numbers():
     """Endpoint to retrieve various metrics related to sailing"""
     sailing_list = SQLOP.fetch_sailings(None,None,None)
@@ -271,6 +301,7 @@ def get_sailing_numbers_filter():
 
 
 @app.route('/sailing/getRatingSmry', methods=['POST'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_rating_summary():
     data = request.get_json()
     fleets = data.get("fleets")
@@ -288,7 +319,11 @@ def get_rating_summary():
     else:
         sailing_list = sailing_number_filter
 
-    res = SQLOP.fetch_cruise_ratings(sailing_list)
+    # "aggregate": true asks for one record of metric means per sailing from the rollups
+    if data.get("aggregate") and SQLOP.has_rollups():
+        res = SQLOP.fetch_rating_summary(sailing_list)
+    else:
+        res = SQLOP.fetch_cruise_ratings(sailing_list)
 
     return jsonify({
         "status": "success",
@@ -322,26 +357,6 @@ def get_rating_summary():
 #         "data": list(working_data)
 #     })
 
-import math  # Import the math module for isnan()
-
-def is_empty_or_nan(value):
-    """
-    Checks if a value is None, NaN, or an empty sequence.
-
-    Args:
-        value: The value to check.
-
-    Returns:
-        True if the value is None, NaN, or an empty sequence (list, tuple, string, dict), False otherwise.
-    """
-    if value is None:
-        return True
-    if isinstance(value, float) and math.isnan(value):
-        return True
-    if isinstance(value, (list, tuple, str, dict)):
-        return len(value) < 1
-    return False #added this
-
 @app.route('/sailing/getMetricRating', methods=['POST'])
 def get_metric_comparison():
     """Enhanced endpoint with metric value filtering"""
@@ -377,61 +392,11 @@ def get_metric_comparison():
     if working_data == -4:
         return jsonify({"error": "Invalid filterBy value. Must be 'sailing' or 'date'"}), 400
 
-    # Prepare response
-    results = []
-    all_metric_values = []
-
-    for sailing in working_data:
-        print("get metric comparison",sailing)
-        ship = sailing["Ship Name"]
-        number = sailing["Sailing Number"]
-        df = get_sailing_df(ship, number)
-        df_reason = get_sailing_df_reason(ship, number)
-#         print("df_reason",df_reason)
-        
-        if df is None or metric not in df.columns:
-            results.append({
-                "ship": ship,
-                "sailingNumber": number,
-                "error": "Data not found" if df is None else "Invalid metric"
-            })
-            continue
-        
-        # Calculate basic stats
-        metric_values = pd.to_numeric(df[metric], errors='coerce').dropna()
-        avg_rating = metric_values.mean()
-        all_metric_values.extend(metric_values.tolist())
-        
-        # Get filtered reviews if requested
-        filtered_reviews = []
-        if filter_below is not None:
-            mask = df[metric].astype(float) <= filter_below
-            filtered_reviews = df_reason.loc[mask, metric].tolist()
-#             print(filtered_reviews)
-            for i, rev in enumerate(filtered_reviews):
-                if is_empty_or_nan(rev):
-                    filtered_reviews[i] = "Please refer to the comment"
-#             print(filtered_reviews)
-#             print(len(filtered_reviews))
-            filtered_metric = df.loc[mask, metric].tolist()
-        
-        results.append({
-            "ship": ship,
-            "sailingNumber": number,
-            "metric": metric,
-            "averageRating": round(avg_rating, 2),
-            "ratingCount": len(metric_values),
-            "filteredReviews": filtered_reviews,
-            "filteredMetric": filtered_metric,
-            "filteredCount": len(filtered_reviews)
-        })
-    
-    # Add comparison to overall average if requested
-    if compare_avg and all_metric_values:
-        overall_avg = sum(all_metric_values) / len(all_metric_values)
-        for result in results:
-            if "averageRating" in result:
-                result["comparisonToOverall"] = round(result["averageRating"] - overall_avg, 2)
+    if wants_ndjson():
+        # Streaming mode: one record per sailing, constant memory per request
+        return ndjson_response(iter_metric_results(current_dataset(), working_data, metric, filter_below, compare_avg))
+
+    results = list(iter_metric_results(current_dataset(), working_data, metric, filter_below, compare_avg))
     
     return jsonify({
         "status": "success",
@@ -441,11 +406,84 @@ def get_metric_comparison():
         "comparedToAverage": compare_avg
     })
 
+@app.route('/sailing/getMetricDistribution', methods=['POST'])
+def get_metric_distribution():
+    """Median, p10/p90 and 1-10 score histogram of a metric per ship, sailing, fleet or overall"""
+    data = request.get_json()
+
+    if not data or "filter_by" not in data or "metric" not in data:
+        return jsonify({"error": "Missing required parameters"}), 400
+
+    metric = data["metric"]
+    group_by = data.get("groupBy", "ship")
+    if metric not in METRIC_ATTRIBUTES:
+        return jsonify({
+            "error": "Metric must be a numeric field (not 'Review')",
+            "valid_metrics": METRIC_ATTRIBUTES
+        }), 400
+    if group_by not in DISTRIBUTION_GROUPS:
+        return jsonify({"error": f"groupBy must be one of {list(DISTRIBUTION_GROUPS)}"}), 400
+
+    working_data = filter_sailings(data)
+    if working_data == -1:
+        return jsonify({"error": "Sailings must be provided when filtering by sailing"}), 400
+    if working_data == -2:
+        return jsonify({"error": "Both fromDate and toDate must be provided when filtering by date"}), 400
+    if working_data == -3:
+        return jsonify({"error": "Filters must be provided when filtering by date"}), 400
+    if working_data == -4:
+        return jsonify({"error": "Invalid filterBy value. Must be 'sailing' or 'date'"}), 400
+
+    results = metric_distribution(current_dataset(), working_data, metric, group_by)
+
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "groupBy": group_by,
+        "results": results
+    })
+
+@app.route('/sailing/getMetricTrend', methods=['POST'])
+def get_metric_trend():
+    """Weekly/monthly/quarterly average and count of a metric per ship or fleet, optionally as a rolling window"""
+    data = request.get_json() or {}
+    metric = data.get("metric")
+    interval = data.get("interval", "month")
+    group_by = data.get("groupBy", "ship")
+    window = data.get("window")
+
+    if metric not in METRIC_ATTRIBUTES:
+        return jsonify({
+            "error": "Metric must be a numeric field (not 'Review')",
+            "valid_metrics": METRIC_ATTRIBUTES
+        }), 400
+    if interval not in TREND_INTERVALS:
+        return jsonify({"error": f"interval must be one of {list(TREND_INTERVALS)}"}), 400
+    if group_by not in TREND_GROUPS:
+        return jsonify({"error": "groupBy must be 'ship', 'fleet' or 'all'"}), 400
+    if window is not None and (not isinstance(window, int) or isinstance(window, bool) or window < 1):
+        return jsonify({"error": "window must be a positive number of periods"}), 400
+
+    ships = data.get("ships") or None
+
+    trend = filtered_metric_trend(current_dataset(), metric, interval, group_by, window,
+                                  ships, data.get("fleet"), data.get("filters"))
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "interval": interval,
+        "groupBy": group_by,
+        "window": window,
+        "periods": trend["periods"],
+        "series": trend["series"]
+    })
+
 @app.route('/sailing/ships', methods=['GET'])
+@RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
 def get_ships():
 #     SHIPS = ["Voyager", "Explorer", "Discovery", "Explorer 2", "Discovery 2", "Voyager250306"]
     SHIPS = []
-    for ent in SAMPLE_DATA:
+    for ent in current_dataset().summary:
         SHIPS.append(ent["Ship Name"])
     return jsonify({
         "status": "success",
@@ -473,12 +511,10 @@ def authenticate():
                 "error": "Username and password required"
             }), 400
         
-        # Load auth data
-        auth_data = load_auth_data()
-        user_data = auth_data['users'].get(username)
+        user_data = AUTH_USERS.get(username)
         
         # Verify user exists and password matches
-        if user_data and check_password_hash(user_data['password'], password):
+        if user_data and PASSWORDS.verify(username, user_data['password'], password):
             return jsonify({
                 "authenticated": True,
                 "user": username,
@@ -490,6 +526,11 @@ def authenticate():
             "error": "Invalid credentials"
         }), 401
         
+    except HashingBusy as e:
+        return jsonify({
+            "authenticated": False,
+            "error": str(e)
+        }), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({
             "authenticated": False,
@@ -557,6 +598,86 @@ def get_semantic_search():
     })
 
 
+@app.route('/sailing/comments', methods=['POST'])
+def get_comments():
+    """Keyset-paged guest comments: filters plus {"limit": n, "cursor": token}"""
+    data = request.get_json() or {}
+    limit, cursor = page_request(data) or (clamp_limit(None), None)
+    try:
+        page = SQLOP.fetch_comments_page(data.get("fleet"), data.get("ship"), data.get("sailing_number"),
+                                         data.get("start_date"), data.get("end_date"), data.get("sheet"),
+                                         limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "success", **page})
+
+@app.route('/sailing/textSearch', methods=['POST'])
+def get_text_search():
+    """Ranked keyword search over guest comments or issue summaries (SQLite FTS5)"""
+    data = request.get_json() or {}
+    query = data.get("query")
+    source = data.get("source", "comments")
+    if not query:
+        return jsonify({"error": "query is required"}), 400
+    if source not in SQLOP.TEXT_SEARCH_SOURCES:
+        return jsonify({"error": "source must be 'comments' or 'issues'"}), 400
+
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    if start_date == "-1":
+        start_date = None
+    if end_date == "-1":
+        end_date = None
+
+    ships = data.get("ships") or None
+
+    try:
+        results = SQLOP.search_text(query, source, data.get("fleet"), ships, data.get("sailing_numbers"),
+                                   start_date, end_date, data.get("sheets"),
+                                   match_all=data.get("match", "all") != "any",
+                                   limit=clamp_limit(data.get("limit"), default=50))
+    except SQLOP.TextIndexMissing as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "status": "success",
+        "data": results
+    })
+
+@app.route('/sailing/segmentMetrics', methods=['POST'])
+def get_segment_metrics():
+    """Metric count/mean/std/min/max per guest segment (e.g. Cabin Category) across the selected sailings"""
+    data = request.get_json() or {}
+    metric = data.get("metric")
+    segment = data.get("segment", "Cabin Category")
+    if segment not in SEGMENT_DIMENSIONS:
+        return jsonify({"error": f"segment must be one of {SEGMENT_DIMENSIONS}"}), 400
+
+    try:
+        cube = load_segment_cube(SEGMENT_CSV)
+    except FileNotFoundError:
+        return jsonify({"error": "Segment data is not available"}), 503
+    if metric not in cube.metrics:
+        return jsonify({"error": f"Unknown metric: {metric}"}), 400
+
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    if start_date == "-1":
+        start_date = None
+    if end_date == "-1":
+        end_date = None
+
+    ships = data.get("ships") or None
+
+    results = cube.segment(metric, segment, sailing_numbers=data.get("sailing_numbers") or None,
+                           ships=ships, fleet=data.get("fleet"), start_date=start_date, end_date=end_date)
+    return jsonify({
+        "status": "success",
+        "metric": metric,
+        "segment": segment,
+        "data": results
+    })
+
 @app.route('/sailing/getIssuesList', methods=['POST'])
 def get_issues_list():
     """Endpoint to retrieve a summary of issues based on user input"""
@@ -566,6 +687,16 @@ def get_issues_list():
     sheets = data.get("sheets", None)
     ships = None
 
+    if wants_ndjson():
+        # Streaming mode: one issue per line straight from the cursor
+        return ndjson_response(SQLOP.iter_issues(ships, sailing_numbers, sheets))
+    page = page_request(data)
+    if page:
+        # Paged mode: {"limit": n, "cursor": token} -> data + next_cursor
+        try:
+            return jsonify({"status": "success", **SQLOP.fetch_issues_page(ships, sailing_numbers, sheets, *page)})
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
     issues_list=SQLOP.fetch_issues(ships,sailing_numbers, sheets)
     final_list =  add_sailing_summaries(issues_list)
 
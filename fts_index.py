@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+SQLite FTS5 full-text index for Comments.issues and Issues.issues
+External-content FTS5 tables (Comments_fts, Issues_fts) share rowids with
+their source tables and are kept in sync by insert/update/delete triggers,
+so sql_ops.search_text can rank keyword matches next to the usual joins.
+
+Usage (after an ingest, or to add the index to an existing database):
+    python fts_index.py --db ./sqlComments.db
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Dict
+
+# Porter stemming so "delayed" matches "delays"; unicode61 folds case/accents
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
+
+FTS_SOURCES = {
+    "comments": "Comments",
+    "issues": "Issues",
+}
+
+
+def fts_schema(table: str) -> str:
+    """FTS5 table plus the triggers that mirror writes to table.issues"""
+    fts = f"{table}_fts"
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+    issues, content='{table}', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+);
+CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO {fts}(rowid, issues) VALUES (new.id, new.issues);
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+    INSERT INTO {fts}({fts}, rowid, issues) VALUES ('delete', old.id, old.issues);
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF issues ON {table} BEGIN
+    INSERT INTO {fts}({fts}, rowid, issues) VALUES ('delete', old.id, old.issues);
+    INSERT INTO {fts}(rowid, issues) VALUES (new.id, new.issues);
+END;
+"""
+
+
+def ensure_fts(conn: sqlite3.Connection, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Create the FTS tables and triggers for every source table present.
+    rebuild=True re-reads all rows (needed once after a bulk load that ran
+    without the triggers); returns the indexed row count per table.
+    """
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    counts = {}
+    for table in FTS_SOURCES.values():
+        if table not in existing:
+            continue
+        created = f"{table}_fts" not in existing
+        conn.executescript(fts_schema(table))
+        if rebuild or created:
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.commit()
+    return counts
+
+
+def optimize_fts(conn: sqlite3.Connection):
+    """Merge the FTS b-tree segments (worth it after large ingests)"""
+    for table in FTS_SOURCES.values():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table}_fts",)).fetchone():
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('optimize')")
+    conn.commit()
+
+
+def rebuild_fts(db_path: str, optimize: bool = True) -> Dict[str, int]:
+    with sqlite3.connect(db_path) as conn:
+        counts = ensure_fts(conn, rebuild=True)
+        if optimize:
+            optimize_fts(conn)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or rebuild the FTS5 index for Comments and Issues")
+    parser.add_argument("--db", default="./sqlComments.db", help="SQLite database to index")
+    parser.add_argument("--no-optimize", action="store_true", help="Skip the segment merge after rebuilding")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = rebuild_fts(args.db, optimize=not args.no_optimize)
+    for table, count in counts.items():
+        print(f"📇 {table}: {count:,} rows indexed")
+    print(f"✅ FTS index ready in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
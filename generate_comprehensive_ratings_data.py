@@ -1,116 +1,48 @@
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Synthetic cruise ratings dataset generator
+Builds fleets, ships, sailings, per-guest ratings and free-text comments with
+vectorized NumPy sampling and streams them in chunks to CSV, Parquet and/or
+the SQLite schema from sql_table_reference.txt.
+
+The defaults reproduce the shape of test_data/comprehensive_cruise_ratings.csv
+(one fleet, five ships, 50-200 guests per sailing). Without an output option
+the CSV goes to ./bench_data/ so the tracked sample is never overwritten;
+pass --csv test_data/comprehensive_cruise_ratings.csv to regenerate it.
+Scale up for load tests:
+
+    python generate_comprehensive_ratings_data.py --fleets 4 --ships-per-fleet 10 \\
+        --sailings-per-ship 1700 --guests-per-sailing 120-180 --comments-per-guest 0.1 \\
+        --csv ./bench_data/ratings.csv --sqlite ./bench_data/sqlComments.db
+
+Note: Issues carries a ship_id column and a Comments table is added, matching
+what sql_ops.fetch_issues/fetch_comments query (the reference file omits them).
+The SQLite output also gets the FTS5 index from fts_index.py and the
+Rating_Rollup pre-aggregates from rating_rollups.py.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
-
-# Define the sailing number to ship mapping
-def get_ship_from_sailing(sailing_number):
-    if sailing_number.startswith('MEX-'):
-        return 'Explorer'
-    elif sailing_number.startswith('MDY-'):
-        return 'Discovery'
-    elif sailing_number.startswith('MDY2-'):
-        return 'Discovery 2'
-    elif sailing_number.startswith('MEX2-'):
-        return 'Explorer 2'
-    elif sailing_number.startswith('MVO-'):
-        return 'Voyager'
-    else:
-        return 'Unknown'
-
-# All sailing numbers from your list
-sailing_numbers = [
-    'MEX-10-17Jan-AtlanticIslands',
-    'MEX-11-17April-CanarianFlavours',
-    'MEX-14-20March-CanarianFlavours',
-    'MEX-14-21Feb-CanarianFlavours',
-    'MEX-14-24April-EasterExplorer',
-    'MEX-16-22May-AdriaticExplorer',
-    'MEX-17-24Jan-CanarianFlavours',
-    'MEX-18-24April-EasterExplorer',
-    'MEX-18-24Jan',
-    'MEX-21-26March-AtlanticIslands',
-    'MEX-21-28Feb-AtlanticIslands',
-    'MEX-24-31Jan-AtlanticIslands',
-    'MEX-25April-2May-MagicalMediterranean',
-    'MEX-27Dec-3Jan-ANewYearsDream',
-    'MEX-28Feb-7March-CanarianFlavours',
-    'MEX-28March-3April-CanarianFlavours',
-    'MEX-3-10Jan-CanarianFlavours',
-    'MEX-31Jan-7Feb-CanarianFlavours',
-    'MEX-4-10April-AtlanticIslands',
-    'MEX-7-13Feb-AtlanticIslands',
-    'MEX-7-13March-AtlanticIslands',
-    'MDY-12-19Jan',
-    'MDY-16-23Feb',
-    'MDY-16-23Mar',
-    'MDY-19-26Jan',
-    'MDY-2-9Feb',
-    'MDY-2-9Mar',
-    'MDY-20-27May-HighlightsofMed',
-    'MDY-20Apr-6May-TransatlanticSunsets',
-    'MDY-23-30Mar',
-    'MDY-23Feb-3Mar',
-    'MDY-26Jan-2Feb',
-    'MDY-29Dec-5Jan',
-    'MDY-30Mar-6Apr',
-    'MDY-5-12Jan',
-    'MDY-6-13April',
-    'MDY-9-16Mar',
-    'MDY2-10-17Feb',
-    'MDY2-10-17March',
-    'MDY2-17-24Feb',
-    'MDY2-17-24March',
-    'MDY2-2-9April',
-    'MDY2-20-27Jan',
-    'MDY2-21-28May-AegeanGems',
-    'MDY2-23-30April-GrecianDiscovery',
-    'MDY2-24Feb-3March',
-    'MDY2-24March-1April',
-    'MDY2-27Feb-3Feb',
-    'MDY2-3-10Feb',
-    'MDY2-3-10March',
-    'MDY2-30Apr-7May-AegeanGems',
-    'MDY2-9-14April',
-    'MEX2-1-7Apr-TreasuresoftheMediterranean',
-    'MEX2-11-17Mar-ColoursoftheCaribbeanV3',
-    'MEX2-11-18Feb-ColoursoftheCaribbean',
-    'MEX2-14-21Jan-ColoursoftheCaribbean',
-    'MEX2-15-21Apr-TreasuresoftheMediterranean',
-    'MEX2-18-25Feb-CaribbeanClassics',
-    'MEX2-18-31Mar-AtlanticOdyssey',
-    'MEX2-21-28Jan-CaribbeanClassics',
-    'MEX2-22-28Apr-MediterraneanMedley',
-    'MEX2-22-28April-MediterraneanMedley',
-    'MEX2-22-28May-AdriaticDelights',
-    'MEX2-25Feb-4Mar-ColoursoftheCaribbean',
-    'MEX2-29Apr-7May-MysticIsles',
-    'MEX2-31Jan-7Jan-ColoursoftheCaribbean',
-    'MEX2-3Jan-4Feb-ColoursoftheCaribbean',
-    'MEX2-4-10Mar-CaribbeanClassics',
-    'MEX2-4-11Feb-TropicalTreasures',
-    'MEX2-7-14Jan-TropicalTreasures',
-    'MEX2-8-14Apr-MediterraneanMedley',
-    'MVO-10-17Apr-ATasteoftheTropicsV2',
-    'MVO-13-20Feb-ATasteoftheTropics',
-    'MVO-13-20Mar-ATasteoftheTropics',
-    'MVO-16-23Jan-ATasteoftheTropics',
-    'MVO-17Apr-3May-AtlanticAdventure',
-    'MVO-2-9Jan-ATasteoftheTropicsV3',
-    'MVO-20-27Feb-ParadiseIslands',
-    'MVO-20-27Mar-ParadiseIslandsV2',
-    'MVO-23-30Jan-ParadiseIslandsV3',
-    'MVO-24-31May-MediterraneanMedley',
-    'MVO-27Feb-6Mar-ATasteoftheTropicsV3',
-    'MVO-27Mar-3Apr-ATasteoftheTropics',
-    'MVO-3-10Apr-ParadiseIslands',
-    'MVO-3-10May-TreasuresfotheMediterranean',
-    'MVO-3-10May-TreasuresoftheMediterranean',
-    'MVO-30Jan-6Feb-ATasteoftheTropicsV3',
-    'MVO-6-13Feb-ParadiseIslandsV3',
-    'MVO-6-13Mar-ParadiseIslandsV3',
-    'MVO-9-16Jan-ParadiseIslandsV3'
-]
+import pandas as pd
+
+from fts_index import ensure_fts, optimize_fts
+from rating_rollups import ensure_rollups, rollup_frame, write_rollup
+
+# Sailing-code prefixes of the known Marella ships
+SHIP_PREFIXES = {
+    'Explorer': 'MEX',
+    'Discovery': 'MDY',
+    'Discovery 2': 'MDY2',
+    'Explorer 2': 'MEX2',
+    'Voyager': 'MVO',
+}
+
+FLEET_NAMES = ['Marella', 'Aurora', 'Meridian', 'Solstice', 'Horizon', 'Tradewind', 'Coral', 'Zephyr']
 
 # Rating categories as per your format
 rating_categories = [
@@ -134,127 +66,408 @@ rating_categories = [
     'Sentiment Score'
 ]
 
-# Function to generate realistic ratings (1-10) with some None values
-def generate_rating():
-    # 30% chance of None (guest didn't rate this category)
-    if random.random() < 0.3:
-        return None
-    else:
-        # Generate ratings with bias towards higher scores (7-9 range)
-        weights = [1, 1, 2, 3, 5, 8, 15, 20, 25, 20]  # Weights for ratings 1-10
-        return random.choices(range(1, 11), weights=weights)[0]
-
-# Generate comprehensive dataset
-def generate_cruise_ratings_data():
-    data = []
-    
-    # Generate multiple rating records per sailing (simulating multiple guests)
-    for sailing_number in sailing_numbers:
-        ship_name = get_ship_from_sailing(sailing_number)
-        
-        # Generate 50-200 guest ratings per sailing
-        num_guests = random.randint(50, 200)
-        
-        for guest_id in range(num_guests):
-            record = {}
-            
-            # Generate ratings for each category
-            for category in rating_categories:
-                if category in ['Overall Holiday', 'Sentiment Score']:
-                    # These should rarely be None
-                    if random.random() < 0.05:  # Only 5% chance of None
-                        record[category] = None
-                    else:
-                        record[category] = float(generate_rating() or 8)
-                else:
-                    rating = generate_rating()
-                    record[category] = float(rating) if rating is not None else None
-            
-            # Add metadata
-            record['Sailing Number'] = sailing_number
-            record['Fleet'] = 'Marella'
-            record['Ship'] = ship_name
-            record['Guest ID'] = f"{sailing_number}-G{guest_id+1:03d}"
-            
-            # Add some additional realistic fields
-            record['Guest Type'] = random.choice(['First Time', 'Repeat', 'VIP', 'Suite'])
-            record['Cabin Category'] = random.choice(['Interior', 'Ocean View', 'Balcony', 'Suite'])
-            record['Age Group'] = random.choice(['25-35', '36-45', '46-55', '56-65', '65+'])
-            record['Travel Party Size'] = random.randint(1, 6)
-            
-            # Add start and end dates based on sailing number (approximate)
-            base_year = 2024
-            if 'Jan' in sailing_number:
-                month = 1
-            elif 'Feb' in sailing_number:
-                month = 2
-            elif 'Mar' in sailing_number or 'March' in sailing_number:
-                month = 3
-            elif 'Apr' in sailing_number or 'April' in sailing_number:
-                month = 4
-            elif 'May' in sailing_number:
-                month = 5
-            elif 'Dec' in sailing_number:
-                month = 12
-            else:
-                month = random.randint(1, 12)
-            
-            # Extract day from sailing number (simplified)
-            try:
-                day_part = sailing_number.split('-')[1]
-                start_day = int(''.join(filter(str.isdigit, day_part[:2])))
-                if start_day > 31:
-                    start_day = random.randint(1, 28)
-            except:
-                start_day = random.randint(1, 28)
-            
-            start_date = datetime(base_year, month, start_day)
-            end_date = start_date + timedelta(days=7)  # Assume 7-day cruises
-            
-            record['Start'] = start_date.strftime('%Y-%m-%d')
-            record['End'] = end_date.strftime('%Y-%m-%d')
-            
-            data.append(record)
-    
-    return data
-
-# Generate the data
-print("Generating cruise ratings data...")
-cruise_data = generate_cruise_ratings_data()
-
-# Convert to DataFrame
-df = pd.DataFrame(cruise_data)
-
-# Reorder columns to match your preferred format
-column_order = [
+# Categories guests almost always answer
+CORE_CATEGORIES = ['Overall Holiday', 'Sentiment Score']
+
+# Weights for ratings 1-10, biased towards 7-9
+RATING_WEIGHTS = np.array([1, 1, 2, 3, 5, 8, 15, 20, 25, 20], dtype=float)
+RATING_WEIGHTS /= RATING_WEIGHTS.sum()
+
+GUEST_TYPES = np.array(['First Time', 'Repeat', 'VIP', 'Suite'], dtype=object)
+CABIN_CATEGORIES = np.array(['Interior', 'Ocean View', 'Balcony', 'Suite'], dtype=object)
+AGE_GROUPS = np.array(['25-35', '36-45', '46-55', '56-65', '65+'], dtype=object)
+
+SHEET_LIST = ["Ports and Excursions", "Other Feedback", "Entertainment",
+              "Bars", "Dining", "What went well", "What else"]
+
+COMMENT_SUBJECTS = np.array([
+    "The food in the main restaurant", "Our cabin", "The evening shows", "Bar staff",
+    "The excursion to the old town", "Embarkation", "The pool deck", "Breakfast buffet",
+    "The crew", "Drinks package", "Room service", "The kids club",
+], dtype=object)
+COMMENT_PHRASES = np.array([
+    "was excellent and well worth it.", "was disappointing compared to last year.",
+    "was cold and slow to arrive.", "could have been cleaner.", "was friendly and attentive.",
+    "had very long queues.", "was the highlight of the holiday.", "felt overpriced for what it was.",
+    "was noisy late at night.", "exceeded our expectations.",
+], dtype=object)
+
+MONTHS = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], dtype=object)
+
+RATING_COLUMNS = [
     'Guest ID', 'Sailing Number', 'Fleet', 'Ship', 'Start', 'End',
     'Guest Type', 'Cabin Category', 'Age Group', 'Travel Party Size'
 ] + rating_categories
 
-df = df[column_order]
-
-# Save to CSV
-output_file = 'c:/Users/harsh/OneDrive/Documents/cruise/test_data/comprehensive_cruise_ratings.csv'
-df.to_csv(output_file, index=False)
-
-print(f"Generated {len(df)} rating records across {len(sailing_numbers)} sailings")
-print(f"Data saved to: {output_file}")
-
-# Display sample data
-print("\nSample records:")
-print(df.head(3).to_string())
-
-# Show statistics
-print(f"\nDataset Statistics:")
-print(f"Total records: {len(df)}")
-print(f"Unique sailings: {df['Sailing Number'].nunique()}")
-print(f"Ships: {df['Ship'].unique()}")
-print(f"Average records per sailing: {len(df) / df['Sailing Number'].nunique():.1f}")
-
-# Show rating distribution for Overall Holiday
-print(f"\nOverall Holiday Rating Distribution:")
-overall_ratings = df['Overall Holiday'].dropna()
-for rating in range(1, 11):
-    count = sum(overall_ratings == rating)
-    percentage = (count / len(overall_ratings)) * 100
-    print(f"Rating {rating}: {count} ({percentage:.1f}%)")
+# SQLite schema from sql_table_reference.txt (plus Comments and Issues.ship_id)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Fleets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS Ships (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    fleet_id INTEGER NOT NULL,
+    FOREIGN KEY (fleet_id) REFERENCES Fleets(id)
+);
+CREATE TABLE IF NOT EXISTS Sailings (
+    id INTEGER PRIMARY KEY,
+    ship_id INTEGER NOT NULL,
+    sailing_number TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    start_date_dt REAL NOT NULL,
+    end_date_dt REAL NOT NULL,
+    FOREIGN KEY (ship_id) REFERENCES Ships(id)
+);
+CREATE TABLE IF NOT EXISTS Sheets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS Issues (
+    id INTEGER PRIMARY KEY,
+    sailing_id INTEGER NOT NULL,
+    ship_id INTEGER NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    issues TEXT NOT NULL,
+    FOREIGN KEY (sailing_id) REFERENCES Sailings(id),
+    FOREIGN KEY (ship_id) REFERENCES Ships(id),
+    FOREIGN KEY (sheet_id) REFERENCES Sheets(id)
+);
+CREATE TABLE IF NOT EXISTS Comments (
+    id INTEGER PRIMARY KEY,
+    sailing_id INTEGER NOT NULL,
+    ship_id INTEGER NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    issues TEXT NOT NULL,
+    FOREIGN KEY (sailing_id) REFERENCES Sailings(id),
+    FOREIGN KEY (ship_id) REFERENCES Ships(id),
+    FOREIGN KEY (sheet_id) REFERENCES Sheets(id)
+);
+CREATE TABLE IF NOT EXISTS `Cruise_Ratings` (
+    `Sailing Number` TEXT,
+    `Fleet` TEXT,
+    `Ship` TEXT,
+    {metric_columns}
+);
+CREATE INDEX IF NOT EXISTS idx_sailings_ship_start ON Sailings(ship_id, start_date_dt);
+CREATE INDEX IF NOT EXISTS idx_comments_sailing ON Comments(sailing_id);
+CREATE INDEX IF NOT EXISTS idx_issues_sailing ON Issues(sailing_id);
+CREATE INDEX IF NOT EXISTS idx_ratings_sailing ON Cruise_Ratings(`Sailing Number`);
+""".replace("{metric_columns}", ",\n    ".join(f"`{c}` REAL" for c in rating_categories))
+
+# ==============================================
+# CATALOGUE: FLEETS, SHIPS, SAILINGS
+# ==============================================
+
+def build_ships(fleets: int, ships_per_fleet: int) -> pd.DataFrame:
+    """One row per ship with fleet name and sailing-code prefix"""
+    rows = []
+    known = list(SHIP_PREFIXES.items())
+    for f in range(fleets):
+        fleet = FLEET_NAMES[f] if f < len(FLEET_NAMES) else f"Fleet {f + 1}"
+        for s in range(ships_per_fleet):
+            if f == 0 and s < len(known):
+                name, prefix = known[s]
+            else:
+                # Second letter Q-Z keeps synthetic codes clear of MEX/MDY/MVO
+                name, prefix = f"{fleet} {s + 1}", f"M{chr(81 + f % 10)}{chr(65 + s % 26)}"
+            rows.append({'ship_id': len(rows) + 1, 'fleet_id': f + 1, 'Fleet': fleet,
+                         'Ship': name, 'prefix': prefix})
+    return pd.DataFrame(rows)
+
+
+def build_sailings(ships: pd.DataFrame, sailings_per_ship: int, start_date: str,
+                   cruise_days: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Back-to-back sailings per ship; codes follow the PREFIX-3Jan-10Jan-2025 pattern"""
+    n_ships = len(ships)
+    ship_idx = np.repeat(np.arange(n_ships), sailings_per_ship)
+    voyage = np.tile(np.arange(sailings_per_ship), n_ships)
+    # Stagger ships so they do not all sail on the same day
+    offsets = rng.integers(0, cruise_days, size=n_ships)[ship_idx]
+    start = np.datetime64(start_date, 'D') + (voyage * cruise_days + offsets).astype('timedelta64[D]')
+    end = start + np.timedelta64(cruise_days, 'D')
+
+    start_s, end_s = pd.Series(start), pd.Series(end)
+    prefixes = ships['prefix'].to_numpy()[ship_idx]
+    codes = (pd.Series(prefixes) + "-" + start_s.dt.day.astype(str) + MONTHS[start_s.dt.month.to_numpy() - 1]
+             + "-" + end_s.dt.day.astype(str) + MONTHS[end_s.dt.month.to_numpy() - 1]
+             + "-" + start_s.dt.year.astype(str))
+    epoch = np.datetime64('1970-01-01', 'D')
+    return pd.DataFrame({
+        'sailing_id': np.arange(1, len(ship_idx) + 1),
+        'ship_id': ships['ship_id'].to_numpy()[ship_idx],
+        'Fleet': ships['Fleet'].to_numpy()[ship_idx],
+        'Ship': ships['Ship'].to_numpy()[ship_idx],
+        'Sailing Number': codes.to_numpy(),
+        'Start': start_s.dt.strftime('%Y-%m-%d').to_numpy(),
+        'End': end_s.dt.strftime('%Y-%m-%d').to_numpy(),
+        'start_date_dt': ((start - epoch).astype(np.int64) * 86400).astype(float),
+        'end_date_dt': ((end - epoch).astype(np.int64) * 86400).astype(float),
+        # Per-sailing quality shift so ships and sailings differ realistically
+        'quality': rng.normal(0.0, 0.8, size=len(ship_idx)),
+    })
+
+# ==============================================
+# VECTORIZED ROW GENERATION
+# ==============================================
+
+def generate_ratings_chunk(sailings: pd.DataFrame, guest_range: Tuple[int, int],
+                           rng: np.random.Generator) -> pd.DataFrame:
+    """All guest rating rows for a chunk of sailings, sampled in one shot"""
+    counts = rng.integers(guest_range[0], guest_range[1] + 1, size=len(sailings))
+    rows = int(counts.sum())
+    sail_idx = np.repeat(np.arange(len(sailings)), counts)
+    guest_no = np.arange(rows) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+
+    ratings = rng.choice(np.arange(1, 11), size=(rows, len(rating_categories)), p=RATING_WEIGHTS).astype(np.float32)
+    ratings = np.clip(np.rint(ratings + sailings['quality'].to_numpy()[sail_idx, None]), 1, 10)
+    missing_p = np.full(len(rating_categories), 0.3)
+    missing_p[[rating_categories.index(c) for c in CORE_CATEGORIES]] = 0.05
+    ratings[rng.random(ratings.shape) < missing_p] = np.nan
+
+    codes = sailings['Sailing Number'].to_numpy()[sail_idx]
+    frame = pd.DataFrame({
+        'Guest ID': pd.Series(codes, dtype=object) + "-G" + pd.Series(guest_no).astype(str).str.zfill(3),
+        'Sailing Number': codes,
+        'Fleet': sailings['Fleet'].to_numpy()[sail_idx],
+        'Ship': sailings['Ship'].to_numpy()[sail_idx],
+        'Start': sailings['Start'].to_numpy()[sail_idx],
+        'End': sailings['End'].to_numpy()[sail_idx],
+        'Guest Type': GUEST_TYPES[rng.integers(0, len(GUEST_TYPES), size=rows)],
+        'Cabin Category': CABIN_CATEGORIES[rng.integers(0, len(CABIN_CATEGORIES), size=rows)],
+        'Age Group': AGE_GROUPS[rng.integers(0, len(AGE_GROUPS), size=rows)],
+        'Travel Party Size': rng.integers(1, 7, size=rows),
+    })
+    for i, category in enumerate(rating_categories):
+        frame[category] = ratings[:, i]
+    frame.attrs['guest_counts'] = counts
+    return frame
+
+
+def generate_comments_chunk(sailings: pd.DataFrame, guest_counts: np.ndarray,
+                            comments_per_guest: float, rng: np.random.Generator) -> pd.DataFrame:
+    """Free-text comments: Poisson(comments_per_guest) per guest, drawn per sailing"""
+    counts = rng.poisson(comments_per_guest * guest_counts)
+    rows = int(counts.sum())
+    sail_idx = np.repeat(np.arange(len(sailings)), counts)
+    text = (COMMENT_SUBJECTS[rng.integers(0, len(COMMENT_SUBJECTS), size=rows)] + " "
+            + COMMENT_PHRASES[rng.integers(0, len(COMMENT_PHRASES), size=rows)])
+    return pd.DataFrame({
+        'sailing_id': sailings['sailing_id'].to_numpy()[sail_idx],
+        'ship_id': sailings['ship_id'].to_numpy()[sail_idx],
+        'sheet_id': rng.integers(1, len(SHEET_LIST) + 1, size=rows),
+        'issues': text,
+    })
+
+
+def generate_issues_chunk(sailings: pd.DataFrame, rng: np.random.Generator,
+                          sheets_per_sailing: int = 3) -> pd.DataFrame:
+    """Per-sailing issue summaries for a few sheets each"""
+    rows = len(sailings) * sheets_per_sailing
+    sail_idx = np.repeat(np.arange(len(sailings)), sheets_per_sailing)
+    text = ("- " + COMMENT_SUBJECTS[rng.integers(0, len(COMMENT_SUBJECTS), size=rows)] + " "
+            + COMMENT_PHRASES[rng.integers(0, len(COMMENT_PHRASES), size=rows)] + "\n- "
+            + COMMENT_SUBJECTS[rng.integers(0, len(COMMENT_SUBJECTS), size=rows)] + " "
+            + COMMENT_PHRASES[rng.integers(0, len(COMMENT_PHRASES), size=rows)])
+    return pd.DataFrame({
+        'sailing_id': sailings['sailing_id'].to_numpy()[sail_idx],
+        'ship_id': sailings['ship_id'].to_numpy()[sail_idx],
+        'sheet_id': rng.integers(1, len(SHEET_LIST) + 1, size=rows),
+        'issues': text,
+    })
+
+# ==============================================
+# OUTPUT SINKS
+# ==============================================
+
+class CsvSink:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._header = True
+
+    def write(self, frame: pd.DataFrame):
+        frame.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self._writer = None
+
+    def write(self, frame: pd.DataFrame):
+        table = self._pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema, compression='zstd')
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class SqliteSink:
+    """Bulk loader for the sql_table_reference.txt schema"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(SQLITE_SCHEMA)
+        ensure_rollups(self.conn)
+        self._rating_sql = "INSERT INTO Cruise_Ratings ({}) VALUES ({})".format(
+            ", ".join(f"`{c}`" for c in ['Sailing Number', 'Fleet', 'Ship'] + rating_categories),
+            ", ".join("?" * (3 + len(rating_categories))))
+
+    def write_catalogue(self, ships: pd.DataFrame, sailings: pd.DataFrame):
+        cur = self.conn.cursor()
+        fleets = ships[['fleet_id', 'Fleet']].drop_duplicates()
+        cur.executemany("INSERT OR REPLACE INTO Fleets (id, name) VALUES (?, ?)", fleets.itertuples(index=False, name=None))
+        cur.executemany("INSERT OR REPLACE INTO Ships (id, name, fleet_id) VALUES (?, ?, ?)",
+                        ships[['ship_id', 'Ship', 'fleet_id']].itertuples(index=False, name=None))
+        cur.executemany("INSERT OR REPLACE INTO Sheets (id, name) VALUES (?, ?)",
+                        [(i + 1, name) for i, name in enumerate(SHEET_LIST)])
+        cur.executemany('''
+            INSERT OR REPLACE INTO Sailings (id, ship_id, sailing_number, start_date, end_date, start_date_dt, end_date_dt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', sailings[['sailing_id', 'ship_id', 'Sailing Number', 'Start', 'End',
+                       'start_date_dt', 'end_date_dt']].itertuples(index=False, name=None))
+        self.conn.commit()
+
+    def write(self, ratings: pd.DataFrame, comments: pd.DataFrame, issues: pd.DataFrame):
+        cur = self.conn.cursor()
+        rating_rows = ratings[['Sailing Number', 'Fleet', 'Ship'] + rating_categories].astype(object)
+        rating_rows = rating_rows.where(pd.notna(rating_rows), None)
+        cur.executemany(self._rating_sql, rating_rows.itertuples(index=False, name=None))
+        write_rollup(self.conn, rollup_frame(ratings, rating_categories))
+        cur.executemany("INSERT INTO Comments (sailing_id, ship_id, sheet_id, issues) VALUES (?, ?, ?, ?)",
+                        comments.itertuples(index=False, name=None))
+        cur.executemany("INSERT INTO Issues (sailing_id, ship_id, sheet_id, issues) VALUES (?, ?, ?, ?)",
+                        issues.itertuples(index=False, name=None))
+        self.conn.commit()
+
+    def close(self):
+        # Bulk inserts ran without FTS triggers; index everything once at the end
+        ensure_fts(self.conn, rebuild=True)
+        optimize_fts(self.conn)
+        self.conn.close()
+
+# ==============================================
+# DRIVER
+# ==============================================
+
+def parse_range(value: str) -> Tuple[int, int]:
+    """'150' -> (150, 150); '50-200' -> (50, 200)"""
+    low, _, high = str(value).partition('-')
+    return int(low), int(high or low)
+
+
+def iter_chunks(sailings: pd.DataFrame, chunk_sailings: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(sailings), chunk_sailings):
+        yield sailings.iloc[start:start + chunk_sailings]
+
+
+def generate_dataset(fleets: int = 1, ships_per_fleet: int = 5, sailings_per_ship: int = 18,
+                     guests_per_sailing: str = "50-200", comments_per_guest: float = 0.5,
+                     seed: int = 42, start_date: str = "2024-01-01", cruise_days: int = 7,
+                     chunk_sailings: int = 2000, csv_path: Optional[str] = None,
+                     parquet_path: Optional[str] = None, sqlite_path: Optional[str] = None) -> Dict:
+    """Generate the dataset chunk by chunk and stream it to the requested sinks"""
+    rng = np.random.default_rng(seed)
+    guest_range = parse_range(guests_per_sailing)
+    ships = build_ships(fleets, ships_per_fleet)
+    sailings = build_sailings(ships, sailings_per_ship, start_date, cruise_days, rng)
+
+    sinks = []
+    if csv_path:
+        sinks.append(CsvSink(csv_path))
+    if parquet_path:
+        sinks.append(ParquetSink(parquet_path))
+    sqlite_sink = SqliteSink(sqlite_path) if sqlite_path else None
+    if sqlite_sink:
+        sqlite_sink.write_catalogue(ships, sailings)
+
+    totals = {'fleets': fleets, 'ships': len(ships), 'sailings': len(sailings), 'ratings': 0, 'comments': 0, 'issues': 0}
+    started = time.perf_counter()
+    try:
+        for chunk in iter_chunks(sailings, chunk_sailings):
+            ratings = generate_ratings_chunk(chunk, guest_range, rng)
+            for sink in sinks:
+                sink.write(ratings[RATING_COLUMNS])
+            if sqlite_sink:
+                comments = generate_comments_chunk(chunk, ratings.attrs['guest_counts'], comments_per_guest, rng)
+                issues = generate_issues_chunk(chunk, rng)
+                sqlite_sink.write(ratings, comments, issues)
+                totals['comments'] += len(comments)
+                totals['issues'] += len(issues)
+            totals['ratings'] += len(ratings)
+            print(f"  ... {totals['ratings']:,} ratings, {totals['comments']:,} comments "
+                  f"({time.perf_counter() - started:.1f}s)")
+    finally:
+        for sink in sinks:
+            sink.close()
+        if sqlite_sink:
+            sqlite_sink.close()
+
+    totals['seconds'] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+# Scratch location; the tracked test_data/ sample is only written when asked for
+DEFAULT_CSV_PATH = './bench_data/comprehensive_cruise_ratings.csv'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic cruise ratings datasets")
+    parser.add_argument('--fleets', type=int, default=1)
+    parser.add_argument('--ships-per-fleet', type=int, default=5)
+    parser.add_argument('--sailings-per-ship', type=int, default=18)
+    parser.add_argument('--guests-per-sailing', default="50-200", help="N or MIN-MAX")
+    parser.add_argument('--comments-per-guest', type=float, default=0.5, help="Mean comments per guest")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start-date', default="2024-01-01")
+    parser.add_argument('--cruise-days', type=int, default=7)
+    parser.add_argument('--chunk-sailings', type=int, default=2000, help="Sailings generated per chunk")
+    parser.add_argument('--csv', default=None, help=f"Ratings CSV path (default {DEFAULT_CSV_PATH} "
+                                                    "when no other output is given)")
+    parser.add_argument('--parquet', default=None, help="Ratings Parquet path (requires pyarrow)")
+    parser.add_argument('--sqlite', default=None, help="SQLite database path")
+    args = parser.parse_args()
+
+    csv_path = args.csv
+    if not (args.csv or args.parquet or args.sqlite):
+        csv_path = DEFAULT_CSV_PATH
+
+    print("Generating cruise ratings data...")
+    totals = generate_dataset(
+        fleets=args.fleets, ships_per_fleet=args.ships_per_fleet, sailings_per_ship=args.sailings_per_ship,
+        guests_per_sailing=args.guests_per_sailing, comments_per_guest=args.comments_per_guest,
+        seed=args.seed, start_date=args.start_date, cruise_days=args.cruise_days,
+        chunk_sailings=args.chunk_sailings, csv_path=csv_path, parquet_path=args.parquet,
+        sqlite_path=args.sqlite)
+
+    print(f"\nGenerated {totals['ratings']:,} rating records across {totals['sailings']:,} sailings "
+          f"({totals['ships']} ships, {totals['fleets']} fleets) in {totals['seconds']}s")
+    if totals['comments']:
+        print(f"Generated {totals['comments']:,} comments and {totals['issues']:,} issue summaries")
+    for label, path in [('CSV', csv_path), ('Parquet', args.parquet), ('SQLite', args.sqlite)]:
+        if path:
+            print(f"{label} saved to: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Gunicorn settings for multi-worker deployments of the /sailing API
+
+    gunicorn -c gunicorn.conf.py final_flask_with_rls:app
+
+The app is preloaded in the master with CRUISE_PREFORK=1, so the sailing
+datasets are loaded and frozen once before forking and every worker maps
+the same copy-on-write pages. Search clients (Chroma) hold file handles and
+sockets, so they are opened per worker after the fork.
+
+The master also runs the sailing-folder watcher (CRUISE_RELOAD_INTERVAL).
+When it swaps in a new generation it sends itself SIGHUP: gunicorn forks
+new workers that share the new pages and version, and the old workers
+finish their requests and exit.
+
+Each worker publishes its metrics to CRUISE_METRICS_DIR (a fresh directory
+per master by default), so a /sailing/internal/metrics scrape served by
+any worker reports every worker, labelled worker="<pid>".
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+os.environ.setdefault("CRUISE_PREFORK", "1")
+
+bind = os.environ.get("CRUISE_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("CRUISE_WORKERS", min(multiprocessing.cpu_count(), 8)))
+threads = int(os.environ.get("CRUISE_THREADS", 4))
+# The preloaded app sizes its login queue from the request thread count
+os.environ["CRUISE_THREADS"] = str(threads)
+worker_class = "gthread"
+preload_app = True
+timeout = 120
+
+metrics_dir = os.environ.setdefault("CRUISE_METRICS_DIR",
+                                    os.path.join(tempfile.gettempdir(), f"cruise-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    # Files left by an earlier run would show up as live workers with reused pids
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def pre_fork(server, worker):
+    # Anything allocated since the app was preloaded also becomes permanent,
+    # so collections in the workers do not touch the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from metrics import REGISTRY
+    from navigate_search import get_collection
+
+    REGISTRY.share(metrics_dir)
+
+    threading.Thread(target=get_collection, name="search-warmup", daemon=True).start()
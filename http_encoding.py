@@ -0,0 +1,178 @@
+"""
+JSON encoding and response compression for the /sailing API
+- FastJSONProvider: Flask JSON provider backed by orjson when installed
+  (stdlib json otherwise) that serializes NumPy and pandas values natively
+- compress_response: negotiated brotli/gzip for bodies above a size threshold
+- ndjson_response: opt-in streaming of one JSON record per line
+
+Usage:
+    install_http_encoding(app, min_size=1024)
+"""
+
+import datetime
+import decimal
+import gzip
+import json
+import math
+from collections.abc import Mapping
+from typing import Any, Iterable
+
+from flask import Flask, Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+from instrumentation import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # pragma: no cover - both ship with the app
+    np = None
+    pd = None
+
+# Low levels: most of the size win for a fraction of the CPU on JSON
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 3
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def _clean_float(value: float):
+    """NaN/inf are not valid JSON; send null like orjson does"""
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def encode_default(obj: Any):
+    """Fallback for values neither encoder handles natively"""
+    if np is not None:
+        if isinstance(obj, np.floating):
+            return _clean_float(float(obj))
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.bool_):
+            return bool(obj)
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if obj is pd.NaT or obj is pd.NA:
+            return None
+        if isinstance(obj, pd.Timestamp):
+            return obj.isoformat()
+        if isinstance(obj, (pd.Series, pd.Index)):
+            return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Mapping):  # e.g. summary_store.SummaryRecord views
+        return dict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _sanitize(value: Any):
+    """Stdlib path only: replace NaN/inf floats nested in dicts/lists"""
+    if isinstance(value, float):
+        return _clean_float(value)
+    if isinstance(value, dict):
+        return {k: _sanitize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(v) for v in value]
+    return value
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=encode_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_sanitize(obj), default=encode_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Used by jsonify(); keys keep insertion order and output is compact"""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        with span("json.encode"):
+            return dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        with span("json.encode"):
+            body = dumps_bytes(obj) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def wants_ndjson() -> bool:
+    """True only when the client explicitly accepts application/x-ndjson (*/* does not count)"""
+    return any(mimetype == NDJSON_MIMETYPE and quality > 0
+               for mimetype, quality in request.accept_mimetypes)
+
+
+def ndjson_response(records: Iterable[Any]) -> Response:
+    """
+    Stream records as NDJSON while the generator produces them. The request
+    context (session, flask.g) stays available to the generator; streamed
+    responses are not buffered for compression.
+    """
+    def generate():
+        for record in records:
+            yield dumps_bytes(record) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def choose_encoding(accept_encoding) -> str:
+    """Pick br (when available) or gzip from the request's Accept-Encoding"""
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return ""
+
+
+def compress_response(response: Response, min_size: int = 1024) -> Response:
+    """after_request hook: compress buffered bodies of at least min_size bytes"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    with span("compress"):
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # The compressed bytes are a different representation of the same payload
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def install_http_encoding(app: Flask, min_size: int = 1024):
+    """Switch app to FastJSONProvider and compress responses of at least min_size bytes"""
+    app.json = FastJSONProvider(app)
+    if min_size > 0:
+        app.after_request(lambda response: compress_response(response, min_size))
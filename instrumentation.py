@@ -0,0 +1,241 @@
+"""
+Request instrumentation for the /sailing API
+Named spans (SQLOP calls, the LLM and embedding calls, Chroma queries,
+pandas post-processing, JSON encoding, compression) add up per request and
+are reported as a Server-Timing header and one structured JSON log line on
+the "cruise.timing" logger. Spans and requests also feed the latency
+histograms, error counters and in-flight gauges in metrics.REGISTRY.
+
+With CRUISE_PROFILING=1 a request sent with an "X-Profile: 1" header is
+also sampled by a stack profiler; the collapsed stacks (flamegraph input)
+are written to CRUISE_PROFILE_DIR and named in the X-Profile-Id header.
+
+Usage:
+    install_instrumentation(app, modules={"sql": sql_ops})
+
+    with span("chroma.query"):
+        ...
+
+    @timed("llm.expand_query")
+    def expand_query(...): ...
+"""
+
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import Flask, g, request
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("cruise.timing")
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.environ.get("CRUISE_PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL = float(os.environ.get("CRUISE_PROFILE_INTERVAL_MS", "5")) / 1000
+
+REQUEST_SECONDS = REGISTRY.histogram("cruise_request_duration_seconds", "Request latency by endpoint",
+                                     ("endpoint", "method"))
+REQUESTS = REGISTRY.counter("cruise_requests_total", "Requests by endpoint and status",
+                            ("endpoint", "method", "status"))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge("cruise_requests_in_flight", "Requests being handled")
+SPAN_SECONDS = REGISTRY.histogram("cruise_span_duration_seconds", "Span latency (sql.*, llm.*, chroma.query, ...)",
+                                  ("span",))
+SPAN_ERRORS = REGISTRY.counter("cruise_span_errors_total", "Spans that raised", ("span",))
+SPAN_IN_FLIGHT = REGISTRY.gauge("cruise_span_in_flight", "Spans currently running (sql.* = open DB calls)",
+                                ("span",))
+
+
+class RequestTimings:
+    """Span totals of one request: name -> [calls, seconds]"""
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, list] = {}
+
+    def add(self, name: str, seconds: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'{name};dur={seconds * 1000:.2f};desc="{calls}x"'
+                 for name, (calls, seconds) in self.spans.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict:
+        return {name: {"calls": calls, "ms": round(seconds * 1000, 3)}
+                for name, (calls, seconds) in self.spans.items()}
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("cruise_request_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time the block into the span metrics and the current request's timings, if any"""
+    SPAN_IN_FLIGHT.inc(span=name)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        SPAN_IN_FLIGHT.dec(span=name)
+        SPAN_SECONDS.observe(seconds, span=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, seconds)
+
+
+def timed(name: Optional[str] = None):
+    """Decorator form of span(); the span is named after the function by default"""
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        wrapped.span_name = label
+        return wrapped
+    return decorator
+
+
+def instrument_module(module, prefix: str):
+    """
+    Wrap every public function defined in module (e.g. the SQLOP wrappers)
+    with a "<prefix>.<name>" span. Generator functions are left alone since
+    their work happens after the call returns.
+    """
+    for name, obj in list(vars(module).items()):
+        if (name.startswith("_") or not inspect.isfunction(obj) or obj.__module__ != module.__name__
+                or inspect.isgeneratorfunction(obj) or hasattr(obj, "span_name")):
+            continue
+        setattr(module, name, timed(f"{prefix}.{name}")(obj))
+
+
+# ==============================================
+# SAMPLING PROFILER
+# ==============================================
+
+class SamplingProfiler:
+    """Samples one thread's stack from a helper thread; results in collapsed-stack format"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def write(self, profile_id: str, directory: str = PROFILE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{profile_id}.folded")
+        with open(path, "w") as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+
+# ==============================================
+# FLASK HOOKS
+# ==============================================
+
+def install_instrumentation(app: Flask, modules: Optional[Dict[str, object]] = None,
+                            profiling: Optional[bool] = None):
+    """
+    Instrument modules ({"sql": SQLOP}) and register the request hooks.
+    Call before install_http_encoding so compression is timed as well
+    (after_request hooks run in reverse order of registration).
+    """
+    for prefix, module in (modules or {}).items():
+        instrument_module(module, prefix)
+    if profiling is None:
+        profiling = os.environ.get("CRUISE_PROFILING") == "1"
+
+    @app.before_request
+    def start_request_timing():
+        REQUESTS_IN_FLIGHT.inc()
+        g._timing_token = _current.set(RequestTimings())
+        if profiling and request.headers.get(PROFILE_HEADER):
+            g._profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def report_request_timing(response):
+        timings = _current.get()
+        if timings is None:
+            return response
+        total = timings.elapsed()
+        response.headers["Server-Timing"] = timings.server_timing(total)
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(total, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "ms": round(total * 1000, 3),
+            "spans": timings.to_dict(),
+        }
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            profile_id = uuid.uuid4().hex[:12]
+            record["profile"] = profiler.write(profile_id)
+            response.headers["X-Profile-Id"] = profile_id
+        logger.info(json.dumps(record))
+        return response
+
+    @app.teardown_request
+    def clear_request_timing(exc):
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.stop()
+        token = g.pop("_timing_token", None)
+        if token is not None:
+            REQUESTS_IN_FLIGHT.dec()
+            _current.reset(token)
@@ -0,0 +1,355 @@
+"""
+In-process metrics in the Prometheus text exposition format
+Counters, gauges and histograms are updated on the request path (see
+instrumentation.py); collectors are callbacks that read a value at scrape
+time (cache stats, dataset sizes, connection pools). No client library is
+needed: render() produces the text format version 0.0.4 directly.
+
+Each process has its own registry. Under gunicorn every worker calls
+REGISTRY.share(directory) after the fork: it then writes its samples,
+labelled worker="<pid>", to <directory>/<pid>.json every
+CRUISE_METRICS_FLUSH seconds, and a scrape served by any worker renders
+its own live samples plus the latest file of every other live worker.
+Each series therefore belongs to one worker and never goes backwards
+except when that worker is replaced; aggregate with sum without (worker).
+
+Usage:
+    REQUESTS = REGISTRY.counter("cruise_requests_total", "Requests", ("endpoint",))
+    REQUESTS.inc(endpoint="get_fleets")
+    REGISTRY.collector("cruise_dataset_bytes", "gauge", "Dataset size", lambda: [({}, dataset.memory_bytes())])
+    register_cache("response", RESPONSE_CACHE.snapshot)
+    text = REGISTRY.render()
+    REGISTRY.share("/tmp/cruise-metrics")                           # gunicorn post_fork
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; the upper buckets are for the LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds between writes of a worker's samples in multiprocess mode
+FLUSH_INTERVAL = float(os.environ.get("CRUISE_METRICS_FLUSH", "5"))
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _label_dict(self, key: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def lines(self, extra: Optional[Dict[str, str]] = None) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels({**self._label_dict(key), **(extra or {})})} {_number(value)}"
+                for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the +Inf bucket last, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def lines(self, extra: Optional[Dict[str, str]] = None) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        out = []
+        for key, state in items:
+            labels = {**self._label_dict(key), **(extra or {})}
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                out.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(labels)} {_number(state[-1])}")
+            out.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return out
+
+
+class _Collector:
+    def __init__(self, name: str, kind: str, help_text: str, collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.collect = collect
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def lines(self, extra: Optional[Dict[str, str]] = None) -> List[str]:
+        return [f"{self.name}{_labels({**labels, **(extra or {})})} {_number(value)}"
+                for labels, value in self.collect()]
+
+
+class MetricsRegistry:
+    """Named metrics and scrape-time collectors, rendered in registration order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._shared_dir: Optional[str] = None
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} is already registered as {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, help_text: str, collect: Callable[[], Iterable[Sample]]):
+        """Register (or replace) a callback returning [(labels, value), ...] at scrape time"""
+        with self._lock:
+            self._metrics[name] = _Collector(name, kind, help_text, collect)
+
+    def _families(self, extra: Optional[Dict[str, str]] = None) -> List[Tuple[str, List[str], List[str]]]:
+        """(name, header, sample lines) per metric; a failing collector gets a comment instead"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = []
+        for metric in metrics:
+            try:
+                families.append((metric.name, metric.header(), metric.lines(extra)))
+            except Exception as e:
+                # A failing collector must not take the whole scrape down
+                families.append((metric.name, [], [f"# {metric.name} collection failed: {_escape(e)}"]))
+        return families
+
+    def render(self) -> str:
+        if self._shared_dir is None:
+            families = self._families()
+        else:
+            families = self._merged_families()
+        out: List[str] = []
+        for _, header, lines in families:
+            if lines:
+                out.extend(header)
+                out.extend(lines)
+        return "\n".join(out) + "\n"
+
+    # ----------------------------------------------
+    # Multiprocess mode
+    # ----------------------------------------------
+
+    def share(self, directory: str, interval: float = FLUSH_INTERVAL) -> threading.Thread:
+        """
+        Publish this process's samples to directory (one <pid>.json per
+        worker) and include the other workers' files in render(). Call in
+        each worker after the fork: the flush thread does not survive fork().
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._shared_dir = directory
+        # Samples inherited from the master were recorded before the fork, not by this worker
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if isinstance(m, _Metric)]
+        for metric in metrics:
+            with metric._lock:
+                metric._values.clear()
+
+        def run():
+            while True:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Writing metrics to {directory} failed: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        thread.start()
+        return thread
+
+    def flush(self):
+        """Write this worker's samples to its file (atomically, so readers never see half a file)"""
+        pid = os.getpid()
+        path = os.path.join(self._shared_dir, f"{pid}.json")
+        families = self._families({"worker": str(pid)})
+        with open(f"{path}.tmp", "w") as fh:
+            json.dump(families, fh)
+        os.replace(f"{path}.tmp", path)
+
+    def _merged_families(self) -> List[Tuple[str, List[str], List[str]]]:
+        """This worker's live samples followed by the last flush of every other live worker"""
+        pid = os.getpid()
+        merged: Dict[str, Tuple[str, List[str], List[str]]] = {
+            name: (name, header, list(lines)) for name, header, lines in self._families({"worker": str(pid)})}
+        for entry in sorted(os.scandir(self._shared_dir), key=lambda e: e.name):
+            name, ext = os.path.splitext(entry.name)
+            if ext != ".json" or not name.isdigit() or int(name) == pid:
+                continue
+            if not _process_alive(int(name)):
+                # Replaced worker: its series end here
+                _remove(entry.path)
+                continue
+            try:
+                with open(entry.path) as fh:
+                    families = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for name, header, lines in families:
+                if name in merged:
+                    merged[name][2].extend(line for line in lines if not line.startswith("#"))
+                else:
+                    merged[name] = (name, header, lines)
+        return list(merged.values())
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+REGISTRY = MetricsRegistry()
+
+# name -> callable returning {"hits", "misses"[, "entries", "bytes"]}
+_CACHES: Dict[str, Callable[[], Dict]] = {}
+
+
+def hit_ratio(hits: float, misses: float) -> float:
+    total = hits + misses
+    return hits / total if total else 0.0
+
+
+def _cache_samples(field: str) -> Callable[[], List[Sample]]:
+    def collect():
+        samples = []
+        for name, stats_of in list(_CACHES.items()):
+            stats = stats_of()
+            if field == "hit_ratio":
+                samples.append(({"cache": name}, hit_ratio(stats["hits"], stats["misses"])))
+            elif field == "requests":
+                samples.append(({"cache": name, "result": "hit"}, stats["hits"]))
+                samples.append(({"cache": name, "result": "miss"}, stats["misses"]))
+            elif field in stats:
+                samples.append(({"cache": name}, stats[field]))
+        return samples
+    return collect
+
+
+def register_cache(name: str, stats: Callable[[], Dict], registry: MetricsRegistry = REGISTRY):
+    """Expose a cache's hit/miss counts, hit ratio and (when reported) entries and bytes"""
+    _CACHES[name] = stats
+    registry.collector("cruise_cache_requests_total", "counter", "Cache lookups by result",
+                       _cache_samples("requests"))
+    registry.collector("cruise_cache_hit_ratio", "gauge", "Cache hits / lookups since start",
+                       _cache_samples("hit_ratio"))
+    registry.collector("cruise_cache_entries", "gauge", "Entries held by the cache", _cache_samples("entries"))
+    registry.collector("cruise_cache_bytes", "gauge", "Bytes held by the cache", _cache_samples("bytes"))
+
+
+def lru_stats(func) -> Callable[[], Dict]:
+    """Stats callable for a functools.lru_cache-wrapped function"""
+    def stats():
+        info = func.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+    return stats
+
+
+def pool_samples(engines: Dict[str, object]) -> List[Sample]:
+    """Checked-out / idle connections of SQLAlchemy engines with a queue pool"""
+    samples = []
+    for name, engine in engines.items():
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            samples.append(({"db": name, "state": "in_use"}, pool.checkedout()))
+            samples.append(({"db": name, "state": "idle"}, pool.checkedin()))
+    return samples
@@ -3,9 +3,11 @@ import json
 import pandas as pd
 import os
 import logging
-import excel_clean as EC
+import threading
 from typing import Union, List
 
+from instrumentation import span, timed
+
 # Setup logging
 logging.basicConfig(
     filename='search_log.log',
@@ -13,12 +15,38 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-from util import get_colObj, get_embedding_ollama, get_sheets_config
-collection = get_colObj()
-SHEET_CONFIG = get_sheets_config
 ollama_model =  "llama3.2"
+# Point at ollama_stub_server.py for offline benchmarks and regression runs
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+
+# The Chroma collection (and util, which pulls in the vector store client) is
+# opened on first use so importing this module does not touch the store
+_collection = None
+_collection_lock = threading.Lock()
+
+
+def get_collection():
+    """Return the shared Chroma collection, opening it on first use"""
+    global _collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                from util import get_colObj
+                _collection = get_colObj()
+    return _collection
+
+
+def search_client_ready():
+    return _collection is not None
+
 
+@timed("llm.embedding")
+def get_embedding_ollama(text):
+    from util import get_embedding_ollama as _get_embedding_ollama
+    return _get_embedding_ollama(text)
 
+
+@timed("llm.expand_query")
 def expand_query(user_query, use_ollama=True):
     prompt = f"""
     Analyze the user's query and expand it to include synonyms, related concepts, and potential sentiment variations.
@@ -42,7 +70,7 @@ def expand_query(user_query, use_ollama=True):
     """
 
     if use_ollama:
-        res = requests.post("http://localhost:11434/api/generate", json={
+        res = requests.post(f"{OLLAMA_URL}/api/generate", json={
             "model": ollama_model,
             "prompt": prompt,
             "stream": False
@@ -101,6 +129,7 @@ def build_final_where_clause(sheet: Union[str, List[str]] = None,
     return final_where_clause
 
 
+@timed("pandas.prepare_results")
 def prepare_df_results(results_list: list[dict]) -> pd.DataFrame:
     """
     Converts a list of ChromaDB-like query result dictionaries into a pandas DataFrame,
@@ -245,13 +274,14 @@ def semantic_search(query, top_k=5, similarity_threshold=0.7, use_ollama=True,
     # Perform a single query with multiple embeddings
     # ChromaDB's query function can take multiple query_embeddings.
     # It returns distances for each query_embedding to each result.
-    results = collection.query(
-        query_embeddings=query_embeddings, # Pass all generated embeddings
-        n_results=top_k * 5, # Fetch more results initially to allow for re-ranking and thresholding
-        include=['documents', 'metadatas', 'distances'],
-        where=final_where_clause if final_where_clause else None,
-        where_document = {"$contains": query}
-    )
+    with span("chroma.query"):
+        results = get_collection().query(
+            query_embeddings=query_embeddings, # Pass all generated embeddings
+            n_results=top_k * 5, # Fetch more results initially to allow for re-ranking and thresholding
+            include=['documents', 'metadatas', 'distances'],
+            where=final_where_clause if final_where_clause else None,
+            where_document = {"$contains": query}
+        )
 
     # Process results to combine and deduplicate
     combined_hits = {} # {id: {comment, metadata, min_distance}}
@@ -321,7 +351,7 @@ def word_search(query, top_k=5, use_ollama=True,
 
     where_document_clause={"$contains": query}
 
-    results = collection.get(
+    results = get_collection().get(
         include=['documents', 'metadatas'],
         where=final_where_clause if final_where_clause else None,
         where_document = where_document_clause,
@@ -396,12 +426,13 @@ def fetch_comments_by_metadata(sheet: str = None, sailing_date: str = None, top_
 
     print(f"Fetching comments with metadata filters: {final_where_clause}")
 
-    results = collection.query(
-        query_embeddings=[generic_embedding],
-        n_results=top_k, # Fetch a large number of results to ensure all relevant are included
-        include=['documents', 'metadatas'],
-        where=final_where_clause # Apply the correctly structured where clause
-    )
+    with span("chroma.query"):
+        results = get_collection().query(
+            query_embeddings=[generic_embedding],
+            n_results=top_k, # Fetch a large number of results to ensure all relevant are included
+            include=['documents', 'metadatas'],
+            where=final_where_clause # Apply the correctly structured where clause
+        )
 
     comments = []
     # Ensure to handle cases where results might be empty or structures differ
@@ -449,7 +480,7 @@ def identify_core_issues(sailing_date: str, sheet: str, use_ollama: bool = True)
 
     # Step 3: Call LLM
     if use_ollama:
-        res = requests.post("http://localhost:11434/api/generate", json={
+        res = requests.post(f"{OLLAMA_URL}/api/generate", json={
             "model": ollama_model, # Assuming llama3 is good for summarization/analysis
             "prompt": prompt,
             "stream": False
@@ -498,7 +529,7 @@ def trending_core_issues(sheet: str = None, use_ollama: bool = True):
         Core Issues and Topics (min 20):
         """
         if use_ollama:
-            res = requests.post("http://localhost:11434/api/generate", json={
+            res = requests.post(f"{OLLAMA_URL}/api/generate", json={
                 "model": ollama_model,
                 "prompt": prompt,
                 "stream": False
@@ -581,6 +612,7 @@ def analyze_issue_trends_from_file(csv_path="sailing_issues.csv"):
 
 
 if __name__ == "__main__":
+    import excel_clean as EC
     # print(chroma_client)
     # process_excel_for_chroma("apollo/DISCOVERY 2025/MDY 6 to 13 April/MDi250406 Feedback.xls")
 
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Offline Ollama stand-in for Apollo Cruise Analytics
+Serves /api/generate, /api/embeddings and /api/embed with deterministic outputs
+so the search path can be benchmarked and regression-tested without a GPU box.
+
+Features:
+- Deterministic query expansions and hashed bag-of-words embeddings
+- Configurable latency (base + jitter) per endpoint family
+- Error injection with a fixed error rate
+- /api/stub/stats with request/error counts for benchmark harnesses
+
+Usage:
+    python ollama_stub_server.py --port 11434 --latency-ms 20 --error-rate 0.01
+    OLLAMA_URL=http://localhost:11434 python final_flask_with_rls.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PORT = 11434
+DEFAULT_EMBEDDING_DIM = 768
+
+EXPANSION_MODIFIERS = [
+    "poor", "excellent", "disappointing", "great", "issues with",
+    "complaints about", "problems with", "positive feedback on",
+    "slow", "friendly", "dirty", "well organised",
+]
+
+ISSUE_TEMPLATES = [
+    "Long waiting times for {topic}",
+    "Inconsistent quality of {topic}",
+    "Staff praised for {topic}",
+    "Guests requested more options for {topic}",
+    "Cleanliness concerns around {topic}",
+    "Value for money questioned for {topic}",
+]
+
+TOKEN_RE = re.compile(r"[a-z0-9&']+")
+USER_QUERY_RE = re.compile(r'User Query:\s*"(.*?)"', re.DOTALL)
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 generate_latency_ms: Optional[float] = None,
+                 embed_latency_ms: Optional[float] = None,
+                 error_rate: float = 0.0, embedding_dim: int = DEFAULT_EMBEDDING_DIM,
+                 seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.generate_latency_ms = generate_latency_ms
+        self.embed_latency_ms = embed_latency_ms
+        self.error_rate = error_rate
+        self.embedding_dim = embedding_dim
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "generate": 0, "embeddings": 0}
+
+    def base_latency(self, kind: str) -> float:
+        """Return the configured base latency in ms for an endpoint family"""
+        if kind == "generate" and self.generate_latency_ms is not None:
+            return self.generate_latency_ms
+        if kind == "embeddings" and self.embed_latency_ms is not None:
+            return self.embed_latency_ms
+        return self.latency_ms
+
+    def draw(self, kind: str) -> Tuple[float, bool]:
+        """Draw (delay_seconds, should_fail) for one request and update counters"""
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            self.stats["requests"] += 1
+            self.stats[kind] = self.stats.get(kind, 0) + 1
+            if fail:
+                self.stats["errors"] += 1
+        return (self.base_latency(kind) + jitter) / 1000.0, fail
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def embed_text(text: str, dim: int = DEFAULT_EMBEDDING_DIM) -> List[float]:
+    """
+    Deterministic hashed bag-of-words embedding, L2 normalised.
+    Texts sharing words get a positive cosine similarity, so filtered
+    search results stay meaningful against a stub-built collection.
+    """
+    vector = [0.0] * dim
+    tokens = TOKEN_RE.findall(text.lower()) or [""]
+    for token in tokens:
+        h = _stable_hash(token)
+        index = h % dim
+        sign = 1.0 if (h >> 32) & 1 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def expand_query_text(prompt: str) -> str:
+    """Deterministic comma-separated expansion matching navigate_search.expand_query"""
+    match = USER_QUERY_RE.search(prompt)
+    query = (match.group(1) if match else prompt).strip()
+    words = TOKEN_RE.findall(query.lower())
+    topic = " ".join(words[-2:]) if words else "the cruise"
+    rng = random.Random(_stable_hash(query))
+    modifiers = rng.sample(EXPANSION_MODIFIERS, 5)
+    terms = [query] + [f"{modifier} {topic}" for modifier in modifiers]
+    return ", ".join(terms)
+
+
+def summarise_issues_text(prompt: str) -> str:
+    """Deterministic bullet list for the issue-identification prompts"""
+    words = [w for w in TOKEN_RE.findall(prompt.lower()) if len(w) > 4]
+    rng = random.Random(_stable_hash(prompt))
+    topics = rng.sample(words, min(len(words), 8)) if words else ["service"]
+    return "\n".join(
+        "- " + ISSUE_TEMPLATES[i % len(ISSUE_TEMPLATES)].format(topic=topic)
+        for i, topic in enumerate(topics)
+    )
+
+
+def generate_text(prompt: str) -> str:
+    if "User Query:" in prompt:
+        return expand_query_text(prompt)
+    return summarise_issues_text(prompt)
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    server_version = "OllamaStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self) -> StubConfig:
+        return self.server.stub_config
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_ndjson(self, chunks: List[Dict]):
+        body = "".join(json.dumps(chunk) + "\n" for chunk in chunks).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self, kind: str) -> bool:
+        """Sleep for the configured latency; return False if an error was injected"""
+        delay, fail = self.config.draw(kind)
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            self._send_json({"error": f"injected {kind} failure"}, status=500)
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "llama3.2"}, {"name": "nomic-embed-text"}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "stub"})
+        elif self.path == "/api/stub/stats":
+            self._send_json(self.config.snapshot())
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        data = self._read_json()
+        model = data.get("model", "stub")
+
+        if self.path == "/api/generate":
+            if not self._simulate("generate"):
+                return
+            text = generate_text(data.get("prompt", ""))
+            created_at = datetime.now(timezone.utc).isoformat()
+            if data.get("stream", True) is False:
+                self._send_json({"model": model, "created_at": created_at,
+                                 "response": text, "done": True})
+            else:
+                chunks = [{"model": model, "created_at": created_at, "response": word, "done": False}
+                          for word in re.findall(r"\S+\s*", text)]
+                chunks.append({"model": model, "created_at": created_at, "response": "", "done": True})
+                self._send_ndjson(chunks)
+
+        elif self.path == "/api/embeddings":
+            # Legacy endpoint: {"prompt": str} -> {"embedding": [...]}
+            if not self._simulate("embeddings"):
+                return
+            self._send_json({"embedding": embed_text(data.get("prompt", ""), self.config.embedding_dim)})
+
+        elif self.path == "/api/embed":
+            # Current endpoint: {"input": str | [str]} -> {"embeddings": [[...]]}
+            if not self._simulate("embeddings"):
+                return
+            inputs = data.get("input", "")
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json({"model": model,
+                             "embeddings": [embed_text(t, self.config.embedding_dim) for t in inputs]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+def make_stub_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                     config: Optional[StubConfig] = None, verbose: bool = False) -> ThreadingHTTPServer:
+    """Create (but do not start) a stand-in server bound to host:port"""
+    server = ThreadingHTTPServer((host, port), OllamaStubHandler)
+    server.daemon_threads = True
+    server.stub_config = config or StubConfig()
+    server.verbose = verbose
+    return server
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                      config: Optional[StubConfig] = None, verbose: bool = False):
+    """
+    Start the stand-in server on a daemon thread.
+    Pass port=0 to bind a free port; returns (server, thread) and the
+    bound URL is f"http://{host}:{server.server_address[1]}".
+    """
+    server = make_stub_server(host, port, config, verbose)
+    thread = threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic offline stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency for every call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform extra latency [0, jitter]")
+    parser.add_argument("--generate-latency-ms", type=float, default=None, help="Override base latency for /api/generate")
+    parser.add_argument("--embed-latency-ms", type=float, default=None, help="Override base latency for embeddings")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("--dim", type=int, default=DEFAULT_EMBEDDING_DIM, help="Embedding dimension")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        generate_latency_ms=args.generate_latency_ms,
+                        embed_latency_ms=args.embed_latency_ms,
+                        error_rate=args.error_rate, embedding_dim=args.dim, seed=args.seed)
+    server = make_stub_server(args.host, args.port, config, args.verbose)
+    print(f"Ollama stub listening on http://{args.host}:{args.port} "
+          f"(latency={args.latency_ms}ms, jitter={args.jitter_ms}ms, error_rate={args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Keyset pagination helpers shared by sql_ops and sql_ops_rls
+A page is {"data": [...], "next_cursor": token or None}. The cursor is an
+opaque URL-safe token holding the sort key of the last row returned, so the
+next query starts with "WHERE key > last" on an index instead of OFFSET.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+
+class InvalidCursor(ValueError):
+    """Raised for a continuation token that was not produced by encode_cursor"""
+
+
+def encode_cursor(key: List[Any]) -> str:
+    raw = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[List[Any]]:
+    """Sort key from a token (None for the first page); size is the expected key length"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor") from None
+    if not isinstance(key, list) or len(key) != size:
+        raise InvalidCursor("Invalid cursor")
+    return key
+
+
+def clamp_limit(limit: Any, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Parse a client-supplied limit into 1..MAX_PAGE_SIZE"""
+    try:
+        value = int(limit) if limit is not None else default
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(value, MAX_PAGE_SIZE))
+
+
+def make_page(rows: List[Dict], limit: int, key_columns: List[str]) -> Dict:
+    """
+    Build a page from up to limit + 1 fetched rows. The extra row only says
+    whether more exist; key columns named with a leading underscore are
+    internal (e.g. "_id") and dropped from the returned records.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1][c] for c in key_columns]) if has_more else None
+    for row in rows:
+        for column in key_columns:
+            if column.startswith("_"):
+                row.pop(column, None)
+    return {"data": rows, "next_cursor": next_cursor}
+
+
+def page_request(params: Optional[Dict]) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    (limit, cursor) when request params (JSON body or query args) ask for a
+    page via "limit" or "cursor"; None keeps the unpaged response.
+    """
+    if not params or ("limit" not in params and "cursor" not in params):
+        return None
+    return clamp_limit(params.get("limit")), params.get("cursor") or None
@@ -0,0 +1,226 @@
+"""
+Slow-query log and statement-shape statistics for the SQLite stores
+sql_ops (SQLAlchemy engine) and sql_ops_rls (sqlite3 connections) build
+their SQL from optional filters, so each filter combination is its own
+statement with its own plan. Every statement is timed and aggregated by
+its normalized shape (literals and placeholders become ?, IN lists
+collapse to (?...)). The EXPLAIN QUERY PLAN of each new shape is captured
+once, and shapes whose plan scans a whole table are flagged. Statements
+slower than CRUISE_SLOW_QUERY_MS are logged on the "cruise.sql" logger
+with their bound parameters and plan.
+
+Timing covers the execute call, i.e. up to the first row; the remaining
+rows are stepped while the caller fetches.
+
+Usage:
+    watch_engine(engine, "comments")                                # SQLAlchemy
+    sqlite3.connect(path, factory=TimedConnection)                  # sqlite3
+    QUERY_LOG.snapshot()                                            # slowest shapes first
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("cruise.sql")
+
+SLOW_QUERY_MS = float(os.environ.get("CRUISE_SLOW_QUERY_MS", "100"))
+EXPLAIN_QUERIES = os.environ.get("CRUISE_EXPLAIN_QUERIES", "1") != "0"
+
+# Statements EXPLAIN QUERY PLAN can describe
+EXPLAINABLE = ("select", "with", "insert", "update", "delete", "replace")
+# Bound parameters of statements touching these columns are never logged
+REDACTED_COLUMNS = ("password",)
+MAX_LOGGED_PARAMS = 20
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\?|:\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+# "SCAN Sailings" is a full table scan; "SCAN Sailings USING INDEX ..." walks an
+# index and "SCAN comments_fts VIRTUAL TABLE INDEX ..." is an FTS5 lookup
+_TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)(?!.*\b(?:USING|VIRTUAL TABLE)\b)")
+
+
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """Shape of a statement: literals and placeholders as ?, IN lists as (?...), one-line whitespace"""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def scanned_tables(plan: List[str]) -> List[str]:
+    matches = (_TABLE_SCAN.match(line.strip()) for line in plan)
+    return [match.group(1) for match in matches if match]
+
+
+def _loggable_params(shape: str, parameters):
+    if any(column in shape.lower() for column in REDACTED_COLUMNS):
+        return "<redacted>"
+    if isinstance(parameters, dict):
+        return {k: parameters[k] for k in list(parameters)[:MAX_LOGGED_PARAMS]}
+    if isinstance(parameters, (list, tuple)):
+        return list(parameters[:MAX_LOGGED_PARAMS])
+    return parameters
+
+
+class QueryLog:
+    """Per-shape call counts and timings plus the slow-statement log (thread-safe)"""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, explain: bool = EXPLAIN_QUERIES):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self._shapes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, db: str, statement: str, parameters, seconds: float, explain_with=None):
+        """
+        Account one execution. explain_with(sql, parameters) runs a statement
+        on the same database; it is used once per new shape for its plan.
+        """
+        shape = normalize_statement(statement)
+        ms = seconds * 1000
+        with self._lock:
+            entry = self._shapes.get(shape)
+            new_shape = entry is None
+            if new_shape:
+                entry = self._shapes[shape] = {"db": db, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                               "slow": 0, "plan": None, "table_scans": []}
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            slow = ms >= self.slow_ms
+            if slow:
+                entry["slow"] += 1
+
+        if (new_shape or (slow and entry["plan"] is None)) and explain_with is not None:
+            plan = self._explain(statement, parameters, explain_with)
+            if plan is not None:
+                entry["plan"] = plan
+                entry["table_scans"] = scanned_tables(plan)
+        if slow:
+            logger.warning(json.dumps({
+                "db": db,
+                "ms": round(ms, 3),
+                "shape": shape,
+                "params": _loggable_params(shape, parameters),
+                "plan": entry["plan"],
+                "table_scans": entry["table_scans"],
+            }, default=str))
+
+    def _explain(self, statement: str, parameters, explain_with) -> Optional[List[str]]:
+        if not self.explain or not statement.lstrip().lower().startswith(EXPLAINABLE):
+            return None
+        try:
+            rows = explain_with("EXPLAIN QUERY PLAN " + statement, parameters)
+        except Exception as e:
+            logger.debug(f"EXPLAIN failed for {normalize_statement(statement)!r}: {e}")
+            return None
+        # (id, parent, notused, detail): indent each step under its parent
+        depth = {0: -1}
+        plan = []
+        for row in rows:
+            node_id, parent, detail = row[0], row[1], row[-1]
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append("  " * depth[node_id] + str(detail))
+        return plan
+
+    def snapshot(self, limit: Optional[int] = None, scans_only: bool = False) -> List[Dict]:
+        """Shapes by total time, slowest first"""
+        with self._lock:
+            items = [{"shape": shape, **entry, "total_ms": round(entry["total_ms"], 3),
+                      "max_ms": round(entry["max_ms"], 3),
+                      "mean_ms": round(entry["total_ms"] / entry["calls"], 3)}
+                     for shape, entry in self._shapes.items()]
+        if scans_only:
+            items = [item for item in items if item["table_scans"]]
+        items.sort(key=lambda item: item["total_ms"], reverse=True)
+        return items[:limit] if limit else items
+
+    def slow_count(self) -> int:
+        with self._lock:
+            return sum(entry["slow"] for entry in self._shapes.values())
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+QUERY_LOG = QueryLog()
+
+
+# ==============================================
+# HOOKS
+# ==============================================
+
+def watch_engine(engine, db: str, query_log: QueryLog = QUERY_LOG):
+    """Time every statement a SQLAlchemy engine executes"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        raw = conn.connection.dbapi_connection
+        query_log.record(db, statement, parameters, seconds,
+                         None if executemany else lambda sql, params: raw.execute(sql, params).fetchall())
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports execute()/executemany() to QUERY_LOG"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            QUERY_LOG.record(self.connection.db_name, sql, parameters, time.perf_counter() - started,
+                             self.connection.explain)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            QUERY_LOG.record(self.connection.db_name, sql, (), time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.connect(path, factory=TimedConnection): cursors and conn.execute() are timed"""
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.db_name = os.path.basename(str(database))
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these open their cursor without calling cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def explain(self, sql, parameters):
+        # A plain cursor, so the EXPLAIN itself is not recorded
+        return sqlite3.Cursor(self).execute(sql, parameters).fetchall()
@@ -0,0 +1,141 @@
+"""
+Metric rating, distribution and trend results for the Flask entry points
+final_flask_with_rls.py and final_flask_without_rls.py answer
+/sailing/getMetricRating, /sailing/getMetricDistribution and
+/sailing/getMetricTrend from the same per-sailing rollups of a
+SailingDataset; the routes only validate the request, pick the sailings
+(and, with RLS, the visible ships) and pass the pinned dataset in.
+
+Usage:
+    from rating_metrics import DISTRIBUTION_GROUPS, iter_metric_results, metric_distribution, filtered_metric_trend
+    results = list(iter_metric_results(current_dataset(), working_data, metric, filter_below, compare_avg))
+"""
+
+import math
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from rating_rollups import MetricStats, metric_trend
+
+# getMetricDistribution groupBy -> group label of a filtered sailing record
+DISTRIBUTION_GROUPS = {
+    "sailing": lambda s: s["Ship Name"],
+    "ship": lambda s: s.get("Ship") or s["Ship Name"],
+    "fleet": lambda s: s.get("Fleet"),
+    "all": lambda s: "all",
+}
+
+# getMetricTrend groupBy values ("all" is a single series)
+TREND_GROUPS = ("ship", "fleet", "all")
+
+
+def is_empty_or_nan(value):
+    """Check if a value is None, NaN, or empty"""
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    if isinstance(value, (list, tuple, str, dict)):
+        return len(value) < 1
+    return False
+
+
+def metric_result(dataset, sailing: Dict, metric: str, filter_below) -> Dict:
+    """getMetricRating record for one sailing (reviews at or below filter_below when given)"""
+    ship = sailing["Ship Name"]
+    number = sailing["Sailing Number"]
+    df = dataset.get_sailing_df(ship, number)
+    df_reason = dataset.get_sailing_df_reason(ship, number)
+
+    if df is None or metric not in df.columns:
+        return {
+            "ship": ship,
+            "sailingNumber": number,
+            "error": "Data not found" if df is None else "Invalid metric"
+        }
+
+    stats = dataset.metric_stats(ship, number, metric)
+
+    filtered_reviews = []
+    filtered_metric = []
+    if filter_below is not None:
+        mask = df[metric].astype(float) <= filter_below
+        filtered_reviews = df_reason.loc[mask, metric].tolist()
+        for i, rev in enumerate(filtered_reviews):
+            if is_empty_or_nan(rev):
+                filtered_reviews[i] = "Please refer to the comment"
+        filtered_metric = df.loc[mask, metric].tolist()
+
+    return {
+        "ship": ship,
+        "sailingNumber": number,
+        "metric": metric,
+        "averageRating": round(stats.mean, 2),
+        "ratingCount": stats.n,
+        "medianRating": stats.median,
+        "p10Rating": stats.quantile(0.1),
+        "filteredReviews": filtered_reviews,
+        "filteredMetric": filtered_metric,
+        "filteredCount": len(filtered_reviews)
+    }
+
+
+def overall_metric_stats(dataset, working_data: List[Dict], metric: str) -> MetricStats:
+    """Count/mean/variance of every rating of metric across the selected sailings, merged from the per-sailing rollups"""
+    return MetricStats.merge_all(dataset.metric_stats(s["Ship Name"], s["Sailing Number"], metric)
+                                 for s in working_data)
+
+
+def iter_metric_results(dataset, working_data: List[Dict], metric: str, filter_below,
+                        compare_avg: bool) -> Iterator[Dict]:
+    """
+    Yield one getMetricRating record per sailing as it is computed.
+    The overall stats for compareToAverage are merged from the per-sailing
+    rollups first (constant memory, no rating is materialized), so records
+    never have to be held back; each also gets its z-score against them.
+    """
+    overall = overall_metric_stats(dataset, working_data, metric) if compare_avg else None
+    for sailing in working_data:
+        result = metric_result(dataset, sailing, metric, filter_below)
+        if overall is not None and overall.n and "averageRating" in result:
+            result["comparisonToOverall"] = round(result["averageRating"] - overall.mean, 2)
+            stats = dataset.metric_stats(sailing["Ship Name"], sailing["Sailing Number"], metric)
+            result.update(stats.z_test(overall))
+        yield result
+
+
+def metric_distribution(dataset, working_data: List[Dict], metric: str, group_by: str) -> List[Dict]:
+    """Median, p10/p90 and 1-10 score histogram of metric per DISTRIBUTION_GROUPS[group_by]"""
+    # O(sailings): per-sailing histograms are merged, guest ratings are never rescanned
+    group_key = DISTRIBUTION_GROUPS[group_by]
+    groups: Dict[str, List[MetricStats]] = {}
+    for sailing in working_data:
+        groups.setdefault(group_key(sailing), []).append(
+            dataset.metric_stats(sailing["Ship Name"], sailing["Sailing Number"], metric))
+
+    return [{"group": group, "sailings": len(items), **MetricStats.merge_all(items).to_dict(histogram=True)}
+            for group, items in groups.items()]
+
+
+def filtered_metric_trend(dataset, metric: str, interval: str, group_by: str, window: Optional[int] = None,
+                          ships: Optional[List[str]] = None, fleet: Optional[str] = None,
+                          filters: Optional[Dict] = None) -> Dict:
+    """
+    metric_trend() of the sailings on ships (case-insensitive, None for all),
+    in fleet and starting between filters fromDate/toDate
+    """
+    # Vectorized filters over the date-sorted per-sailing rollups
+    timeline = dataset.metric_timeline(metric)
+    mask = pd.Series(True, index=timeline.index)
+    if ships is not None:
+        mask &= timeline["ship"].str.lower().isin([ship.lower() for ship in ships])
+    if fleet:
+        mask &= timeline["fleet"].str.lower() == fleet.lower()
+    filters = filters or {}
+    if filters.get("fromDate"):
+        mask &= timeline["start"] >= pd.to_datetime(filters["fromDate"])
+    if filters.get("toDate"):
+        mask &= timeline["start"] <= pd.to_datetime(filters["toDate"])
+
+    return metric_trend(timeline[mask], interval, None if group_by == "all" else group_by, window)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated rating rollups for Apollo Cruise Analytics
+Rating_Rollup keeps count/sum/sum-of-squares/min/max and a 1-10 score
+histogram per (sailing, metric) together with the fleet, ship and start
+date, so averages, medians and distributions for a sailing, ship, fleet or
+month (or a weekly/monthly trend) are merged from O(sailings) rows instead
+of scanning every guest rating. The same MetricStats type backs the in-memory rollups
+of the sailing CSV datasets.
+
+Usage (rebuild from Cruise_Ratings, e.g. after a manual import):
+    python rating_rollups.py --db ./sqlComments.db
+"""
+
+import argparse
+import math
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Ratings are whole numbers on a 1-10 scale, so a fixed 10-bin histogram is
+# an exact, mergeable sketch of the distribution (quantiles included)
+RATING_BINS = 10
+HISTOGRAM_COLUMNS = [f"bin_{k}" for k in range(1, RATING_BINS + 1)]
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Rating_Rollup (
+    fleet TEXT,
+    ship TEXT,
+    sailing_number TEXT NOT NULL,
+    start_date TEXT,
+    metric TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    total_sq REAL NOT NULL,
+    min_value REAL,
+    max_value REAL,
+    {histogram_columns},
+    PRIMARY KEY (sailing_number, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_metric_ship ON Rating_Rollup(metric, ship, start_date);
+CREATE INDEX IF NOT EXISTS idx_rollup_metric_start ON Rating_Rollup(metric, start_date);
+""".replace("{histogram_columns}", ",\n    ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in HISTOGRAM_COLUMNS))
+
+# Merging keeps the sums additive; min/max ignore the side that has no values
+UPSERT_SQL = f"""
+INSERT INTO Rating_Rollup (fleet, ship, sailing_number, start_date, metric, n, total, total_sq, min_value, max_value,
+                           {", ".join(HISTOGRAM_COLUMNS)})
+VALUES ({", ".join("?" * (10 + RATING_BINS))})
+ON CONFLICT (sailing_number, metric) DO UPDATE SET
+    n = n + excluded.n,
+    total = total + excluded.total,
+    total_sq = total_sq + excluded.total_sq,
+    min_value = COALESCE(MIN(min_value, excluded.min_value), min_value, excluded.min_value),
+    max_value = COALESCE(MAX(max_value, excluded.max_value), max_value, excluded.max_value),
+    {", ".join(f"{c} = {c} + excluded.{c}" for c in HISTOGRAM_COLUMNS)}
+"""
+
+
+def rating_bins(values) -> np.ndarray:
+    """0-based histogram bin of each rating (rounded and clipped to 1-10)"""
+    return np.clip(np.rint(values), 1, RATING_BINS).astype(np.intp) - 1
+
+
+class MetricStats:
+    """
+    Mergeable summary of a set of ratings: count, mean, M2 (sum of squared
+    deviations), min, max and the 1-10 histogram. Merges use Chan's
+    pairwise update of (n, mean, M2), so combining thousands of sailings
+    keeps the variance accurate without revisiting any rating.
+    """
+
+    __slots__ = ("n", "mean_value", "m2", "min_value", "max_value", "histogram")
+
+    def __init__(self, n: int = 0, total: float = 0.0, total_sq: float = 0.0,
+                 min_value: Optional[float] = None, max_value: Optional[float] = None,
+                 histogram=None):
+        """From plain sums, as stored in Rating_Rollup"""
+        self.n = int(n)
+        self.mean_value = float(total) / self.n if self.n else 0.0
+        self.m2 = max(float(total_sq) - float(total) * self.mean_value, 0.0)
+        self.min_value = min_value
+        self.max_value = max_value
+        self.histogram = (np.zeros(RATING_BINS, dtype=np.int64) if histogram is None
+                          else np.asarray(histogram, dtype=np.int64))
+
+    @classmethod
+    def from_moments(cls, n: int, mean: float, m2: float, min_value: Optional[float] = None,
+                     max_value: Optional[float] = None, histogram=None) -> "MetricStats":
+        stats = cls(min_value=min_value, max_value=max_value, histogram=histogram)
+        stats.n, stats.mean_value, stats.m2 = int(n), float(mean), float(m2)
+        return stats
+
+    @classmethod
+    def from_values(cls, values) -> "MetricStats":
+        """Stats of the non-NaN entries of an array-like (two-pass mean and M2)"""
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[~np.isnan(arr)]
+        if not arr.size:
+            return cls()
+        mean = arr.mean()
+        deviations = arr - mean
+        return cls.from_moments(arr.size, mean, np.dot(deviations, deviations), float(arr.min()),
+                                float(arr.max()), np.bincount(rating_bins(arr), minlength=RATING_BINS))
+
+    def merge(self, other: "MetricStats") -> "MetricStats":
+        if not other.n:
+            return self
+        if not self.n:
+            return other
+        n = self.n + other.n
+        delta = other.mean_value - self.mean_value
+        return MetricStats.from_moments(n, self.mean_value + delta * other.n / n,
+                                        self.m2 + other.m2 + delta * delta * self.n * other.n / n,
+                                        min(self.min_value, other.min_value), max(self.max_value, other.max_value),
+                                        self.histogram + other.histogram)
+
+    @classmethod
+    def merge_all(cls, items: Iterable["MetricStats"]) -> "MetricStats":
+        result = cls()
+        for item in items:
+            result = result.merge(item)
+        return result
+
+    @property
+    def total(self) -> float:
+        return self.mean_value * self.n
+
+    @property
+    def total_sq(self) -> float:
+        return self.m2 + self.n * self.mean_value * self.mean_value
+
+    @property
+    def mean(self) -> float:
+        return self.mean_value if self.n else float("nan")
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1)"""
+        if self.n < 2:
+            return float("nan")
+        return self.m2 / (self.n - 1)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance) if self.n > 1 else float("nan")
+
+    def z_test(self, population: "MetricStats", critical: float = 1.96) -> Dict:
+        """
+        How far this sample's mean sits from the population mean in standard
+        errors (population std / sqrt(n)), the two-sided p-value, and
+        "above"/"below"/"not significant" at the critical |z| (1.96 = 95%)
+        """
+        if self.n < 1 or population.n < 2 or not population.m2:
+            return {"zScore": None, "pValue": None, "significance": "not significant"}
+        z = (self.mean - population.mean) / (population.std / math.sqrt(self.n))
+        significance = "not significant"
+        if abs(z) >= critical:
+            significance = "above" if z > 0 else "below"
+        return {"zScore": round(z, 2), "pValue": round(math.erfc(abs(z) / math.sqrt(2)), 4),
+                "significance": significance}
+
+    def quantile(self, q: float) -> float:
+        """Nearest-rank quantile from the histogram (exact for whole-number ratings)"""
+        counted = int(self.histogram.sum())
+        if not counted:
+            return float("nan")
+        rank = min(max(1, math.ceil(q * counted)), counted)
+        return float(np.searchsorted(np.cumsum(self.histogram), rank) + 1)
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def to_dict(self, digits: int = 4, histogram: bool = False) -> Dict:
+        """count/mean/std/min/max/median/p10/p90; histogram=True adds the counts of scores 1-10"""
+        def r(value):
+            return None if value is None or math.isnan(value) else round(value, digits)
+        result = {"count": self.n, "mean": r(self.mean), "std": r(self.std),
+                  "min": self.min_value, "max": self.max_value,
+                  "median": r(self.median), "p10": r(self.quantile(0.1)), "p90": r(self.quantile(0.9))}
+        if histogram:
+            result["histogram"] = self.histogram.tolist()
+        return result
+
+
+# Pandas period frequencies; weekly periods run Monday to Sunday
+TREND_INTERVALS = {"week": "W-SUN", "month": "M", "quarter": "Q"}
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the last window columns of each row (shorter at the start)"""
+    cumulative = np.cumsum(values, axis=1)
+    result = cumulative.copy()
+    result[:, window:] -= cumulative[:, :-window]
+    return result
+
+
+def metric_trend(rows: pd.DataFrame, interval: str = "month", group_by: Optional[str] = None,
+                 window: Optional[int] = None) -> Dict:
+    """
+    Bucket per-sailing rollups (columns start, n, total, total_sq and the
+    group_by column) into week/month/quarter periods by sailing start date.
+    Every series shares one period axis, empty periods included (count 0,
+    mean null); window > 1 turns each point into the total of the last
+    window periods. Returns {"periods": [...], "series": [{"group",
+    "sailings", "count", "mean", "std"}]} with one list entry per period.
+    """
+    rows = rows[rows["start"].notna()]
+    if rows.empty:
+        return {"periods": [], "series": []}
+    periods = rows["start"].dt.to_period(TREND_INTERVALS[interval])
+    ordinals = periods.array.asi8
+    first = ordinals.min()
+    span = int(ordinals.max() - first) + 1
+    labels = rows[group_by].fillna("Unknown") if group_by else pd.Series("all", index=rows.index)
+    group_codes, groups = pd.factorize(labels, sort=True)
+
+    # One bincount per aggregate over a (group, period) grid
+    cells = group_codes.astype(np.intp) * span + (ordinals - first)
+    shape = (len(groups), span)
+
+    def grid(weights=None):
+        return np.bincount(cells, weights=weights, minlength=shape[0] * span).reshape(shape).astype(np.float64)
+
+    sailings = grid()
+    n = grid(rows["n"].to_numpy(dtype=np.float64))
+    total = grid(rows["total"].to_numpy(dtype=np.float64))
+    total_sq = grid(rows["total_sq"].to_numpy(dtype=np.float64))
+    if window and window > 1:
+        sailings, n, total, total_sq = (rolling_sum(a, window) for a in (sailings, n, total, total_sq))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(n > 0, total / n, np.nan)
+        variance = np.where(n > 1, np.maximum(total_sq - total * mean, 0.0) / (n - 1), np.nan)
+    mean = np.round(mean, 4)
+    std = np.round(np.sqrt(variance), 4)
+
+    axis = pd.period_range(periods.min(), periods=span, freq=TREND_INTERVALS[interval])
+    return {
+        "periods": axis.start_time.strftime("%Y-%m-%d").tolist(),
+        "series": [{"group": group, "sailings": sailings[i].astype(np.int64).tolist(),
+                    "count": n[i].astype(np.int64).tolist(), "mean": mean[i].tolist(), "std": std[i].tolist()}
+                   for i, group in enumerate(groups)],
+    }
+
+
+def frame_stats(df: pd.DataFrame, metrics: Optional[List[str]] = None) -> Dict[str, MetricStats]:
+    """MetricStats per numeric column of one sailing's ratings frame"""
+    stats = {}
+    for column in metrics or df.columns:
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors="coerce")
+        if values.notna().any():
+            stats[column] = MetricStats.from_values(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    return stats
+
+
+def rollup_frame(ratings: pd.DataFrame, metrics: List[str],
+                 keys=("Fleet", "Ship", "Sailing Number", "Start")) -> pd.DataFrame:
+    """
+    Long-form rollup rows (one per sailing and metric) for a batch of guest
+    ratings, vectorized with one groupby per aggregate.
+    """
+    keys = list(keys)
+    by = [ratings[k] for k in keys]
+    values = ratings[metrics].apply(pd.to_numeric, errors="coerce")
+    grouped = values.groupby(by, sort=False)
+    squares = (values * values).groupby(by, sort=False)
+    parts = {
+        "n": grouped.count(), "total": grouped.sum(), "total_sq": squares.sum(),
+        "min_value": grouped.min(), "max_value": grouped.max(),
+    }
+    binned = values.round().clip(1, RATING_BINS)
+    for k, column in enumerate(HISTOGRAM_COLUMNS, start=1):
+        parts[column] = (binned == k).groupby(by, sort=False).sum()
+    long = pd.concat({name: frame.stack(future_stack=True) for name, frame in parts.items()}, axis=1)
+    long.index = long.index.set_names(keys + ["metric"])
+    long = long[long["n"] > 0].reset_index()
+    return long[keys + ["metric", "n", "total", "total_sq", "min_value", "max_value"] + HISTOGRAM_COLUMNS]
+
+
+def ensure_rollups(conn: sqlite3.Connection):
+    conn.executescript(ROLLUP_SCHEMA)
+    # Tables created before the histogram columns get them empty; rebuild_rollups fills them
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(Rating_Rollup)")}
+    for column in HISTOGRAM_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE Rating_Rollup ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+
+
+def write_rollup(conn: sqlite3.Connection, rollup: pd.DataFrame):
+    """Merge rollup_frame() rows into Rating_Rollup (repeat ingests of a sailing accumulate)"""
+    rows = rollup.astype(object).where(pd.notna(rollup), None)
+    conn.executemany(UPSERT_SQL, rows.itertuples(index=False, name=None))
+
+
+def rebuild_rollups(conn: sqlite3.Connection, metrics: List[str]) -> int:
+    """Recompute Rating_Rollup from every row of Cruise_Ratings; returns the rollup row count"""
+    ensure_rollups(conn)
+    conn.execute("DELETE FROM Rating_Rollup")
+    has_sailings = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Sailings'").fetchone()
+    start_expr = ("(SELECT MIN(start_date) FROM Sailings s WHERE s.sailing_number = cr.`Sailing Number`)"
+                  if has_sailings else "NULL")
+    for metric in metrics:
+        column = f"cr.`{metric}`"
+        score = f"MIN(MAX(CAST(ROUND({column}) AS INTEGER), 1), {RATING_BINS})"
+        bins = ", ".join(f"SUM({score} = {k})" for k in range(1, RATING_BINS + 1))
+        conn.execute(f"""
+            INSERT INTO Rating_Rollup (fleet, ship, sailing_number, start_date, metric, n, total, total_sq, min_value, max_value,
+                                       {", ".join(HISTOGRAM_COLUMNS)})
+            SELECT cr.Fleet, cr.Ship, cr.`Sailing Number`, {start_expr}, ?,
+                   COUNT({column}), SUM({column}), SUM({column} * {column}), MIN({column}), MAX({column}),
+                   {bins}
+            FROM Cruise_Ratings cr
+            WHERE {column} IS NOT NULL
+            GROUP BY cr.`Sailing Number`
+        """, (metric,))
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM Rating_Rollup").fetchone()[0]
+
+
+def main():
+    from generate_comprehensive_ratings_data import rating_categories
+
+    parser = argparse.ArgumentParser(description="Rebuild Rating_Rollup from Cruise_Ratings")
+    parser.add_argument("--db", default="./sqlComments.db")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with sqlite3.connect(args.db) as conn:
+        rows = rebuild_rollups(conn, rating_categories)
+    print(f"✅ {rows:,} rollup rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
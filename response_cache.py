@@ -0,0 +1,143 @@
+"""
+Response cache for read-mostly /sailing endpoints
+Caches the serialized JSON body per (endpoint, normalized request, access
+set, data version), serves it with a strong ETag and answers 304 when the
+client already holds the same payload. Entries are evicted LRU once the
+stored bytes exceed the configured budget.
+
+Usage:
+    RESPONSE_CACHE = ResponseCache(max_bytes=32 * 1024 * 1024)
+
+    @app.route('/sailing/fleets', methods=['GET'])
+    @RESPONSE_CACHE.cached(access=cache_access_key, version=cache_data_version)
+    def get_fleets():
+        ...
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Response, request
+
+
+def file_signature(*paths: str) -> Tuple:
+    """(mtime_ns, size) of each path, so a write to a SQLite file (or its WAL) changes the version"""
+    signature = []
+    for path in paths:
+        for candidate in (path, f"{path}-wal"):
+            try:
+                st = os.stat(candidate)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+    return tuple(signature)
+
+
+def normalized_request() -> str:
+    """Canonical form of the query string and JSON body (key order and whitespace ignored)"""
+    body = request.get_json(silent=True) if request.method != "GET" else None
+    return json.dumps(
+        {"args": sorted(request.args.items(multi=True)), "body": body},
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+
+
+def make_etag(body: bytes) -> str:
+    """Strong validator for a body (unquoted; Response.set_etag adds the quotes)"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe, byte-bounded LRU of serialized 200 responses"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, str, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, mimetype: str) -> str:
+        etag = make_etag(body)
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, mimetype, etag)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats["evictions"] += 1
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes}
+
+    def _respond(self, body: bytes, mimetype: str, etag: str) -> Response:
+        if request.if_none_match.contains_weak(etag):
+            with self._lock:
+                self.stats["not_modified"] += 1
+            response = Response(status=304)
+        else:
+            response = Response(body, status=200, mimetype=mimetype)
+        response.set_etag(etag)
+        # Per-user payloads: browsers may keep them but must revalidate
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    def cached(self, access: Callable[[], Hashable], version: Callable[[], Hashable]):
+        """
+        Decorator for a view returning a JSON response. access() returns the
+        caller's effective access set and version() the current data version;
+        both are part of the key, so grants and reloads never serve stale data.
+        Only 200 responses are stored.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                key = (request.endpoint, normalized_request(), access(), version())
+                entry = self.get(key)
+                if entry is not None:
+                    body, mimetype, etag = entry
+                    return self._respond(body, mimetype, etag)
+
+                result = view(*args, **kwargs)
+                response = result if isinstance(result, Response) else None
+                if response is None or response.status_code != 200 or response.direct_passthrough:
+                    return result
+                body = response.get_data()
+                etag = self.put(key, body, response.mimetype)
+                return self._respond(body, response.mimetype, etag)
+            return wrapped
+        return decorator
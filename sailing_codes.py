@@ -0,0 +1,121 @@
+"""
+Sailing code parser
+Sailing codes name the ship and the cruise dates: MDY2-2-9April,
+MDY-29Dec-5Jan, MEX2-29Dec-5Jan, MoV-23-30Mar, optionally followed by an
+itinerary (MEX-10-17Jan-AtlanticIslands). The start takes the end's month
+when it has none, and a start month after the end month means the cruise
+began in the year before.
+
+parse_sailing_code() is memoized for the per-record lookups at startup;
+parse_sailing_codes() parses a whole column at once.
+
+Usage:
+    parse_sailing_code("MDY-29Dec-5Jan", year=2025)
+    # SailingCode(prefix='MDY', ship='Discovery', start='2024-12-29', end='2025-01-05')
+"""
+
+import datetime
+import re
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Longest prefixes first so MDY2 is not read as MDY + day 2
+SHIP_PREFIXES = {
+    "MDY2": "Discovery 2",
+    "MDY": "Discovery",
+    "MEX2": "Explorer 2",
+    "MEX": "Explorer",
+    "MOV": "Voyager",
+    "MVO": "Voyager",
+}
+
+MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+SAILING_CODE_PATTERN = re.compile(
+    r"^(?P<prefix>" + "|".join(SHIP_PREFIXES) + r")[-_ ]?"
+    r"(?P<start_day>\d{1,2})(?P<start_month>[A-Za-z]+)?-"
+    r"(?P<end_day>\d{1,2})(?P<end_month>[A-Za-z]+)"
+    r"(?:-.*)?$",
+    re.IGNORECASE,
+)
+
+YEAR_PATTERN = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+class SailingCode(NamedTuple):
+    prefix: str
+    ship: str
+    start: Optional[str]
+    end: Optional[str]
+
+
+def infer_year(*hints: str, default: Optional[int] = None) -> int:
+    """
+    First four-digit year found in the hints (e.g. a data folder named
+    "DISCOVERY 2 - 2025"), else default, else the current year
+    """
+    for hint in hints:
+        match = YEAR_PATTERN.search(str(hint or ""))
+        if match:
+            return int(match.group(1))
+    return default if default is not None else datetime.date.today().year
+
+
+def month_number(name: Optional[str]) -> Optional[int]:
+    return MONTHS.get(name[:3].lower()) if name else None
+
+
+def _iso_date(year: int, month: Optional[int], day: int) -> Optional[str]:
+    if month is None:
+        return None
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def parse_sailing_code(code: str, year: Optional[int] = None) -> Optional[SailingCode]:
+    """Prefix, ship and ISO start/end dates of a sailing code (year is the end date's); None if unrecognized"""
+    match = SAILING_CODE_PATTERN.match(code or "")
+    if not match:
+        return None
+    year = year if year is not None else infer_year(code)
+    prefix = match.group("prefix").upper()
+    end_month = month_number(match.group("end_month"))
+    start_month = month_number(match.group("start_month")) if match.group("start_month") else end_month
+    start_year = year - 1 if start_month and end_month and start_month > end_month else year
+    return SailingCode(prefix, SHIP_PREFIXES[prefix],
+                       _iso_date(start_year, start_month, int(match.group("start_day"))),
+                       _iso_date(year, end_month, int(match.group("end_day"))))
+
+
+def sailing_dates(code: str, year: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+    parsed = parse_sailing_code(code, year)
+    return (parsed.start, parsed.end) if parsed else (None, None)
+
+
+def parse_sailing_codes(codes: Iterable[str], year: Optional[int] = None) -> pd.DataFrame:
+    """
+    Bulk parse: one row per code with prefix, ship, start and end
+    (datetime64, NaT when unrecognized). Each distinct code is parsed once
+    (through the memo) and the results are gathered back by factorize codes.
+    """
+    values = pd.Series(list(codes), dtype=object)
+    inverse, uniques = pd.factorize(values)
+    parsed = [parse_sailing_code(code, year) if isinstance(code, str) else None for code in uniques]
+    empty = SailingCode(None, None, None, None)
+    # One extra row of NaT/None for the codes factorize could not index (None/NaN)
+    table = pd.DataFrame({
+        "prefix": np.array([(p or empty).prefix for p in parsed] + [None], dtype=object),
+        "ship": np.array([(p or empty).ship for p in parsed] + [None], dtype=object),
+        "start": np.array([(p or empty).start for p in parsed] + [None], dtype="datetime64[D]"),
+        "end": np.array([(p or empty).end for p in parsed] + [None], dtype="datetime64[D]"),
+    })
+    result = table.iloc[np.where(inverse >= 0, inverse, len(parsed))].reset_index(drop=True)
+    result.insert(0, "code", values)
+    return result
@@ -0,0 +1,363 @@
+"""
+Sailing dataset store for the Flask entry points
+Holds the summary records (SAMPLE_DATA) and the per-sailing rating/reason
+DataFrames, loading them lazily on first use or on a background warm-up
+thread so importing the app stays cheap. A watcher thread can rebuild the
+dataset when the sailing CSV folders change and swap the new generation in.
+Under gunicorn --preload the watcher runs in the master only, and
+recycle_workers() replaces the workers with forks of the new generation.
+"""
+
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rating_rollups import MetricStats, frame_stats
+from summary_store import SummaryStore
+# Folders read by test_data.load_sailing_data_rate_reason(), so the watcher scans the same ones
+from test_data import SAILING_DATA_DIRS
+
+logger = logging.getLogger(__name__)
+
+# How missing summary ratings are filled in (summary_store.IMPUTE_STRATEGIES)
+SUMMARY_IMPUTATION = os.environ.get("CRUISE_SUMMARY_IMPUTATION", "legacy")
+
+
+def scan_sailing_sources(data_dirs: List[str] = SAILING_DATA_DIRS) -> Tuple:
+    """
+    Cheap fingerprint of the sailing folders: (path, mtime_ns, size) for every
+    CSV one level below each data dir. Only stat() calls, no file reads.
+    """
+    entries = []
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        for subdir in sorted(os.scandir(data_dir), key=lambda e: e.name):
+            if not subdir.is_dir():
+                continue
+            for entry in sorted(os.scandir(subdir.path), key=lambda e: e.name):
+                if entry.name.endswith(".csv") and entry.is_file():
+                    st = entry.stat()
+                    entries.append((entry.path, st.st_mtime_ns, st.st_size))
+    return tuple(entries)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast numeric columns to float32 where every value survives the
+    round trip (whole-number ratings do) and dictionary-encode repetitive
+    text columns (fewer distinct values than half the rows); free text such
+    as review reasons stays object. The float32 columns consolidate into one
+    contiguous block and category codes are small integer arrays, so a
+    frozen frame is mostly large buffers that refcount updates never write to.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            compact = series.astype(np.float32)
+            exact = np.array_equal(compact.to_numpy(dtype=np.float64), series.to_numpy(dtype=np.float64),
+                                   equal_nan=True)
+            columns[col] = compact if exact else series
+        elif ((pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series))
+              and series.nunique() < 0.5 * len(series)):
+            columns[col] = series.astype("category")
+        else:
+            columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def metric_timelines(summary: SummaryStore, stats: Dict[str, Dict[str, MetricStats]]) -> Dict[str, pd.DataFrame]:
+    """
+    Per-metric columns sorted by sailing start date (one row per sailing:
+    start, ship, fleet, sailing, n, total, total_sq) for trend queries
+    """
+    rows = []
+    for record in summary:
+        per_metric = stats.get(f"{record['Ship Name']}_{record['Sailing Number']}".lower(), {})
+        for metric, s in per_metric.items():
+            rows.append((metric, record.get("Start"), record.get("Ship"), record.get("Fleet"),
+                         record["Ship Name"], s.n, s.total, s.total_sq))
+    frame = pd.DataFrame(rows, columns=["metric", "start", "ship", "fleet", "sailing", "n", "total", "total_sq"])
+    frame["start"] = pd.to_datetime(frame["start"], errors="coerce")
+    frame = frame.dropna(subset=["start"]).sort_values("start", kind="stable")
+    return {metric: group.drop(columns="metric").reset_index(drop=True)
+            for metric, group in frame.groupby("metric", sort=False)}
+
+
+class SailingDataset:
+    """One loaded generation of the sailing datasets (treat as read-only)"""
+
+    def __init__(self, summary: List[Dict], ratings: Dict[str, pd.DataFrame],
+                 reasons: Dict[str, pd.DataFrame], load_seconds: float = 0.0,
+                 impute: str = SUMMARY_IMPUTATION):
+        self.summary = SummaryStore.from_records(summary, impute)
+        self.ratings = ratings
+        self.reasons = reasons
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        # Per-sailing rollups of every numeric column, so averages never rescan guest rows
+        self.stats: Dict[str, Dict[str, MetricStats]] = {key: frame_stats(df) for key, df in ratings.items()}
+        self.timelines = metric_timelines(self.summary, self.stats)
+        self.frozen = False
+        self.version = 0
+        self.source_signature: Tuple = ()
+
+    def freeze(self) -> "SailingDataset":
+        """Compact every frame and make the lookup tables read-only"""
+        if not self.frozen:
+            self.ratings = MappingProxyType({k: compact_frame(v) for k, v in self.ratings.items()})
+            self.reasons = MappingProxyType({k: compact_frame(v) for k, v in self.reasons.items()})
+            self.frozen = True
+        return self
+
+    def memory_breakdown(self) -> Dict[str, int]:
+        """Approximate deep size of the summary store, rating frames and reason frames (cached once frozen)"""
+        breakdown = getattr(self, "_memory_breakdown", None)
+        if breakdown is None:
+            breakdown = {
+                "summary": self.summary.memory_bytes(),
+                "ratings": int(sum(df.memory_usage(deep=True).sum() for df in self.ratings.values())),
+                "reasons": int(sum(df.memory_usage(deep=True).sum() for df in self.reasons.values())),
+            }
+            if self.frozen:
+                self._memory_breakdown = breakdown
+        return breakdown
+
+    def memory_bytes(self) -> int:
+        return sum(self.memory_breakdown().values())
+
+    def get_sailing_df(self, ship: str, sailing_number: str) -> Optional[pd.DataFrame]:
+        return self.ratings.get(f"{ship}_{sailing_number}".lower())
+
+    def get_sailing_df_reason(self, ship: str, sailing_number: str) -> Optional[pd.DataFrame]:
+        return self.reasons.get(f"{ship}_{sailing_number}".lower())
+
+    def metric_stats(self, ship: str, sailing_number: str, metric: str) -> MetricStats:
+        """Rollup of one metric for one sailing (empty stats if it has no ratings)"""
+        return self.stats.get(f"{ship}_{sailing_number}".lower(), {}).get(metric) or MetricStats()
+
+    def metric_timeline(self, metric: str) -> pd.DataFrame:
+        """Date-sorted per-sailing rollups of one metric (see metric_timelines)"""
+        timeline = self.timelines.get(metric)
+        if timeline is None:
+            return pd.DataFrame(columns=["start", "ship", "fleet", "sailing", "n", "total", "total_sq"])
+        return timeline
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "summary_records": len(self.summary),
+            "summary_imputation": self.summary.imputation,
+            "sailings": len(self.ratings),
+            "load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at,
+            "frozen": self.frozen,
+        }
+
+
+def load_dataset() -> SailingDataset:
+    """Default loader: test_data summary records plus the sailing CSV folders"""
+    from test_data import get_summary_data, load_sailing_data_rate_reason
+
+    started = time.perf_counter()
+    summary = get_summary_data(impute=False)
+    ratings, reasons = load_sailing_data_rate_reason()
+    return SailingDataset(summary, ratings, reasons, time.perf_counter() - started)
+
+
+class DatasetStore:
+    """
+    Lazily-initialised holder for the current SailingDataset.
+    get() loads on first use (other callers wait for the same load);
+    start_warmup() does the load on a daemon thread instead.
+
+    Each generation is an immutable snapshot with a version number.
+    reload() builds the next one without holding the lock get() uses and
+    replaces the reference in one assignment, so requests never wait on a
+    reload; a request that already holds the old snapshot keeps using it and
+    the old frames are freed when the last such request drops them.
+    """
+
+    def __init__(self, loader: Callable[[], SailingDataset] = load_dataset,
+                 scanner: Callable[[], Tuple] = scan_sailing_sources):
+        self._loader = loader
+        self._scanner = scanner
+        self._dataset: Optional[SailingDataset] = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._error: Optional[str] = None
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._freeze = False
+        self._version = 0
+        self._reload_error: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+
+    def is_ready(self) -> bool:
+        return self._dataset is not None
+
+    @property
+    def version(self) -> int:
+        """Version of the live generation (0 until the first load), without blocking"""
+        dataset = self._dataset
+        return dataset.version if dataset is not None else 0
+
+    def _build(self) -> SailingDataset:
+        """Load one new generation (fingerprint taken first, so edits during the load are seen next poll)"""
+        signature = self._scanner()
+        dataset = self._loader()
+        dataset.source_signature = signature
+        if self._freeze:
+            dataset.freeze()
+        self._version += 1
+        dataset.version = self._version
+        return dataset
+
+    def get(self) -> SailingDataset:
+        dataset = self._dataset
+        if dataset is not None:
+            return dataset
+        with self._lock:
+            if self._dataset is None:
+                try:
+                    self._dataset = self._build()
+                    self._error = None
+                    logger.info(f"Loaded sailing datasets in {self._dataset.load_seconds:.2f}s")
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Failed to load sailing datasets: {e}")
+                    raise
+            return self._dataset
+
+    def preload(self, freeze: bool = True) -> SailingDataset:
+        """
+        Load synchronously in the parent process before workers are forked
+        (gunicorn --preload). The dataset is frozen into compact buffers and
+        gc.freeze() moves everything allocated so far out of the collector's
+        reach, so the pages stay shared copy-on-write across workers.
+        """
+        self._freeze = freeze
+        dataset = self.get()
+        if freeze:
+            dataset.freeze()
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Preloaded sailing datasets for forking ({dataset.memory_bytes() / 1e6:.1f} MB of frames)")
+        return dataset
+
+    def start_warmup(self, extra_steps: Optional[List[Callable[[], object]]] = None) -> threading.Thread:
+        """Load the datasets (then run extra_steps, e.g. opening search clients) off the request path"""
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+
+        def run():
+            try:
+                self.get()
+            except Exception:
+                return
+            for step in extra_steps or []:
+                try:
+                    step()
+                except Exception as e:
+                    logger.warning(f"Warm-up step {getattr(step, '__name__', step)} failed: {e}")
+
+        self._warmup_thread = threading.Thread(target=run, name="dataset-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Build a new generation if the sailing folders changed (or force=True)
+        and swap it in. On failure the current generation stays live.
+        Returns True when a new generation was installed.
+        """
+        with self._reload_lock:
+            current = self._dataset
+            if current is None:
+                self.get()
+                return True
+            if not force and self._scanner() == current.source_signature:
+                return False
+            try:
+                started = time.perf_counter()
+                dataset = self._build()
+            except Exception as e:
+                self._reload_error = str(e)
+                logger.error(f"Reload of sailing datasets failed, keeping version {current.version}: {e}")
+                return False
+            self._dataset = dataset
+            self._reload_error = None
+            logger.info(f"Swapped in sailing datasets version {dataset.version} "
+                        f"({len(dataset.ratings)} sailings, {time.perf_counter() - started:.2f}s)")
+            return True
+
+    def start_watcher(self, interval: float = 60.0,
+                      on_reload: Optional[Callable[[SailingDataset], None]] = None) -> threading.Thread:
+        """
+        Poll the sailing folders every interval seconds and reload on change,
+        then call on_reload(new_dataset). The thread lives in this process
+        only (threads do not survive fork()), so in a pre-fork master it is
+        the one place that reloads; see recycle_workers().
+        """
+        with self._watcher_lock:
+            if self._watcher is not None:
+                return self._watcher
+
+            def run():
+                pending = None
+                while True:
+                    time.sleep(interval)
+                    current = self._dataset
+                    if current is None:
+                        continue
+                    try:
+                        signature = self._scanner()
+                    except OSError as e:
+                        logger.warning(f"Scanning sailing folders failed: {e}")
+                        continue
+                    if signature == current.source_signature:
+                        pending = None
+                    elif signature == pending:
+                        # Unchanged for a full interval, so the export has finished copying
+                        if self.reload() and on_reload is not None:
+                            on_reload(self._dataset)
+                        pending = None
+                    else:
+                        pending = signature
+
+            self._watcher = threading.Thread(target=run, name="dataset-watcher", daemon=True)
+            self._watcher.start()
+            return self._watcher
+
+    def status(self) -> Dict:
+        if self._dataset is not None:
+            status = {"status": "ready", **self._dataset.describe()}
+            if self._reload_error:
+                status["reload_error"] = self._reload_error
+            return status
+        if self._error:
+            return {"status": "error", "error": self._error}
+        return {"status": "loading"}
+
+
+def recycle_workers(dataset: SailingDataset):
+    """
+    on_reload for a gunicorn --preload master: freeze the new generation out
+    of the collector's reach and send the master SIGHUP, so gunicorn forks
+    fresh workers (sharing the new pages and version number) and retires the
+    old ones gracefully.
+    """
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Recycling workers for sailing datasets version {dataset.version}")
+    os.kill(os.getpid(), signal.SIGHUP)
@@ -0,0 +1,175 @@
+"""
+Segment-level analytics cube for Apollo Cruise Analytics
+Loads the per-guest ratings file (test_data/comprehensive_cruise_ratings.csv
+or a generated one) once into dictionary-encoded columns: integer codes for
+sailing, ship, fleet and the guest segments, float32 arrays per metric.
+"Metric X by cabin category across these sailings" is then a boolean gather
+plus three np.bincount calls, independent of pandas groupby overhead.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from rating_rollups import RATING_BINS, MetricStats, rating_bins
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_CSV = "./test_data/comprehensive_cruise_ratings.csv"
+
+SEGMENT_DIMENSIONS = ['Guest Type', 'Cabin Category', 'Age Group', 'Travel Party Size']
+
+KEY_COLUMNS = ['Sailing Number', 'Fleet', 'Ship', 'Start']
+
+
+class SegmentCube:
+    """Columnar, dictionary-encoded guest ratings (read-only once built)"""
+
+    def __init__(self, df: pd.DataFrame, metrics: List[str]):
+        self.rows = len(df)
+        self.metrics = [m for m in metrics if m in df.columns]
+
+        sailing = pd.Categorical(df['Sailing Number'].astype(str))
+        self.sailing_codes = sailing.codes.astype(np.int32)
+        self.sailings = np.asarray(sailing.categories, dtype=object)
+
+        # Per-sailing attributes, indexed by sailing code
+        first = pd.DataFrame({"code": self.sailing_codes, "Ship": df['Ship'].astype(str).to_numpy(),
+                              "Fleet": df['Fleet'].astype(str).to_numpy(),
+                              "Start": df['Start'].astype(str).to_numpy()}).drop_duplicates("code").set_index("code")
+        first = first.reindex(range(len(self.sailings)))
+        self.sailing_ship = first["Ship"].str.lower().to_numpy(dtype=object)
+        self.sailing_fleet = first["Fleet"].str.lower().to_numpy(dtype=object)
+        self.sailing_start = first["Start"].to_numpy(dtype=object)
+
+        self.dimensions: Dict[str, tuple] = {}
+        for dim in SEGMENT_DIMENSIONS:
+            if dim not in df.columns:
+                continue
+            values = df[dim].astype("string").fillna("Unknown")
+            cat = pd.Categorical(values)
+            self.dimensions[dim] = (cat.codes.astype(np.int16), [str(c) for c in cat.categories])
+
+        self.values = {m: pd.to_numeric(df[m], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+                       for m in self.metrics}
+
+    @classmethod
+    def from_csv(cls, csv_path: str, metrics: Optional[List[str]] = None) -> "SegmentCube":
+        header = pd.read_csv(csv_path, nrows=0).columns
+        if metrics is None:
+            from generate_comprehensive_ratings_data import rating_categories
+            metrics = rating_categories
+        metrics = [m for m in metrics if m in header]
+        usecols = [c for c in KEY_COLUMNS + SEGMENT_DIMENSIONS if c in header] + metrics
+        dtypes = {c: "category" for c in KEY_COLUMNS + SEGMENT_DIMENSIONS if c in header}
+        dtypes.update({m: np.float32 for m in metrics})
+        df = pd.read_csv(csv_path, usecols=usecols, dtype=dtypes)
+        return cls(df, metrics)
+
+    def memory_bytes(self) -> int:
+        arrays = [self.sailing_codes] + list(self.values.values()) + [codes for codes, _ in self.dimensions.values()]
+        return int(sum(a.nbytes for a in arrays))
+
+    def sailing_mask(self, sailing_numbers: Optional[List[str]] = None, ships: Optional[List[str]] = None,
+                     fleet: Optional[str] = None, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None) -> np.ndarray:
+        """Boolean table over sailing codes for the filters (ISO dates compare as strings)"""
+        allowed = np.ones(len(self.sailings), dtype=bool)
+        if sailing_numbers is not None:
+            allowed &= np.isin(self.sailings, [str(s) for s in sailing_numbers])
+        if ships is not None:
+            allowed &= np.isin(self.sailing_ship, [s.lower() for s in ships])
+        if fleet:
+            allowed &= self.sailing_fleet == fleet.lower()
+        if start_date:
+            allowed &= self.sailing_start >= start_date
+        if end_date:
+            allowed &= self.sailing_start <= end_date
+        return allowed
+
+    def segment(self, metric: str, dimension: str, **filters) -> List[Dict]:
+        """
+        Count/mean/std/min/max/median/p10/p90 of metric per category of dimension over the
+        sailings matching filters (see sailing_mask). Categories without any
+        rating are omitted.
+        """
+        if metric not in self.values:
+            raise KeyError(f"Unknown metric: {metric}")
+        if dimension not in self.dimensions:
+            raise KeyError(f"Unknown segment dimension: {dimension}")
+
+        codes, categories = self.dimensions[dimension]
+        values = self.values[metric]
+        rows = ~np.isnan(values)
+        allowed = self.sailing_mask(**filters)
+        if not allowed.all():
+            rows &= allowed[self.sailing_codes]
+        seg = codes[rows]
+        vals = values[rows].astype(np.float64)
+
+        k = len(categories)
+        counts = np.bincount(seg, minlength=k)
+        sums = np.bincount(seg, weights=vals, minlength=k)
+        sums_sq = np.bincount(seg, weights=vals * vals, minlength=k)
+        mins = np.full(k, np.inf)
+        maxs = np.full(k, -np.inf)
+        np.minimum.at(mins, seg, vals)
+        np.maximum.at(maxs, seg, vals)
+        histograms = np.bincount(seg.astype(np.intp) * RATING_BINS + rating_bins(vals),
+                                 minlength=k * RATING_BINS).reshape(k, RATING_BINS)
+
+        return [{"segment": categories[i], **MetricStats(counts[i], sums[i], sums_sq[i], float(mins[i]),
+                                                         float(maxs[i]), histograms[i]).to_dict()}
+                for i in range(k) if counts[i]]
+
+
+# ==============================================
+# CACHED LOADING
+# ==============================================
+
+_CUBE_CACHE: Dict[str, tuple] = {}
+_CUBE_LOCK = threading.Lock()
+# Separate from _CUBE_LOCK so hits are not held up by a build in progress
+_STATS_LOCK = threading.Lock()
+_CUBE_STATS = {"hits": 0, "misses": 0}
+
+
+def _count(result: str):
+    with _STATS_LOCK:
+        _CUBE_STATS[result] += 1
+
+
+def cube_cache_stats() -> Dict:
+    """Lookups served from the cache vs. builds, plus what the cache holds"""
+    with _STATS_LOCK:
+        stats = dict(_CUBE_STATS)
+    cubes = [cube for _, cube in list(_CUBE_CACHE.values())]
+    return {**stats, "entries": len(cubes), "bytes": sum(cube.memory_bytes() for cube in cubes)}
+
+
+def load_segment_cube(csv_path: str = DEFAULT_SEGMENT_CSV) -> SegmentCube:
+    """Build the cube once per file version (mtime/size), shared by all requests"""
+    path = os.path.abspath(csv_path)
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _CUBE_CACHE.get(path)
+    if cached and cached[0] == signature:
+        _count("hits")
+        return cached[1]
+    with _CUBE_LOCK:
+        cached = _CUBE_CACHE.get(path)
+        if cached and cached[0] == signature:
+            _count("hits")
+            return cached[1]
+        _count("misses")
+        started = time.perf_counter()
+        cube = SegmentCube.from_csv(path)
+        logger.info(f"Built segment cube: {cube.rows:,} guests, {len(cube.sailings):,} sailings "
+                    f"({cube.memory_bytes() / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s")
+        _CUBE_CACHE[path] = (signature, cube)
+        return cube
@@ -1,54 +1,84 @@
 import datetime
+import re
 from sqlalchemy import create_engine, text, Table, MetaData, select
+from sqlalchemy.exc import OperationalError
 import json
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, make_page
+from query_log import watch_engine
 
 db_path = "./sqlComments.db"
 engine = create_engine(f"sqlite:///file:{db_path}?mode=ro&uri=true", echo=False)
+# Statement timings, shapes and slow-query log (query_log.QUERY_LOG)
+watch_engine(engine, "comments")
 
-def fetch_comments(fleet_name=None, ship_name=None, sailing_number=None,
-                   start_date=None, end_date=None, sheet_name=None):
-    with engine.connect() as conn:
-        query = """
-        SELECT 
-            Fleets.name AS fleet_name,
-            Ships.name AS ship_name,
-            Sailings.sailing_number,
-            Sailings.start_date,
-            Sheets.name AS sheet_name,
-            Comments.issues
-        FROM Comments
-        JOIN Sheets ON Comments.sheet_id = Sheets.id
-        JOIN Sailings ON Comments.sailing_id = Sailings.id
-        JOIN Ships ON Comments.ship_id = Ships.id
-        JOIN Fleets ON Ships.fleet_id = Fleets.id
-        WHERE 1=1
-        """
+def _comments_query(fleet_name=None, ship_name=None, sailing_number=None,
+                    start_date=None, end_date=None, sheet_name=None):
+    query = """
+    SELECT 
+        Fleets.name AS fleet_name,
+        Ships.name AS ship_name,
+        Sailings.sailing_number,
+        Sailings.start_date,
+        Sheets.name AS sheet_name,
+        Comments.issues,
+        Comments.id AS _id
+    FROM Comments
+    JOIN Sheets ON Comments.sheet_id = Sheets.id
+    JOIN Sailings ON Comments.sailing_id = Sailings.id
+    JOIN Ships ON Comments.ship_id = Ships.id
+    JOIN Fleets ON Ships.fleet_id = Fleets.id
+    WHERE 1=1
+    """
 
-        params = {}
+    params = {}
 
-        if fleet_name:
-            query += " AND Fleets.name = :fleet_name"
-            params["fleet_name"] = fleet_name
-        if ship_name:
-            query += " AND Ships.name = :ship_name"
-            params["ship_name"] = ship_name
-        if sailing_number:
-            query += " AND Sailings.sailing_number = :sailing_number"
-            params["sailing_number"] = sailing_number
-        if start_date:
-            query += " AND Sailings.start_date >= :start_date"
-            params["start_date"] = start_date
-        if end_date:
-            query += " AND Sailings.start_date <= :end_date"
-            params["end_date"] = end_date
-        if sheet_name:
-            query += " AND Sheets.name = :sheet_name"
-            params["sheet_name"] = sheet_name
+    if fleet_name:
+        query += " AND Fleets.name = :fleet_name"
+        params["fleet_name"] = fleet_name
+    if ship_name:
+        query += " AND Ships.name = :ship_name"
+        params["ship_name"] = ship_name
+    if sailing_number:
+        query += " AND Sailings.sailing_number = :sailing_number"
+        params["sailing_number"] = sailing_number
+    if start_date:
+        query += " AND Sailings.start_date >= :start_date"
+        params["start_date"] = start_date
+    if end_date:
+        query += " AND Sailings.start_date <= :end_date"
+        params["end_date"] = end_date
+    if sheet_name:
+        query += " AND Sheets.name = :sheet_name"
+        params["sheet_name"] = sheet_name
+
+    return query, params
 
+def fetch_comments(fleet_name=None, ship_name=None, sailing_number=None,
+                   start_date=None, end_date=None, sheet_name=None):
+    query, params = _comments_query(fleet_name, ship_name, sailing_number,
+                                    start_date, end_date, sheet_name)
+    with engine.connect() as conn:
         result = conn.execute(text(query), params)
-        rows = result.fetchall()
+        rows = [dict(row._mapping) for row in result]
+    for row in rows:
+        row.pop("_id")
+    return rows
 
-        return [dict(row._mapping) for row in rows]
+def fetch_comments_page(fleet_name=None, ship_name=None, sailing_number=None,
+                        start_date=None, end_date=None, sheet_name=None,
+                        limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One keyset page of comments ordered by Comments.id: {"data": [...], "next_cursor": token}"""
+    query, params = _comments_query(fleet_name, ship_name, sailing_number,
+                                    start_date, end_date, sheet_name)
+    after = decode_cursor(cursor, 1)
+    if after:
+        query += " AND Comments.id > :after_id"
+        params["after_id"] = after[0]
+    query += " ORDER BY Comments.id LIMIT :limit"
+    params["limit"] = limit + 1
+    with engine.connect() as conn:
+        rows = [dict(row._mapping) for row in conn.execute(text(query), params)]
+    return make_page(rows, limit, ["_id"])
 
 def fetch_fleets():
     with engine.connect() as conn:
@@ -106,6 +136,35 @@ def fetch_sailings(ships=None, start_date=None, end_date=None):
         result = conn.execute(text(query), params)
         return [row[0] for row in result]
 
+# ==============================================
+# RATING ROLLUPS (Rating_Rollup, see rating_rollups.py)
+# ==============================================
+
+def has_rollups():
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'Rating_Rollup'")).first() is not None
+
+def fetch_rating_summary(sailing_numbers):
+    """
+    One Cruise_Ratings-shaped record per sailing (Sailing Number, Fleet, Ship
+    and the mean of every metric) from the rollups, plus "ratingCount"
+    """
+    placeholders = ", ".join([f":sailing{i}" for i in range(len(sailing_numbers))])
+    params = {f"sailing{i}": sn for i, sn in enumerate(sailing_numbers)}
+    query = f"""
+        SELECT sailing_number, fleet, ship, metric, n, total
+        FROM Rating_Rollup
+        WHERE sailing_number IN ({placeholders})
+    """
+    records = {}
+    with engine.connect() as conn:
+        for sailing_number, fleet, ship, metric, n, total in conn.execute(text(query), params):
+            record = records.setdefault(sailing_number, {"Sailing Number": sailing_number, "Fleet": fleet,
+                                                         "Ship": ship, "ratingCount": 0})
+            record[metric] = total / n if n else None
+            record["ratingCount"] = max(record["ratingCount"], n)
+    return [records[sn] for sn in sailing_numbers if sn in records]
+
 def fetch_cruise_ratings(sailing_numbers):    
     # Reflect the Cruise_Ratings table
     metadata = MetaData()
@@ -124,42 +183,170 @@ def fetch_cruise_ratings(sailing_numbers):
     return json.dumps(rows)    
 
 
+def _issues_query(ship_names=None, sailing_numbers=None, sheet_names=None):
+    query = """
+        SELECT 
+            Ships.name AS ship_name,
+            Sailings.sailing_number,
+            Sheets.name AS sheet_name,
+            Issues.issues,
+            Issues.id AS _id
+        FROM Issues
+        JOIN Sheets ON Issues.sheet_id = Sheets.id
+        JOIN Sailings ON Issues.sailing_id = Sailings.id
+        JOIN Ships ON Issues.ship_id = Ships.id
+        WHERE 1=1
+    """
+    params = {}
+
+    if sailing_numbers:
+        sailing_placeholders = ", ".join([f":sailing{i}" for i in range(len(sailing_numbers))])
+        query += f" AND Sailings.sailing_number IN ({sailing_placeholders})"
+        for i, sn in enumerate(sailing_numbers):
+            params[f"sailing{i}"] = sn
+
+    if ship_names:
+        ship_placeholders = ", ".join([f":ship{i}" for i in range(len(ship_names))])
+        query += f" AND Ships.name IN ({ship_placeholders})"
+        for i, ship in enumerate(ship_names):
+            params[f"ship{i}"] = ship
+
+    if sheet_names:
+        sheet_placeholders = ", ".join([f":sheet{i}" for i in range(len(sheet_names))])
+        query += f" AND Sheets.name IN ({sheet_placeholders})"
+        for i, sheet in enumerate(sheet_names):
+            params[f"sheet{i}"] = sheet
+
+    return query, params
+
+def iter_issues(ship_names=None, sailing_numbers=None, sheet_names=None):
+    """Yield issue rows one at a time (the connection stays open until exhausted)"""
+    query, params = _issues_query(ship_names, sailing_numbers, sheet_names)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(text(query), params)
+        for row in result:
+            record = dict(row._mapping)
+            record.pop("_id")
+            yield record
+
+
 def fetch_issues(ship_names=None, sailing_numbers=None, sheet_names=None):
+    return list(iter_issues(ship_names, sailing_numbers, sheet_names))
+
+
+def fetch_issues_page(ship_names=None, sailing_numbers=None, sheet_names=None,
+                      limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One keyset page of issues ordered by Issues.id: {"data": [...], "next_cursor": token}"""
+    query, params = _issues_query(ship_names, sailing_numbers, sheet_names)
+    after = decode_cursor(cursor, 1)
+    if after:
+        query += " AND Issues.id > :after_id"
+        params["after_id"] = after[0]
+    query += " ORDER BY Issues.id LIMIT :limit"
+    params["limit"] = limit + 1
     with engine.connect() as conn:
-        query = """
-            SELECT 
-                Ships.name AS ship_name,
-                Sailings.sailing_number,
-                Sheets.name AS sheet_name,
-                Issues.issues
-            FROM Issues
-            JOIN Sheets ON Issues.sheet_id = Sheets.id
-            JOIN Sailings ON Issues.sailing_id = Sailings.id
-            JOIN Ships ON Issues.ship_id = Ships.id
-            WHERE 1=1
-        """
-        params = {}
+        rows = [dict(row._mapping) for row in conn.execute(text(query), params)]
+    return make_page(rows, limit, ["_id"])
 
-        if sailing_numbers:
-            sailing_placeholders = ", ".join([f":sailing{i}" for i in range(len(sailing_numbers))])
-            query += f" AND Sailings.sailing_number IN ({sailing_placeholders})"
-            for i, sn in enumerate(sailing_numbers):
-                params[f"sailing{i}"] = sn
 
-        if ship_names:
-            ship_placeholders = ", ".join([f":ship{i}" for i in range(len(ship_names))])
-            query += f" AND Ships.name IN ({ship_placeholders})"
-            for i, ship in enumerate(ship_names):
-                params[f"ship{i}"] = ship
+# ==============================================
+# FULL-TEXT SEARCH (FTS5, see fts_index.py)
+# ==============================================
 
-        if sheet_names:
-            sheet_placeholders = ", ".join([f":sheet{i}" for i in range(len(sheet_names))])
-            query += f" AND Sheets.name IN ({sheet_placeholders})"
-            for i, sheet in enumerate(sheet_names):
-                params[f"sheet{i}"] = sheet
+TEXT_SEARCH_SOURCES = {"comments": "Comments", "issues": "Issues"}
+_FTS_TERM = re.compile(r"\w+\*?", re.UNICODE)
 
-        result = conn.execute(text(query), params)
-        return [dict(row._mapping) for row in result]
+class TextIndexMissing(RuntimeError):
+    """The database has no FTS5 tables yet (run fts_index.py)"""
+
+def build_match_expression(query, match_all=True):
+    """
+    Turn free user text into a safe FTS5 MATCH expression: every word is
+    quoted (so quotes, colons or NEAR in the input are plain text), a
+    trailing * keeps prefix matching, and terms are ANDed or ORed.
+    """
+    terms = []
+    for term in _FTS_TERM.findall(query or ""):
+        prefix = term.endswith("*")
+        word = term.rstrip("*")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return (" AND " if match_all else " OR ").join(terms)
+
+def search_text(query, source="comments", fleet_name=None, ship_names=None,
+                sailing_numbers=None, start_date=None, end_date=None,
+                sheet_names=None, match_all=True, limit=50):
+    """
+    Ranked keyword search over Comments.issues or Issues.issues.
+    Metadata filters match fetch_comments/fetch_issues; ship_names also
+    carries the RLS ship list from the caller (case-insensitive).
+    Rows are ordered by BM25 (score: higher is better) with a snippet.
+    """
+    table = TEXT_SEARCH_SOURCES[source]
+    match = build_match_expression(query, match_all)
+    if not match:
+        return []
+
+    sql = f"""
+    SELECT
+        Fleets.name AS fleet_name,
+        Ships.name AS ship_name,
+        Sailings.sailing_number,
+        Sailings.start_date,
+        Sheets.name AS sheet_name,
+        {table}.issues,
+        snippet({table}_fts, 0, '[', ']', '…', 12) AS snippet,
+        -bm25({table}_fts) AS score
+    FROM {table}_fts
+    JOIN {table} ON {table}.id = {table}_fts.rowid
+    JOIN Sheets ON {table}.sheet_id = Sheets.id
+    JOIN Sailings ON {table}.sailing_id = Sailings.id
+    JOIN Ships ON {table}.ship_id = Ships.id
+    JOIN Fleets ON Ships.fleet_id = Fleets.id
+    WHERE {table}_fts MATCH :match
+    """
+    params = {"match": match}
+
+    if fleet_name:
+        sql += " AND Fleets.name = :fleet_name"
+        params["fleet_name"] = fleet_name
+    if ship_names is not None:
+        if not ship_names:
+            return []
+        placeholders = ", ".join([f":ship{i}" for i in range(len(ship_names))])
+        sql += f" AND LOWER(Ships.name) IN ({placeholders})"
+        for i, ship in enumerate(ship_names):
+            params[f"ship{i}"] = ship.lower()
+    if sailing_numbers:
+        placeholders = ", ".join([f":sailing{i}" for i in range(len(sailing_numbers))])
+        sql += f" AND Sailings.sailing_number IN ({placeholders})"
+        for i, sn in enumerate(sailing_numbers):
+            params[f"sailing{i}"] = sn
+    if start_date:
+        sql += " AND Sailings.start_date >= :start_date"
+        params["start_date"] = start_date
+    if end_date:
+        sql += " AND Sailings.start_date <= :end_date"
+        params["end_date"] = end_date
+    if sheet_names:
+        placeholders = ", ".join([f":sheet{i}" for i in range(len(sheet_names))])
+        sql += f" AND Sheets.name IN ({placeholders})"
+        for i, sheet in enumerate(sheet_names):
+            params[f"sheet{i}"] = sheet
+
+    sql += f" ORDER BY bm25({table}_fts) LIMIT :limit"
+    params["limit"] = limit
+
+    try:
+        with engine.connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(text(sql), params)]
+    except OperationalError as e:
+        if "no such table" in str(e):
+            raise TextIndexMissing(f"{table}_fts not found in {db_path}; run: python fts_index.py --db {db_path}") from None
+        raise
+    for row in rows:
+        row["score"] = round(row["score"], 4)
+    return rows
     
     
 # 🔍 Example Usage
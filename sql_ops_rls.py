@@ -9,26 +9,23 @@ NEW FEATURES:
 - SQLAlchemy ORM for better database operations and connection management
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Date, Float, UniqueConstraint
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
-from sqlalchemy.sql import func
-import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
 import hashlib
 import secrets
+import sqlite3
+from contextlib import closing
 from pathlib import Path
 import logging
 import os
 
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, make_page
+from query_log import TimedConnection
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# SQLAlchemy setup
-Base = declarative_base()
-
 class DatabaseManager:
     def __init__(self, db_path="cruise_analytics.db"):
         self.db_path = db_path
@@ -36,10 +33,14 @@ class DatabaseManager:
         self.current_username = None
         self.current_role = None
         self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection whose statements are timed and shape-aggregated (see query_log)"""
+        return sqlite3.connect(self.db_path, factory=TimedConnection)
     
     def _init_database(self):
         """Initialize database with all required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Create core tables
@@ -126,6 +127,9 @@ class DatabaseManager:
                 FOREIGN KEY (sailing_id) REFERENCES Sailings(id)
             )
         ''')
+        
+        # Keyset pagination of sailings walks (start_date, id)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sailings_start_id ON Sailings(start_date, id)')
     
     def _create_user_tables(self, cursor):
         """Create user management and access control tables"""
@@ -265,7 +269,7 @@ class DatabaseManager:
     
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user info"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT u.id, u.username, u.password_hash, r.name as role, u.is_active
@@ -290,6 +294,51 @@ class DatabaseManager:
                 }
             return None
     
+    def get_user_by_username(self, username: str) -> Optional[Dict]:
+        """Active user with its stored password hash and role (no password check)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.id, u.username, u.password_hash, r.name as role
+                FROM Users u
+                JOIN Roles r ON u.role_id = r.id
+                WHERE u.username = ? AND u.is_active = 1
+            ''', (username,))
+            user = cursor.fetchone()
+            if not user:
+                return None
+            return {'id': user[0], 'username': user[1], 'password_hash': user[2], 'role': user[3]}
+
+    def provision_user(self, username: str, password_hash: str, role: str) -> Optional[Dict]:
+        """
+        Create or update a user from the YAML store with its already-hashed
+        password (no creator checks: the YAML file is trusted configuration).
+        Returns None, leaving the row untouched, when the user exists but has
+        been deactivated.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM Roles WHERE name = ?", (role,))
+            role_row = cursor.fetchone()
+            if not role_row:
+                raise ValueError("Invalid role")
+            cursor.execute("SELECT id, is_active FROM Users WHERE username = ?", (username,))
+            existing = cursor.fetchone()
+            if existing and not existing[1]:
+                return None
+            if existing:
+                cursor.execute("UPDATE Users SET password_hash = ?, role_id = ? WHERE id = ?",
+                               (password_hash, role_row[0], existing[0]))
+                user_id = existing[0]
+            else:
+                cursor.execute('''
+                    INSERT INTO Users (username, password_hash, role_id)
+                    VALUES (?, ?, ?)
+                ''', (username, password_hash, role_row[0]))
+                user_id = cursor.lastrowid
+            conn.commit()
+            return {'id': user_id, 'username': username, 'role': role, 'created': not existing}
+
     def _check_access_permission(self, resource_type: str, resource_id: int) -> bool:
         """Check if current user has access to a resource"""
         if not self.current_user_id:
@@ -299,7 +348,7 @@ class DatabaseManager:
         if self.current_role == 'superadmin':
             return True
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             if resource_type == 'fleet':
@@ -330,7 +379,7 @@ class DatabaseManager:
     
     def _get_admin_permissions(self, admin_user_id: int) -> Dict[str, List[int]]:
         """Get all permissions that an admin user has (for permission granting limits)"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get fleet access
@@ -366,7 +415,7 @@ class DatabaseManager:
     
     def create_user(self, username: str, password: str, role: str, created_by_id: int) -> Dict:
         """Create new user with role-based restrictions"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Check if username already exists
@@ -426,7 +475,7 @@ class DatabaseManager:
         if not self.current_user_id:
             return []
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             if self.current_role == 'superadmin':
@@ -479,7 +528,7 @@ class DatabaseManager:
         if not self.current_user_id:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get user info
@@ -528,7 +577,7 @@ class DatabaseManager:
         if not granted_by_id:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get granter's role
@@ -570,7 +619,7 @@ class DatabaseManager:
         if not self.current_user_id:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Check if user has this access
@@ -616,7 +665,7 @@ class DatabaseManager:
         if not granted_by_id:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get granter's role
@@ -658,7 +707,7 @@ class DatabaseManager:
         if not self.current_user_id:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Check if user has this access
@@ -698,7 +747,7 @@ class DatabaseManager:
     
     def get_user_access(self, user_id: int) -> Dict:
         """Get user's access permissions"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get fleet access
@@ -746,7 +795,7 @@ class DatabaseManager:
     
     def get_all_fleets(self) -> List[Dict]:
         """Get all fleets for access management"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, description FROM Fleets ORDER BY name")
             return [
@@ -756,7 +805,7 @@ class DatabaseManager:
     
     def get_all_ships(self) -> List[Dict]:
         """Get all ships for access management"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT s.id, s.name, f.name as fleet_name, s.capacity
@@ -792,7 +841,7 @@ class DatabaseManager:
         if not self.current_user_id:
             return []
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             if self.current_role == 'superadmin':
@@ -831,67 +880,102 @@ class DatabaseManager:
             
             return fleet_data
     
+    def _sailings_query(self, ships_list: List[str] = None, start_date: str = None,
+                        end_date: str = None) -> Tuple[str, List]:
+        """Sailings visible to the current user, as (query, params) without ORDER BY"""
+        # Base query with RLS filtering
+        base_query = '''
+            SELECT DISTINCT s.sailing_number, sh.name as ship_name, 
+                   s.start_date, s.end_date, s.port_departure, s.port_arrival, s.id
+            FROM Sailings s
+            JOIN Ships sh ON s.ship_id = sh.id
+            WHERE 1=1
+        '''
+        params = []
+        
+        # Add RLS filtering
+        if self.current_role != 'superadmin':
+            base_query += '''
+                AND sh.id IN (
+                    SELECT ship_id FROM UserShipAccess WHERE user_id = ?
+                    UNION
+                    SELECT s2.id FROM Ships s2 
+                    JOIN UserFleetAccess ufa ON s2.fleet_id = ufa.fleet_id 
+                    WHERE ufa.user_id = ?
+                )
+            '''
+            params.extend([self.current_user_id, self.current_user_id])
+        
+        # Add filters
+        if ships_list:
+            placeholders = ','.join('?' * len(ships_list))
+            base_query += f' AND LOWER(sh.name) IN ({placeholders})'
+            params.extend([ship.lower() for ship in ships_list])
+        
+        if start_date:
+            base_query += ' AND s.start_date >= ?'
+            params.append(start_date)
+        
+        if end_date:
+            base_query += ' AND s.end_date <= ?'
+            params.append(end_date)
+        
+        return base_query, params
+    
+    @staticmethod
+    def _sailing_row(row) -> Dict:
+        return {
+            'sailing_number': row[0],
+            'ship_name': row[1],
+            'start_date': row[2],
+            'end_date': row[3],
+            'port_departure': row[4],
+            'port_arrival': row[5]
+        }
+    
     def fetch_sailings(self, ships_list: List[str] = None, start_date: str = None, end_date: str = None) -> List[Dict]:
         """Fetch sailings with RLS filtering"""
         if not self.current_user_id:
             return []
         
-        with sqlite3.connect(self.db_path) as conn:
+        base_query, params = self._sailings_query(ships_list, start_date, end_date)
+        base_query += ' ORDER BY s.start_date DESC'
+        
+        with self._connect() as conn:
             cursor = conn.cursor()
-            
-            # Base query with RLS filtering
-            base_query = '''
-                SELECT DISTINCT s.sailing_number, sh.name as ship_name, 
-                       s.start_date, s.end_date, s.port_departure, s.port_arrival
-                FROM Sailings s
-                JOIN Ships sh ON s.ship_id = sh.id
-                WHERE 1=1
-            '''
-            params = []
-            
-            # Add RLS filtering
-            if self.current_role != 'superadmin':
-                base_query += '''
-                    AND sh.id IN (
-                        SELECT ship_id FROM UserShipAccess WHERE user_id = ?
-                        UNION
-                        SELECT s2.id FROM Ships s2 
-                        JOIN UserFleetAccess ufa ON s2.fleet_id = ufa.fleet_id 
-                        WHERE ufa.user_id = ?
-                    )
-                '''
-                params.extend([self.current_user_id, self.current_user_id])
-            
-            # Add filters
-            if ships_list:
-                placeholders = ','.join('?' * len(ships_list))
-                base_query += f' AND LOWER(sh.name) IN ({placeholders})'
-                params.extend([ship.lower() for ship in ships_list])
-            
-            if start_date:
-                base_query += ' AND s.start_date >= ?'
-                params.append(start_date)
-            
-            if end_date:
-                base_query += ' AND s.end_date <= ?'
-                params.append(end_date)
-            
-            base_query += ' ORDER BY s.start_date DESC'
-            
             cursor.execute(base_query, params)
-            
-            sailings = []
-            for row in cursor.fetchall():
-                sailings.append({
-                    'sailing_number': row[0],
-                    'ship_name': row[1],
-                    'start_date': row[2],
-                    'end_date': row[3],
-                    'port_departure': row[4],
-                    'port_arrival': row[5]
-                })
-            
-            return sailings
+            return [self._sailing_row(row) for row in cursor]
+    
+    def fetch_sailings_page(self, ships_list: List[str] = None, start_date: str = None, end_date: str = None,
+                            limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+        """
+        One keyset page of sailings with RLS filtering, newest first on
+        (start_date, id): {"data": [...], "next_cursor": token or None}.
+        Sailings without a start date sort last.
+        """
+        if not self.current_user_id:
+            return {"data": [], "next_cursor": None}
+        
+        base_query, params = self._sailings_query(ships_list, start_date, end_date)
+        after = decode_cursor(cursor, 2)
+        if after:
+            last_start, last_id = after
+            if last_start is None:
+                base_query += ' AND s.start_date IS NULL AND s.id < ?'
+                params.append(last_id)
+            else:
+                base_query += ' AND (s.start_date < ? OR s.start_date IS NULL OR (s.start_date = ? AND s.id < ?))'
+                params.extend([last_start, last_start, last_id])
+        base_query += ' ORDER BY s.start_date DESC, s.id DESC LIMIT ?'
+        params.append(limit + 1)
+        
+        with self._connect() as conn:
+            rows = conn.execute(base_query, params).fetchall()
+        
+        sailings = [self._sailing_row(row) for row in rows]
+        for sailing, row in zip(sailings, rows):
+            sailing['_id'] = row[6]
+        return make_page(sailings, limit, ['start_date', '_id'])
     
     def fetch_cruise_ratings(self, sailing_list: List[Dict]) -> List[Dict]:
         """Fetch cruise ratings with RLS filtering"""
@@ -902,14 +986,100 @@ class DatabaseManager:
         # This would query the Cruise_Ratings table with sailing filtering
         return []
     
+    def _issues_query(self, ships: List[str] = None, sailing_numbers: List[str] = None,
+                      sheets: List[str] = None) -> Tuple[str, List]:
+        """Issues visible to the current user, as (query, params) without ORDER BY (sheet = category)"""
+        base_query = '''
+            SELECT sh.name as ship_name, s.sailing_number, i.category as sheet_name,
+                   i.description as issues, i.id
+            FROM Issues i
+            JOIN Sailings s ON i.sailing_id = s.id
+            JOIN Ships sh ON s.ship_id = sh.id
+            WHERE 1=1
+        '''
+        params = []
+        
+        # Add RLS filtering
+        if self.current_role != 'superadmin':
+            base_query += '''
+                AND sh.id IN (
+                    SELECT ship_id FROM UserShipAccess WHERE user_id = ?
+                    UNION
+                    SELECT s2.id FROM Ships s2 
+                    JOIN UserFleetAccess ufa ON s2.fleet_id = ufa.fleet_id 
+                    WHERE ufa.user_id = ?
+                )
+            '''
+            params.extend([self.current_user_id, self.current_user_id])
+        
+        if ships:
+            base_query += f' AND LOWER(sh.name) IN ({",".join("?" * len(ships))})'
+            params.extend([ship.lower() for ship in ships])
+        
+        if sailing_numbers:
+            base_query += f' AND s.sailing_number IN ({",".join("?" * len(sailing_numbers))})'
+            params.extend(sailing_numbers)
+        
+        if sheets:
+            base_query += f' AND i.category IN ({",".join("?" * len(sheets))})'
+            params.extend(sheets)
+        
+        return base_query, params
+    
+    @staticmethod
+    def _issue_row(row) -> Dict:
+        return {
+            'ship_name': row[0],
+            'sailing_number': row[1],
+            'sheet_name': row[2],
+            'issues': row[3]
+        }
+    
+    def iter_issues(self, ships: List[str] = None, sailing_numbers: List[str] = None,
+                    sheets: List[str] = None) -> Iterator[Dict]:
+        """
+        Issues with RLS filtering, yielded from an open cursor. The query
+        (and so the RLS context) is fixed when this is called, not when the
+        iterator is first advanced.
+        """
+        if not self.current_user_id:
+            return iter(())
+        
+        base_query, params = self._issues_query(ships, sailing_numbers, sheets)
+        base_query += ' ORDER BY i.id'
+        
+        def rows():
+            with closing(self._connect()) as conn:
+                for row in conn.cursor().execute(base_query, params):
+                    yield self._issue_row(row)
+        
+        return rows()
+    
     def fetch_issues(self, ships: List[str] = None, sailing_numbers: List[str] = None, sheets: List[str] = None) -> List[Dict]:
         """Fetch issues with RLS filtering"""
+        return list(self.iter_issues(ships, sailing_numbers, sheets))
+    
+    def fetch_issues_page(self, ships: List[str] = None, sailing_numbers: List[str] = None, sheets: List[str] = None,
+                          limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+        """One keyset page of issues ordered by id (same page shape as sql_ops.fetch_issues_page)"""
+        after = decode_cursor(cursor, 1)
         if not self.current_user_id:
-            return []
+            return {"data": [], "next_cursor": None}
         
-        # Implementation would go here - for now return empty list
-        # This would query the Issues table with RLS filtering
-        return []
+        base_query, params = self._issues_query(ships, sailing_numbers, sheets)
+        if after:
+            base_query += ' AND i.id > ?'
+            params.append(after[0])
+        base_query += ' ORDER BY i.id LIMIT ?'
+        params.append(limit + 1)
+        
+        with closing(self._connect()) as conn:
+            rows = conn.cursor().execute(base_query, params).fetchall()
+        
+        issues = [self._issue_row(row) for row in rows]
+        for issue, row in zip(issues, rows):
+            issue['_id'] = row[4]
+        return make_page(issues, limit, ['_id'])
 
 # Create global database manager instance
 db_manager = DatabaseManager()
@@ -921,6 +1091,12 @@ def authenticate_user(username: str, password: str) -> Optional[Dict]:
 def create_user(username: str, password: str, role: str) -> Dict:
     return db_manager.create_user(username, password, role, db_manager.current_user_id)
 
+def get_user_by_username(username: str) -> Optional[Dict]:
+    return db_manager.get_user_by_username(username)
+
+def provision_user(username: str, password_hash: str, role: str) -> Optional[Dict]:
+    return db_manager.provision_user(username, password_hash, role)
+
 def get_all_users() -> List[Dict]:
     return db_manager.get_all_users()
 
@@ -957,8 +1133,20 @@ def fetch_ships() -> List[Dict]:
 def fetch_sailings(ships_list: List[str] = None, start_date: str = None, end_date: str = None) -> List[Dict]:
     return db_manager.fetch_sailings(ships_list, start_date, end_date)
 
+def fetch_sailings_page(ships_list: List[str] = None, start_date: str = None, end_date: str = None,
+                        limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    return db_manager.fetch_sailings_page(ships_list, start_date, end_date, limit, cursor)
+
 def fetch_cruise_ratings(sailing_list: List[Dict]) -> List[Dict]:
     return db_manager.fetch_cruise_ratings(sailing_list)
 
 def fetch_issues(ships: List[str] = None, sailing_numbers: List[str] = None, sheets: List[str] = None) -> List[Dict]:
     return db_manager.fetch_issues(ships, sailing_numbers, sheets)
+
+def iter_issues(ships: List[str] = None, sailing_numbers: List[str] = None, sheets: List[str] = None) -> Iterator[Dict]:
+    """Streaming counterpart of fetch_issues (same API as sql_ops.iter_issues)"""
+    return db_manager.iter_issues(ships, sailing_numbers, sheets)
+
+def fetch_issues_page(ships: List[str] = None, sailing_numbers: List[str] = None, sheets: List[str] = None,
+                      limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    return db_manager.fetch_issues_page(ships, sailing_numbers, sheets, limit, cursor)
@@ -0,0 +1,252 @@
+"""
+Columnar store for the sailing summary records (SAMPLE_DATA)
+test_data.get_summary_data() returns one dict of ~25 keys per sailing. The
+store keeps them as struct-of-arrays instead: float64 metric columns (NaN
+for missing) with a mask of the cells that were integers in the records,
+categorical codes for ship and fleet, datetime64 start/end dates and a
+(sailing, number) index. Filters are vectorized over the
+columns and SummaryRecord is a read-only Mapping view of one row for the
+code and JSON output that expects the old dicts.
+
+Missing ratings can be imputed as whole-column operations (see
+IMPUTE_STRATEGIES); imputed cells are recorded in a per-metric mask so they
+stay distinguishable from real averages.
+"""
+
+from collections import Counter
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+NAME_KEY = "Ship Name"
+NUMBER_KEY = "Sailing Number"
+DATE_KEYS = ("Start", "End")
+CATEGORY_KEYS = ("Fleet", "Ship")
+
+# none: leave gaps as null
+# fleet_mean / ship_median: mean (median) of the metric over the sailing's
+#   fleet (ship); groups without any value use the whole column instead
+# legacy: Overall Holiday - 1, or 6 when that is missing too (the rule of
+#   test_data.is_empty_or_nan_rating, applied to rating columns only)
+IMPUTE_STRATEGIES = ("none", "fleet_mean", "ship_median", "legacy")
+LEGACY_ANCHOR = "Overall Holiday"
+LEGACY_DEFAULT = 6.0
+
+
+# pandas.api.types.infer_dtype results stored as float64 metric columns
+NUMERIC_KINDS = ("floating", "integer", "mixed-integer-float")
+
+
+class SummaryRecord(Mapping):
+    """Dict-like view of one summary row; values are materialized on access"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "SummaryStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._store.value(self._row, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in self._store.keys if self._store.has_value(self._row, key))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"SummaryRecord({dict(self)!r})"
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    @property
+    def imputed(self) -> List[str]:
+        """Metric keys of this row whose value was imputed rather than measured"""
+        return [key for key in self._store.imputed if self._store.is_imputed(self._row, key)]
+
+    def to_dict(self) -> Dict:
+        return dict(self)
+
+
+class SummaryStore:
+    """Struct-of-arrays summary records (read-only once built)"""
+
+    def __init__(self, records: List[Dict], impute: str = "none"):
+        if impute not in IMPUTE_STRATEGIES:
+            raise ValueError(f"Unknown imputation strategy {impute!r}; expected one of {IMPUTE_STRATEGIES}")
+        self.size = len(records)
+        self.imputation = impute
+        # Key order of the first record that has each key, as the dicts had it
+        key_counts = Counter(key for record in records for key in record)
+        self.keys: List[str] = list(key_counts)
+        frame = pd.DataFrame.from_records(records, columns=self.keys)
+
+        self.metrics: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, tuple] = {}
+        self.dates: Dict[str, np.ndarray] = {}
+        self.strings: Dict[str, np.ndarray] = {}
+        # Keys actually present per row (records need not share every key)
+        self.present: Dict[str, np.ndarray] = {}
+        # Per metric: rows whose value was filled in by the imputation strategy
+        self.imputed: Dict[str, np.ndarray] = {}
+        # Per metric with any int cell: rows read back as int (6, not 6.0)
+        self.integral: Dict[str, np.ndarray] = {}
+
+        for key in self.keys:
+            column = frame[key]
+            if key_counts[key] < self.size:
+                self.present[key] = np.fromiter((key in record for record in records), dtype=bool, count=self.size)
+            if key in DATE_KEYS:
+                self.dates[key] = pd.to_datetime(column, errors="coerce").to_numpy(dtype="datetime64[D]")
+            elif key in CATEGORY_KEYS:
+                codes, uniques = pd.factorize(column)
+                self.categories[key] = (codes.astype(np.int16), np.asarray(uniques, dtype=object))
+            elif pd.api.types.infer_dtype(column, skipna=True) in NUMERIC_KINDS:
+                self.metrics[key] = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64)
+                integral = np.fromiter((isinstance(record.get(key), (int, np.integer))
+                                        and not isinstance(record.get(key), bool) for record in records),
+                                       dtype=bool, count=self.size)
+                if integral.any():
+                    self.integral[key] = integral
+            else:
+                # Missing cells stay None (from_records turns them into NaN)
+                self.strings[key] = column.astype(object).where(column.notna(), None).to_numpy(dtype=object)
+
+        self._impute(impute)
+
+        for arrays in (self.metrics, self.dates, self.strings, self.present, self.imputed, self.integral):
+            for array in arrays.values():
+                array.flags.writeable = False
+        for codes, _ in self.categories.values():
+            codes.flags.writeable = False
+
+        names = self.strings.get(NAME_KEY, np.full(self.size, None, dtype=object))
+        numbers = self.strings.get(NUMBER_KEY, np.full(self.size, None, dtype=object))
+        self._index: Dict[tuple, int] = {}
+        for row, (name, number) in enumerate(zip(names, numbers)):
+            self._index.setdefault((str(name).lower(), str(number).lower()), row)
+
+    @classmethod
+    def from_records(cls, records, impute: str = "none") -> "SummaryStore":
+        if isinstance(records, SummaryStore) and records.imputation == impute:
+            return records
+        return cls(list(records), impute)
+
+    def _impute(self, strategy: str):
+        """Fill missing metric cells for every column at once and record them in self.imputed"""
+        if strategy == "none" or not self.metrics:
+            return
+        names = list(self.metrics)
+        matrix = np.column_stack([self.metrics[name] for name in names])
+        missing = np.isnan(matrix)
+        if not missing.any():
+            return
+
+        fill_integral = None
+        if strategy == "legacy":
+            anchor = self.metrics.get(LEGACY_ANCHOR)
+            base = (np.full(self.size, LEGACY_DEFAULT) if anchor is None
+                    else np.where(np.isnan(anchor), LEGACY_DEFAULT, anchor - 1))
+            fill = np.broadcast_to(base[:, None], matrix.shape)
+            # Anchor - 1 keeps the anchor's type and the default is the int 6
+            anchor_integral = self.integral.get(LEGACY_ANCHOR, np.zeros(self.size, dtype=bool))
+            fill_integral = np.ones(self.size, dtype=bool) if anchor is None else np.isnan(anchor) | anchor_integral
+        else:
+            key, how = ("Fleet", "mean") if strategy == "fleet_mean" else ("Ship", "median")
+            codes = self.categories[key][0] if key in self.categories else np.zeros(self.size, dtype=np.int16)
+            frame = pd.DataFrame(matrix)
+            # Rows without a fleet/ship (code -1) are left out of the groups
+            groups = np.where(codes >= 0, codes, np.nan)
+            fill = frame.groupby(groups).transform(how).to_numpy(dtype=np.float64)
+            column_fill = getattr(frame, how)().to_numpy(dtype=np.float64)
+            fill = np.where(np.isnan(fill), column_fill[None, :], fill)
+
+        matrix = np.where(missing, fill, matrix)
+        for i, name in enumerate(names):
+            if missing[:, i].any():
+                self.metrics[name] = np.ascontiguousarray(matrix[:, i])
+                self.imputed[name] = missing[:, i] & ~np.isnan(matrix[:, i])
+                if fill_integral is not None:
+                    integral = self.integral.get(name, np.zeros(self.size, dtype=bool))
+                    self.integral[name] = np.where(self.imputed[name], fill_integral, integral)
+                elif name in self.integral:
+                    self.integral[name] = self.integral[name] & ~self.imputed[name]
+
+    # ---- record access -------------------------------------------------
+
+    def has_value(self, row: int, key: str) -> bool:
+        present = self.present.get(key)
+        return key in self.keys and (present is None or bool(present[row]))
+
+    def value(self, row: int, key: str):
+        if not self.has_value(row, key):
+            raise KeyError(key)
+        if key in self.metrics:
+            value = self.metrics[key][row]
+            if np.isnan(value):
+                return None
+            integral = self.integral.get(key)
+            return int(value) if integral is not None and integral[row] else float(value)
+        if key in self.categories:
+            codes, uniques = self.categories[key]
+            return None if codes[row] < 0 else uniques[codes[row]]
+        if key in self.dates:
+            value = self.dates[key][row]
+            return None if np.isnat(value) else str(value)
+        return self.strings[key][row]
+
+    def is_imputed(self, row: int, key: str) -> bool:
+        mask = self.imputed.get(key)
+        return mask is not None and bool(mask[row])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[SummaryRecord]:
+        return (SummaryRecord(self, row) for row in range(self.size))
+
+    def __getitem__(self, row: int) -> SummaryRecord:
+        if not -self.size <= row < self.size:
+            raise IndexError(row)
+        return SummaryRecord(self, row % self.size)
+
+    def records(self, rows) -> List[SummaryRecord]:
+        return [SummaryRecord(self, int(row)) for row in rows]
+
+    # ---- vectorized filters ----------------------------------------------
+
+    def find(self, ship_name: str, sailing_number: str) -> Optional[int]:
+        """Row of a sailing by its (case-insensitive) name and number"""
+        return self._index.get((str(ship_name).lower(), str(sailing_number).lower()))
+
+    def category_mask(self, key: str, values: List[str]) -> np.ndarray:
+        """Rows whose Fleet/Ship is one of values (case-insensitive)"""
+        codes, uniques = self.categories[key]
+        wanted = {str(v).lower() for v in values}
+        allowed = np.array([str(u).lower() in wanted for u in uniques], dtype=bool)
+        return np.append(allowed, False)[codes] if len(codes) else np.zeros(0, dtype=bool)
+
+    def date_mask(self, from_date=None, to_date=None) -> np.ndarray:
+        """Rows starting on/after from_date and ending on/before to_date (NaT never matches)"""
+        mask = np.ones(self.size, dtype=bool)
+        if from_date is not None:
+            mask &= self.dates["Start"] >= np.datetime64(pd.Timestamp(from_date).date(), "D")
+        if to_date is not None:
+            mask &= self.dates["End"] <= np.datetime64(pd.Timestamp(to_date).date(), "D")
+        return mask
+
+    def between(self, from_date=None, to_date=None) -> List[SummaryRecord]:
+        return self.records(np.flatnonzero(self.date_mask(from_date, to_date)))
+
+    def memory_bytes(self) -> int:
+        arrays = list(self.metrics.values()) + list(self.dates.values()) + list(self.present.values())
+        arrays += list(self.imputed.values()) + list(self.integral.values())
+        arrays += [codes for codes, _ in self.categories.values()]
+        total = sum(a.nbytes for a in arrays)
+        total += sum(a.nbytes + sum(len(str(v)) + 49 for v in a) for a in self.strings.values())
+        return int(total)
@@ -4,6 +4,7 @@ from typing import Dict
 import re
 from datetime import datetime
 import json
+from sailing_codes import infer_year, parse_sailing_code
 
 
 summary_data = [
@@ -715,57 +716,21 @@ summary_others = [
     ]
 
 
-def filename_date(filename, dNumber, year=2025):
-    if dNumber == 1:
-        # Handle MDY-, MEX-, MEX2-, MoV- formats
-        match = re.match(r'M[A-Z]{2}2?-(\d+[A-Za-z]*)-(\d+[A-Za-z]+)', filename)
-    else:
-        # Extract all date parts using improved regex
-        match = re.match(r'MDY2-(\d+[A-Za-z]*)-(\d+[A-Za-z]+)', filename)
-    if not match:
-        print(f"Filename format not recognized: {filename}")
-        return None, None
-    
-    start_part, end_part = match.groups()
-    
-    def parse_date(part, month_hint=None):
-        try:
-            # Extract day and month
-            day = int(re.search(r'^\d+', part).group())
-            month_match = re.search(r'[A-Za-z]+', part)
-            month = month_match.group().capitalize() if month_match else month_hint
-            
-            if not month:
-                raise ValueError(f"Missing month in: {part}")
-            
-            # Handle month abbreviations (Feb -> February)
-            month_map = {
-                'Jan': 'January', 'Feb': 'February', 'Mar': 'March', 'Apr': 'April',
-                'May': 'May', 'Jun': 'June', 'Jul': 'July', 'Aug': 'August',
-                'Sep': 'September', 'Oct': 'October', 'Nov': 'November', 'Dec': 'December'
-            }
-            full_month = month_map.get(month[:3], month)
-            
-            return datetime.strptime(f"{day} {full_month} {year}", "%d %B %Y")
-        except Exception as e:
-            print(f"Error parsing date part '{part}': {e}")
-            return None
-    
-    try:
-        # Get month from end date to use as hint for start date
-        end_month = re.search(r'[A-Za-z]+', end_part)
-        month_hint = end_month.group().capitalize() if end_month else None
-        
-        start_date = parse_date(start_part, month_hint)
-        end_date = parse_date(end_part)
-        
-        return (
-            start_date.strftime("%Y-%m-%d") if start_date else None,
-            end_date.strftime("%Y-%m-%d") if end_date else None
-        )
-    except Exception as e:
-        print(f"Error processing {filename}: {e}")
+# Sailing folders read by load_sailing_data_rate_reason(); their names carry the season year
+SAILING_DATA_DIRS = ["./test_data2/DISCOVERY 2 - 2025", "./test_data2/DISCOVERY 2025"]
+SAILING_SEASON_YEAR = infer_year(*SAILING_DATA_DIRS)
+
+
+def filename_date(filename, dNumber, year=None):
+    """
+    (start, end) ISO dates of a sailing code, see sailing_codes.parse_sailing_code.
+    dNumber 2 only accepts Discovery 2 (MDY2) codes; year defaults to the
+    season year of the sailing data folders.
+    """
+    parsed = parse_sailing_code(filename, year if year is not None else SAILING_SEASON_YEAR)
+    if parsed is None or (dNumber != 1 and parsed.prefix != "MDY2"):
         return None, None
+    return parsed.start, parsed.end
 
 
 def is_empty_or_nan_rating(dfList):
@@ -788,41 +753,39 @@ def is_empty_or_nan_rating(dfList):
 
     return processed_data
     
-def get_summary_data():
+def get_summary_data(snapshot_path=None, impute=True):
+    """
+    Build the summary records for all sailings.
+    Pass snapshot_path (e.g. "./smry.json") to also write them to disk.
+    impute=False keeps missing ratings as None (summary_store.SummaryStore
+    imputes them per column and tracks which values were filled in).
+    """
     try:
-        for data in summary_discovery2:
-            name = data.get("Ship Name")
-            start, end = filename_date(name, 2, year=2025)
-            data.update({"Start": start if start else "2025-01-01"})
-            data.update({"End": end if end else "2025-01-07"})
-            data.update({"Fleet": "Marella"})
-            data.update({"Ship": "Discovery 2"})
-            print(f"Discovery 2: {start}, {end}")
-            
-        for data in summary_discovery:
-            name = data.get("Ship Name")
-            start, end = filename_date(name, 1, year=2025)
-            data.update({"Start": start if start else "2025-01-01"})
-            data.update({"End": end if end else "2025-01-07"})
-            # data.update({"Fleet":"Marella"})
-            # data.update({"Ship":"Discovery"})
-            print(f"Discovery: {start}, {end}")
-            
-        for data in summary_others:
-            name = data.get("Ship Name")
-            start, end = filename_date(name, 1, year=2025)
-            data.update({"Start": start if start else "2025-01-01"})
-            data.update({"End": end if end else "2025-01-07"})
-            print(f"Others: {start}, {end}")
-            
+        unrecognized = []
+        for records, dNumber in ((summary_discovery2, 2), (summary_discovery, 1), (summary_others, 1)):
+            for data in records:
+                name = data.get("Ship Name")
+                start, end = filename_date(name, dNumber)
+                if not start or not end:
+                    unrecognized.append(name)
+                data.update({"Start": start if start else f"{SAILING_SEASON_YEAR}-01-01"})
+                data.update({"End": end if end else f"{SAILING_SEASON_YEAR}-01-07"})
+                if records is summary_discovery2:
+                    data.update({"Fleet": "Marella"})
+                    data.update({"Ship": "Discovery 2"})
+        if unrecognized:
+            print(f"Sailing codes without dates (using defaults): {', '.join(map(str, unrecognized))}")
+
         finalSummary = summary_discovery2 + summary_discovery + summary_others
-        finalSummary = is_empty_or_nan_rating(finalSummary)
+        if impute:
+            finalSummary = is_empty_or_nan_rating(finalSummary)
         
-        try:
-            with open("./smry.json", 'w') as json_file:
-                json.dump(finalSummary, json_file, indent=4)
-        except Exception as e:
-            print(f"Error writing summary file: {e}")
+        if snapshot_path:
+            try:
+                with open(snapshot_path, 'w') as json_file:
+                    json.dump(finalSummary, json_file, indent=4)
+            except Exception as e:
+                print(f"Error writing summary file: {e}")
             
         return finalSummary
     except Exception as e:
@@ -906,7 +869,7 @@ def load_sailing_data_rate_reason() -> Dict[str, pd.DataFrame]:
     sailing_data_reason = {}
 
     # Check if directories exist, if not return empty dictionaries
-    data_directs = ["./test_data2/DISCOVERY 2 - 2025", "./test_data2/DISCOVERY 2025"]
+    data_directs = SAILING_DATA_DIRS
     
     for data_dir_index, data_dir in enumerate(data_directs):
         if not os.path.exists(data_dir):